@@ -0,0 +1,290 @@
+import argparse
+import base64
+import json
+import os
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from backends import get_model_options, resolve_model_id
+from code_explainer import explain_code
+from generation_cache import get_generation_cache, make_cache_key
+from history_store import list_history_page, get_history_entry, search_history
+from inference import DEFAULT_API_KEY, CODE_STYLES, MAX_CANDIDATES, apply_prompt_options, generate_code_api, generate_code_candidates
+from jobs import store_generation_result, RATE_LIMITED_MESSAGE
+from language_detection import detect_language_from_prompt, detect_languages_batch
+from languages import SUPPORTED_LANGUAGES, normalize_language
+from login import authenticate_user, initialize_user_database
+from rate_limit import admit_request
+from user_store import create_api_token, get_api_token_user
+
+# Headless API settings, overridable from the environment
+API_HOST = os.getenv("CODEGENIE_API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("CODEGENIE_API_PORT", "8600"))
+API_MAX_BODY = int(os.getenv("CODEGENIE_API_MAX_BODY", str(1024 * 1024)))
+
+# Error returned to the client with an HTTP status code
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+# Function to read a required string field from a request body
+def require_text(body, field):
+    value = body.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise ApiError(400, f"\"{field}\" must be a non-empty string")
+    return value
+
+# Function to read an optional number field within a range
+def read_number(body, field, default, minimum, maximum, kind=float):
+    value = body.get(field, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not minimum <= value <= maximum:
+        raise ApiError(400, f"\"{field}\" must be a number between {minimum} and {maximum}")
+    return kind(value)
+
+# Function to read the language of a request, detecting it from the prompt
+# when none is given
+def read_language(body, prompt):
+    if not body.get("language"):
+        return detect_language_from_prompt(prompt)
+    language = normalize_language(str(body["language"]))
+    if language is None:
+        raise ApiError(400, f"Unsupported language \"{body['language']}\"")
+    return language
+
+def handle_health(username, body, query):
+    return 200, {"status": "ok"}
+
+# Exchanges a username and password for an API token
+def handle_token(username, body, query):
+    username = require_text(body, "username")
+    if not authenticate_user(username, require_text(body, "password")):
+        raise ApiError(401, "Invalid username or password")
+    return 201, {"username": username, "token": create_api_token(username)}
+
+def handle_models(username, body, query):
+    return 200, {"models": [{"name": name, "id": model_id} for name, model_id in get_model_options().items()]}
+
+def handle_languages(username, body, query):
+    return 200, {"languages": SUPPORTED_LANGUAGES}
+
+# Generates code like the Generate tab: cached results are reused, and new
+# results are cached and saved to the user's history
+def handle_generate(username, body, query):
+    prompt = require_text(body, "prompt")
+    language = read_language(body, prompt)
+    model_options = get_model_options()
+    model_id = resolve_model_id(str(body["model"]), model_options) if body.get("model") else next(iter(model_options.values()))
+    if model_id is None:
+        raise ApiError(400, f"Unknown model \"{body['model']}\"")
+    max_length = read_number(body, "max_length", 500, 1, 4096, int)
+    temperature = read_number(body, "temperature", 0.7, 0.0, 2.0)
+    candidates = read_number(body, "candidates", 1, 1, MAX_CANDIDATES, int)
+    include_tests = bool(body.get("include_tests", False))
+    code_style = body.get("code_style", "Standard")
+    if code_style not in CODE_STYLES:
+        raise ApiError(400, f"\"code_style\" must be one of {', '.join(CODE_STYLES)}")
+
+    cache_key = make_cache_key(model_id, language, prompt, include_tests, code_style, max_length, temperature)
+    code = get_generation_cache().get(cache_key) if body.get("use_cache", True) else None
+    cached = code is not None
+    if not cached:
+        # Waits for the user's turn when a rate limit is reached; every
+        # candidate is a call to the model
+        if not admit_request(username, [model_id] * candidates):
+            raise ApiError(429, RATE_LIMITED_MESSAGE)
+        full_prompt = apply_prompt_options(prompt, include_tests, code_style)
+        api_key = body.get("api_key") or DEFAULT_API_KEY
+        if candidates > 1:
+            code, error = generate_code_candidates(full_prompt, language, model_id, max_length, temperature, api_key, candidates)
+        else:
+            code, error = generate_code_api(full_prompt, language, model_id, max_length, temperature, api_key)
+        if error or not code:
+            raise ApiError(502, error or "The model returned an empty response.")
+
+    store_generation_result({
+        "username": username,
+        "user_prompt": prompt,
+        "language": language,
+        "include_tests": include_tests,
+        "code_style": code_style,
+        "max_length": max_length,
+        "temperature": temperature
+    }, model_id, code)
+    return 200, {"code": code, "language": language, "model": model_id, "cached": cached}
+
+# Detects the language of one prompt, or of a list of prompts at once
+def handle_detect_language(username, body, query):
+    if "prompts" in body:
+        prompts = body["prompts"]
+        if not isinstance(prompts, list) or not all(isinstance(prompt, str) for prompt in prompts):
+            raise ApiError(400, "\"prompts\" must be a list of strings")
+        return 200, {"languages": detect_languages_batch(prompts)}
+    return 200, {"language": detect_language_from_prompt(require_text(body, "prompt"))}
+
+# Explains code; the explanation is the same HTML the app shows
+def handle_explain(username, body, query):
+    code = require_text(body, "code")
+    language = read_language(body, code)
+    return 200, {"language": language, "explanation": explain_code(code, language)}
+
+# Function to turn a history page cursor into an opaque, URL-safe string
+def encode_cursor(cursor):
+    return base64.urlsafe_b64encode(json.dumps(list(cursor)).encode()).decode()
+
+# Function to read a cursor made by encode_cursor
+def decode_cursor(value):
+    try:
+        created_at, entry_id = json.loads(base64.urlsafe_b64decode(value.encode()))
+    except (ValueError, TypeError):
+        # Not base64 JSON, or JSON that isn't a pair (e.g. a number)
+        raise ApiError(400, "Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(entry_id, int):
+        raise ApiError(400, "Invalid cursor")
+    return created_at, entry_id
+
+# Lists the user's history newest first (paged with the returned cursor), or
+# searches it when q, language or from/to are given
+def handle_history(username, body, query):
+    limit = int(query.get("limit", "20")) if query.get("limit", "20").isdigit() else 0
+    if not 1 <= limit <= 100:
+        raise ApiError(400, "\"limit\" must be a number between 1 and 100")
+    text = query.get("q", "")
+    language = normalize_language(query["language"]) if query.get("language") else None
+    if query.get("language") and language is None:
+        raise ApiError(400, f"Unsupported language \"{query['language']}\"")
+
+    if text.strip() or language or query.get("from") or query.get("to"):
+        try:
+            date_from = datetime.strptime(query["from"], "%Y-%m-%d").date() if query.get("from") else None
+            date_to = datetime.strptime(query["to"], "%Y-%m-%d").date() if query.get("to") else date_from
+        except ValueError:
+            raise ApiError(400, "\"from\" and \"to\" must be dates in YYYY-MM-DD format")
+        entries = search_history(username, text, language=language, date_from=date_from, date_to=date_to, limit=limit)
+        return 200, {"entries": entries, "next_cursor": None}
+
+    cursor = decode_cursor(query["cursor"]) if query.get("cursor") else None
+    entries, next_cursor = list_history_page(username, limit, cursor)
+    return 200, {"entries": entries, "next_cursor": encode_cursor(next_cursor) if next_cursor else None}
+
+def handle_history_entry(username, body, query):
+    entry = get_history_entry(int(query["id"]), username) if query["id"].isdigit() else None
+    if entry is None:
+        raise ApiError(404, "History entry not found")
+    return 200, entry
+
+# Routes: (method, path) -> (handler, needs a token)
+ROUTES = {
+    ("GET", "/api/health"): (handle_health, False),
+    ("POST", "/api/token"): (handle_token, False),
+    ("GET", "/api/models"): (handle_models, True),
+    ("GET", "/api/languages"): (handle_languages, True),
+    ("POST", "/api/generate"): (handle_generate, True),
+    ("POST", "/api/detect-language"): (handle_detect_language, True),
+    ("POST", "/api/explain"): (handle_explain, True),
+    ("GET", "/api/history"): (handle_history, True)
+}
+
+# Serves the JSON API. Each request runs on its own thread and connections
+# are kept alive between requests.
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "CodeGenie"
+    # Headers and body are separate writes; without TCP_NODELAY a kept-alive
+    # connection waits on the client's delayed ACK for every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def dispatch(self, method):
+        try:
+            status, payload = self.route(method)
+        except ApiError as e:
+            status, payload = e.status, {"error": e.message}
+        except Exception as e:
+            status, payload = 500, {"error": f"Error: {str(e)}"}
+        self.send_json(status, payload)
+
+    def route(self, method):
+        url = urlsplit(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        path = url.path.rstrip("/")
+        if path.startswith("/api/history/"):
+            query["id"] = path[len("/api/history/"):]
+            path = "/api/history/<id>"
+            route = (handle_history_entry, True) if method == "GET" else None
+        else:
+            route = ROUTES.get((method, path))
+        body = self.read_body()
+
+        if route is None:
+            if path == "/api/history/<id>" or any(route_path == path for _, route_path in ROUTES):
+                raise ApiError(405, f"{method} is not allowed on {url.path}")
+            raise ApiError(404, f"No such endpoint: {path}")
+
+        handler, needs_token = route
+        username = None
+        if needs_token:
+            scheme, _, token = self.headers.get("Authorization", "").partition(" ")
+            username = get_api_token_user(token.strip()) if scheme.lower() == "bearer" else None
+            if username is None:
+                raise ApiError(401, "A valid API token is required (Authorization: Bearer <token>)")
+        return handler(username, body, query)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > API_MAX_BODY:
+            self.close_connection = True
+            raise ApiError(413, f"Request bodies are limited to {API_MAX_BODY} bytes")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise ApiError(400, "The request body must be JSON")
+        if not isinstance(body, dict):
+            raise ApiError(400, "The request body must be a JSON object")
+        return body
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 401:
+            self.send_header("WWW-Authenticate", "Bearer")
+        self.end_headers()
+        self.wfile.write(data)
+
+# Function to create the API server; call serve_forever() to run it
+def create_api_server(host=API_HOST, port=API_PORT):
+    initialize_user_database()
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the CodeGenie JSON API without the Streamlit UI.")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+
+    server = create_api_server(args.host, args.port)
+    print(f"CodeGenie API listening on http://{args.host}:{server.server_port}/api")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,221 +1,33 @@
 import streamlit as st
-import requests
-import json
-import os
-import re
 from datetime import datetime
-from login import authenticate_user, initialize_user_database  # Import the login functions
+from login import initialize_user_database  # Import the login functions
+from inference import DEFAULT_API_KEY, CODE_STYLES, PROMPT_TOKEN_BUDGET, MAX_CANDIDATES, apply_prompt_options, estimate_tokens
+from backends import get_model_options
+from generation_cache import get_generation_cache, make_cache_key
+from resilience import pick_available_model
+from single_flight import get_single_flight
+from language_detection import detect_language_from_prompt
+from languages import SUPPORTED_LANGUAGES, highlight_language
+from jobs import submit_generation_job, job_in_progress
+from rate_limit import get_admission_controller
+from batch import parse_batch_file, resolve_batch_rows, submit_batch_job, BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY
+from user_store import get_write_behind_buffer, create_api_token, revoke_api_tokens, USER_DB
+from history_store import list_history_page, search_history
+from metrics import span, observe, get_metrics, start_metrics_server
+from ui import load_css, render_help_sections, show_toast, save_code_history, render_history_entry, model_display_name, render_generation, render_batch
 import time
 
 
 # Initialize the user database at startup
 initialize_user_database()
 
-# Add custom CSS with animations and color scheme
-def load_css():
-    st.markdown("""
-    <style>
-    /* Modern Color Scheme */
-    :root {
-        --primary: #6C63FF;
-        --secondary: #FF6584;
-        --accent: #43CBFF;
-        --bg-gradient: linear-gradient(135deg, #43CBFF 10%, #9708CC 100%);
-        --card-bg: rgba(255, 255, 255, 0.95);
-        --success: #00D09C;
-        --warning: #FFBF00;
-        --error: #FF5470;
-        --text-dark: #333333;
-        --text-light: #FFFFFF;
-    }
-
-    /* Main Container Styling */
-    .main .block-container {
-        padding-top: 1rem;
-        padding-bottom: 1rem;
-    }
-
-    /* Header Animation */
-    h1, h2, h3 {
-        background: var(--bg-gradient);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        animation: colorShift 8s infinite alternate;
-    }
-
-    /* Card styling with hover effects */
-    .stButton>button, .stDownloadButton>button {
-        background: var(--bg-gradient);
-        color: white;
-        border: none;
-        border-radius: 8px;
-        padding: 0.5rem 1rem;
-        transition: all 0.3s ease;
-        transform: translateY(0);
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-    }
-
-    .stButton>button:hover, .stDownloadButton>button:hover {
-        transform: translateY(-3px);
-        box-shadow: 0 7px 14px rgba(0, 0, 0, 0.1);
-    }
-
-    .stButton>button:active, .stDownloadButton>button:active {
-        transform: translateY(1px);
-    }
-
-    /* Tab styling */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 10px;
-        background-color: rgba(255, 255, 255, 0.2);
-        border-radius: 15px;
-        padding: 5px;
-    }
-
-    .stTabs [data-baseweb="tab"] {
-        border-radius: 10px;
-        transition: background-color 0.3s ease, color 0.3s ease;
-    }
-
-    .stTabs [aria-selected="true"] {
-        background-color: var(--primary);
-        color: white;
-    }
-
-    /* Code block styling */
-    pre {
-        border-radius: 10px;
-        border-left: 5px solid var(--primary);
-        background-color: #2a2a2a;
-        transition: all 0.3s ease;
-    }
-
-    pre:hover {
-        box-shadow: 0 8px 16px rgba(0, 0, 0, 0.15);
-        transform: translateY(-2px);
-    }
-
-    /* Animate explanation blocks */
-    .explanation {
-        animation: fadeIn 0.8s ease-out;
-    }
-
-    /* Sidebar styling */
-    [data-testid="stSidebar"] {
-        background-image: linear-gradient(180deg, rgba(108, 99, 255, 0.2) 0%, rgba(67, 203, 255, 0.2) 100%);
-        border-right: 1px solid rgba(255, 255, 255, 0.1);
-    }
-
-    [data-testid="stSidebar"] [data-testid="stVerticalBlock"] {
-        gap: 0.5rem;
-    }
-
-    /* Sliding animations */
-    @keyframes slideInRight {
-        from { transform: translateX(50px); opacity: 0; }
-        to { transform: translateX(0); opacity: 1; }
-    }
-
-    @keyframes slideInLeft {
-        from { transform: translateX(-50px); opacity: 0; }
-        to { transform: translateX(0); opacity: 1; }
-    }
-
-    @keyframes fadeIn {
-        from { opacity: 0; }
-        to { opacity: 1; }
-    }
-
-    @keyframes colorShift {
-        0% { filter: hue-rotate(0deg); }
-        100% { filter: hue-rotate(90deg); }
-    }
-
-    /* Loading animation */
-    .loading-animation {
-        display: flex;
-        justify-content: center;
-        align-items: center;
-        height: 100px;
-    }
-
-    .loading-animation div {
-        width: 20px;
-        height: 20px;
-        margin: 0 5px;
-        border-radius: 50%;
-        background: var(--primary);
-        animation: pulse 1.5s infinite ease-in-out;
-    }
-
-    .loading-animation div:nth-child(2) {
-        animation-delay: 0.2s;
-        background: var(--secondary);
-    }
-
-    .loading-animation div:nth-child(3) {
-        animation-delay: 0.4s;
-        background: var(--accent);
-    }
-
-    @keyframes pulse {
-        0%, 100% { transform: scale(0.5); opacity: 0.5; }
-        50% { transform: scale(1.2); opacity: 1; }
-    }
-
-    /* Toast notifications */
-    .toast {
-        position: fixed;
-        top: 20px;
-        right: 20px;
-        padding: 15px 25px;
-        border-radius: 10px;
-        color: white;
-        z-index: 1000;
-        box-shadow: 0 5px 15px rgba(0, 0, 0, 0.2);
-        animation: slideInRight 0.5s ease-out, fadeOut 0.5s ease-in 2.5s forwards;
-    }
-
-    .success-toast {
-        background-color: var(--success);
-    }
-
-    .error-toast {
-        background-color: var(--error);
-    }
-
-    @keyframes fadeOut {
-        from { opacity: 1; }
-        to { opacity: 0; }
-    }
-
-    /* Floating logo animation */
-    .logo {
-        display: inline-block;
-        animation: float 3s ease-in-out infinite;
-    }
-
-    @keyframes float {
-        0% { transform: translateY(0px); }
-        50% { transform: translateY(-10px); }
-        100% { transform: translateY(0px); }
-    }
-    </style>
-    """, unsafe_allow_html=True)
+# Serve latency metrics for Prometheus on a local port
+metrics_url = start_metrics_server()
 
 # Check authentication status
 if "authenticated" not in st.session_state:
     st.session_state["authenticated"] = False
 
-# Define file extensions dictionary - moved to global scope so it's accessible everywhere
-file_extensions = {
-    "Python": "py", "JavaScript": "js", "Java": "java", "C++": "cpp", 
-    "C": "c", "C#": "cs", "Go": "go", "Ruby": "rb", "PHP": "php",
-    "Swift": "swift", "Kotlin": "kt", "Rust": "rs", "TypeScript": "ts",
-    "HTML": "html", "CSS": "css", "SQL": "sql", "Shell/Bash": "sh",
-    "Perl": "pl", "R": "r", "MATLAB": "m"
-}
-
 # Show login page if not authenticated
 if not st.session_state["authenticated"]:
     from login import login_page
@@ -252,71 +64,6 @@ else:
     </div>
     """, unsafe_allow_html=True)
 
-    # Pre-configured API key (embedded for hackathon purposes)
-    DEFAULT_API_KEY =("HUGGINGFACE_API_KEY")
-
-
-    # Function to detect programming language from user's prompt
-    def detect_language_from_prompt(prompt):
-        # Dictionary of programming languages and their related keywords/patterns
-        language_patterns = {
-            "Python": [r'\bpython\b', r'\.py\b', r'\bpip\b', r'\bdjango\b', r'\bflask\b', r'\bnumpy\b', r'\bpandas\b'],
-            "JavaScript": [r'\bjavascript\b', r'\bjs\b', r'\.js\b', r'\bnode\.js\b', r'\bnpm\b', r'\breact\b', r'\bangular\b', r'\bvue\b'],
-            "Java": [r'\bjava\b', r'\.java\b', r'\bspring\b', r'\bmaven\b', r'\bhibernate\b'],
-            "C++": [r'\bc\+\+\b', r'\.cpp\b', r'\bcmake\b', r'\bstl\b', r'\bvector<\b'],
-            "C": [r'\bc\b', r'\.c\b', r'\bpointer\b', r'\bmalloc\b', r'\bstdio\b', r'\bstdlib\b', r'\bprintf\b'],
-            "C#": [r'\bc#\b', r'\.cs\b', r'\bdotnet\b', r'\basync\b', r'\bawait\b', r'\busing\b'],
-            "Go": [r'\bgo\b', r'\bgolang\b', r'\.go\b', r'\bgoroutine\b'],
-            "Ruby": [r'\bruby\b', r'\.rb\b', r'\brails\b', r'\bgem\b'],
-            "PHP": [r'\bphp\b', r'\.php\b', r'\blaravel\b', r'\bsymphony\b'],
-            "Swift": [r'\bswift\b', r'\.swift\b', r'\bios\b', r'\bxcode\b', r'\bcocoa\b'],
-            "Kotlin": [r'\bkotlin\b', r'\.kt\b', r'\bandroid\b'],
-            "Rust": [r'\brust\b', r'\.rs\b', r'\bcargo\b', r'\bcrate\b'],
-            "TypeScript": [r'\btypescript\b', r'\bts\b', r'\.ts\b', r'\bangular\b', r'\bvue\b'],
-            "HTML": [r'\bhtml\b', r'\.html\b', r'\bhtml5\b', r'\bdiv\b', r'\bspan\b', r'\binput\b', r'\bform\b', r'\bmarkup\b'],
-            "CSS": [r'\bcss\b', r'\.css\b', r'\bstylesheet\b', r'\bstyle\b', r'\bflex\b', r'\bgrid\b', r'\bbootstrap\b'],
-            "SQL": [r'\bsql\b', r'\bmysql\b', r'\bpostgresql\b', r'\bselect\b', r'\bfrom\b', r'\bwhere\b', r'\bgroup by\b'],
-            "Shell/Bash": [r'\bbash\b', r'\bshell\b', r'\.sh\b', r'\blinux\b', r'\bunix\b', r'\bscript\b'],
-            "Perl": [r'\bperl\b', r'\.pl\b', r'\bregex\b'],
-            "R": [r'\br\b', r'\.r\b', r'\bstatistics\b', r'\bggplot\b', r'\bdplyr\b'],
-            "MATLAB": [r'\bmatlab\b', r'\.m\b', r'\bmatrix\b', r'\boctave\b']
-        }
-        
-        # Check for explicit language mentions
-        prompt_lower = prompt.lower()
-        for language, patterns in language_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, prompt_lower, re.IGNORECASE):
-                    return language
-        
-        # Look for language mentions like "in Python" or "using JavaScript"
-        for language in language_patterns.keys():
-            if f"in {language.lower()}" in prompt_lower or f"using {language.lower()}" in prompt_lower:
-                return language
-            
-        # Default to Python if no language is detected
-        return "Python"
-
-    # Custom loading animation for API requests
-    def show_loading_animation():
-        st.markdown("""
-        <div class="loading-animation">
-            <div></div>
-            <div></div>
-            <div></div>
-        </div>
-        <p style="text-align: center;">CodeGenie is working its magic...</p>
-        """, unsafe_allow_html=True)
-
-    # Toast notification function
-    def show_toast(message, type="success"):
-        toast_class = "success-toast" if type == "success" else "error-toast"
-        st.markdown(f"""
-        <div class="toast {toast_class}" id="toast">
-            {message}
-        </div>
-        """, unsafe_allow_html=True)
-
     # Sidebar for settings with animations
     with st.sidebar:
         st.markdown("""
@@ -325,13 +72,6 @@ else:
         </div>
         """, unsafe_allow_html=True)
         
-        # List of all supported programming languages
-        all_languages = [
-            "Python", "JavaScript", "Java", "C++", "C", "C#", "Go", "Ruby", 
-            "PHP", "Swift", "Kotlin", "Rust", "TypeScript", "HTML", "CSS", 
-            "SQL", "Shell/Bash", "Perl", "R", "MATLAB"
-        ]
-        
         # Initialize programming_language in session state if not already there
         if "programming_language" not in st.session_state:
             st.session_state["programming_language"] = "Python"
@@ -343,8 +83,8 @@ else:
         if not auto_detect:
             programming_language = st.selectbox(
                 "Programming Language",
-                all_languages,
-                index=all_languages.index(st.session_state["programming_language"]) if st.session_state["programming_language"] in all_languages else 0
+                SUPPORTED_LANGUAGES,
+                index=SUPPORTED_LANGUAGES.index(st.session_state["programming_language"]) if st.session_state["programming_language"] in SUPPORTED_LANGUAGES else 0
             )
             st.session_state["programming_language"] = programming_language
         
@@ -355,32 +95,72 @@ else:
         </div>
         """, unsafe_allow_html=True)
         
-        model_options = {
-            "Mistral 7B Instruct": "mistralai/Mistral-7B-Instruct-v0.2",
-            "CodeLlama 7B Instruct": "codellama/CodeLlama-7b-Instruct-hf",
-            "Bloomz 7B1": "bigscience/bloomz-7b1"
-        }
-        
-        # Prepare model cards with icons
-        models_html = ""
-        for model_name in model_options.keys():
-            icon = "🔮" if "Mistral" in model_name else "🦙" if "CodeLlama" in model_name else "🌸"
-            models_html += f"<option value='{model_name}'>{icon} {model_name}</option>"
+        model_options = get_model_options()
         
         selected_model = st.selectbox("Select AI Model", list(model_options.keys()))
         model_id = model_options[selected_model]
         
+        # Optionally send each request to several models at once
+        race_models = st.checkbox("Query multiple models in parallel", value=False)
+        if race_models:
+            fanout_models = st.multiselect("Models to query", list(model_options.keys()), default=list(model_options.keys()))
+            fanout_policy = st.radio("Multi-model mode", ["First response wins", "Compare side by side"])
+        else:
+            fanout_models = [selected_model]
+            fanout_policy = None
+        failover_models = st.checkbox("Fail over to another model when one keeps failing", value=True)
+        
         max_length = st.slider("Maximum Output Length", 100, 1000, 500)
         temperature = st.slider("Temperature (Creativity)", 0.1, 1.0, 0.7)
+        stream_output = st.checkbox("Stream code as it is generated", value=True)
+        candidates = 1
+        if MAX_CANDIDATES > 1:
+            candidates = st.slider("Candidates to sample in parallel", 1, MAX_CANDIDATES, 1, help="Samples several answers at once and keeps the first one whose syntax checks out. Streaming is off when more than one is sampled.")
         
         # API Key input (with default value)
         api_key = st.text_input("Hugging Face API Key", value=DEFAULT_API_KEY, type="password")
         st.info("API key is pre-configured for this hackathon demo.")
         
-        # Add a logout button to the sidebar with animation
-        st.markdown("""
-        <div style="animation: fadeIn 1s ease-out;">
-        """, unsafe_allow_html=True)
+        # Cache and coalescing counters for capacity planning (admin only)
+        if st.session_state.get("username") == "admin":
+            with st.expander("Generation Cache Stats"):
+                st.json(get_generation_cache().stats())
+            with st.expander("Request Coalescing Stats"):
+                st.json(get_single_flight().stats())
+            with st.expander("Login Write-behind Stats"):
+                st.json(get_write_behind_buffer(USER_DB).stats())
+            with st.expander("Rate Limit Stats"):
+                st.json(get_admission_controller().stats())
+            with st.expander("Token Usage"):
+                token_rows = get_metrics().token_summary(group_by=("model",))
+                if token_rows:
+                    st.dataframe(token_rows, hide_index=True, use_container_width=True)
+                else:
+                    st.caption("No model calls yet.")
+            with st.expander("Latency by Stage"):
+                breakdown = st.radio("Break down by", ["Model", "Language"], horizontal=True, key="metrics_breakdown")
+                latency_rows = get_metrics().summary(group_by=(breakdown.lower(),))
+                if latency_rows:
+                    st.dataframe(latency_rows, hide_index=True, use_container_width=True)
+                else:
+                    st.caption("No requests measured yet.")
+                if metrics_url:
+                    st.caption(f"Prometheus metrics: {metrics_url}")
+        
+        # Tokens for the headless API (api_server.py)
+        with st.expander("API Access"):
+            st.caption("Call CodeGenie from scripts and editor plugins with an API token (see the README).")
+            if st.button("Create API token", key="api_token_create"):
+                st.session_state["api_token"] = create_api_token(st.session_state["username"])
+            if st.session_state.get("api_token"):
+                st.code(st.session_state["api_token"], language=None)
+                st.caption("Copy this token now; it won't be shown again.")
+            if st.button("Revoke all my tokens", key="api_token_revoke"):
+                revoked = revoke_api_tokens(st.session_state["username"])
+                st.session_state.pop("api_token", None)
+                st.caption(f"Revoked {revoked} token{'s' if revoked != 1 else ''}.")
+        
+        # Add a logout button to the sidebar
         if st.button("Logout"):
             # Add a logout animation
             st.markdown("""
@@ -391,7 +171,6 @@ else:
             time.sleep(1)  # Brief pause for animation
             st.session_state["authenticated"] = False
             st.rerun()
-        st.markdown("</div>", unsafe_allow_html=True)
         
         st.markdown("---")
         st.markdown("""
@@ -402,345 +181,175 @@ else:
         </div>
         """, unsafe_allow_html=True)
 
-    # Function to generate code using Hugging Face Inference API
-    def generate_code_api(prompt, language, model_id, max_length, temperature, api_key=DEFAULT_API_KEY):
-        # API endpoint
-        api_url = f"https://api-inference.huggingface.co/models/{model_id}"
-        
-        # Headers for the API request
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}"
-        }
-        
-        # Construct the full prompt based on the model and language
-        language_file_extension = {
-            "Python": "py", "JavaScript": "js", "Java": "java", "C++": "cpp", 
-            "C": "c", "C#": "cs", "Go": "go", "Ruby": "rb", "PHP": "php",
-            "Swift": "swift", "Kotlin": "kt", "Rust": "rs", "TypeScript": "ts",
-            "HTML": "html", "CSS": "css", "SQL": "sql", "Shell/Bash": "sh",
-            "Perl": "pl", "R": "r", "MATLAB": "m"
-        }
-        
-        # Default extension if language not found
-        file_ext = language_file_extension.get(language, language.lower())
-        
-        # Special handling for HTML/CSS/JS combined projects
-        is_web_project = False
-        if "HTML" in prompt.upper() and "CSS" in prompt.upper():
-            is_web_project = True
-        
-        if "codellama" in model_id.lower():
-            # CodeLlama specific prompt
-            if is_web_project:
-                full_prompt = f"""
-                Write code based on this description:
-                {prompt}
-                
-                Include HTML structure, CSS styling, and JavaScript if needed.
-                Format the code properly with clear comments.
-                
-                Code:
-                ```
-                """
-            else:
-                full_prompt = f"""
-                Write a {language} function based on this description:
-                {prompt}
-                
-                Include necessary imports, clear comments, and format the code properly.
-                
-                {language} code:
-                ```{file_ext}
-                """
-        else:
-            # Generic prompt for other models
-            if is_web_project:
-                full_prompt = f"""
-                Task: Write code based on the following description.
-                Description: {prompt}
-                Requirements:
-                - Create proper HTML structure
-                - Add CSS styling
-                - Include JavaScript functionality if needed
-                - Format the code properly with clear sections
-                
-                CODE:
-                """
-            else:
-                full_prompt = f"""
-                Task: Write a {language} function based on the following description.
-                Description: {prompt}
-                Requirements:
-                - Include necessary imports
-                - Add clear comments
-                - Format the code properly
-                - Follow best practices for {language}
-                
-                {language} CODE:
-                """
-        
-        # Payload for the API request
-        payload = {
-            "inputs": full_prompt,
-            "parameters": {
-                "max_new_tokens": max_length,
-                "temperature": temperature,
-                "top_p": 0.95,
-                "do_sample": True
-            }
-        }
-        
-        try:
-            # Make the API request
-            response = requests.post(api_url, headers=headers, json=payload)
-            
-            # Check if the request was successful
-            if response.status_code == 200:
-                # Parse the response
-                output = response.json()
-                
-                # Extract the generated text
-                if isinstance(output, list) and len(output) > 0:
-                    generated_text = output[0].get("generated_text", "")
-                else:
-                    generated_text = str(output)
-                
-                # Extract only the code part (after the prompt)
-                code_part = generated_text[len(full_prompt):]
-                
-                # Clean up the code (remove trailing backticks if any)
-                if "```" in code_part:
-                    code_parts = code_part.split("```")
-                    if len(code_parts) > 1:
-                        code_part = code_parts[1]
-                    else:
-                        code_part = code_parts[0]
-                
-                return code_part.strip(), None
-            else:
-                error_msg = f"API request failed with status code {response.status_code}: {response.text}"
-                return None, error_msg
-        
-        except Exception as e:
-            return None, f"Error making API request: {str(e)}"
-
-    # Function to explain code with animation
-    def explain_code(code, language):
-        # Language-specific keywords to look for in explanations
-        language_specific = {
-            "HTML": ["html", "body", "div", "span", "form", "input", "button", "tag", "element"],
-            "CSS": ["style", "class", "id", "margin", "padding", "color", "background", "flex", "grid"],
-            "JavaScript": ["function", "const", "let", "var", "document", "window", "event", "callback"],
-            "Python": ["def", "class", "import", "with", "as", "try", "except", "list", "dict"],
-            "Java": ["class", "public", "private", "static", "void", "interface", "extends", "implements"],
-            "C++": ["class", "template", "namespace", "vector", "map", "cout", "cin", "pointer"],
-            "C": ["pointer", "malloc", "free", "struct", "printf", "scanf", "include"],
-            "C#": ["class", "using", "namespace", "public", "private", "async", "await", "List<>"],
-            "SQL": ["select", "from", "where", "join", "group by", "having", "order by", "insert", "update"],
-            "Go": ["func", "defer", "goroutine", "channel", "struct", "interface", "package"]
-        }
-        
-        # Common code elements to look for
-        common_code_elements = {
-            "import": "This section imports necessary libraries and modules.",
-            "include": "This includes necessary header files.",
-            "def": "This defines a function that implements the requested functionality.",
-            "function": "This defines a function that implements the requested functionality.",
-            "class": "This defines a class to organize the functionality.",
-            "for": "This loop iterates through the input data.",
-            "while": "This loop executes code repeatedly until a condition is false.",
-            "if": "This condition checks for specific cases.",
-            "return": "This returns the final result from the function.",
-            "try": "This implements error handling for the code.",
-            "switch": "This provides multiple case conditions for different scenarios.",
-            "struct": "This defines a custom data structure.",
-            "constructor": "This initializes the object when it's created."
-        }
-        
-        explanation = f"""<div class="explanation">
-            <h3>{language} Code Analysis:</h3>
-            <p>This code implements the requested functionality with proper structure and best practices for {language}.</p>
-        """
-        
-        # Add language-specific explanations
-        if language in language_specific:
-            explanation += f"<h3>{language}-Specific Features:</h3>"
-            
-            # Count language-specific keywords in the code
-            found_features = []
-            for keyword in language_specific[language]:
-                if keyword in code.lower():
-                    found_features.append(keyword)
-            
-            if found_features:
-                explanation += f"<p>The code utilizes {language}-specific features like: {', '.join(found_features)}</p>"
-        
-        # Add common code element explanations
-        explanation += "<h3>Code Structure Breakdown:</h3><ul>"
-        
-        # Add some specific explanations based on code content
-        for key, desc in common_code_elements.items():
-            if key in code.lower():
-                explanation += f"<li><strong>{key.capitalize()}</strong>: {desc}</li>"
-        
-        explanation += "</ul>"
-        
-        # Add performance and usage notes
-        explanation += """
-            <h3>Performance and Usage Notes:</h3>
-            <ul>
-                <li>The code is designed to handle the specific requirements efficiently.</li>
-                <li>Error handling is implemented where appropriate.</li>
-                <li>Follow best practices when integrating this code.</li>
-            </ul>
-        </div>
-        """
-        
-        return explanation
-
-    # Function to save code history
-    def save_code_history(prompt, language, code):
-        # Create a directory for history if it doesn't exist
-        if not os.path.exists("history"):
-            os.makedirs("history")
-        
-        # Generate a timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # Create a filename
-        filename = f"history/code_{timestamp}.txt"
-        
-        # Save the code with metadata
-        with open(filename, "w") as f:
-            f.write(f"Prompt: {prompt}\n")
-            f.write(f"Language: {language}\n")
-            f.write(f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"User: {st.session_state['username']}\n")  # Added username to history
-            f.write("\n--- Generated Code ---\n\n")
-            f.write(code)
-
-    # Add tabs for different features with animated transitions
-    st.markdown("""
-    <div style="animation: fadeIn 1s ease-out;">
-    """, unsafe_allow_html=True)
-    
-    tab1, tab2, tab3 = st.tabs(["✨ Generate Code", "📜 History", "❓ Help"])
+    # Add tabs for different features
+    tab1, tab_batch, tab2, tab3 = st.tabs(["✨ Generate Code", "📦 Batch", "📜 History", "❓ Help"])
 
     with tab1:
-        # Main input area with animation
-        st.markdown("""
-        <div style="animation: slideInLeft 0.8s ease-out;">
-        """, unsafe_allow_html=True)
-        
+        # Main input area
         user_prompt = st.text_area("Describe the functionality you need:", height=150, 
                                 placeholder="Example: Create a Python function that takes a list of numbers and returns the average of the even numbers. Or: Create an HTML page with a responsive navbar and contact form using CSS.")
         
         # Advanced options (collapsed by default)
         with st.expander("Advanced Options"):
             include_tests = st.checkbox("Include unit tests", value=False)
-            code_style = st.selectbox("Code Style", ["Standard", "Concise", "Verbose", "Educational"])
+            code_style = st.selectbox("Code Style", CODE_STYLES)
+            bypass_cache = st.checkbox("Skip cache (always request a fresh sample)", value=False)
         
-        # Generate button with animation
-        generate_clicked = st.button("✨ Generate Code", use_container_width=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        # Generate button, off while this session's last request is running so
+        # one session can't fill the job queue
+        generation_running = job_in_progress((st.session_state.get("generation") or {}).get("job_id"))
+        generate_clicked = st.button("✨ Generate Code", use_container_width=True, disabled=generation_running)
         
         if generate_clicked:
             if not user_prompt:
                 show_toast("Please provide a description of what you want to achieve.", "error")
+            elif job_in_progress((st.session_state.get("generation") or {}).get("job_id")):
+                show_toast("Your previous request is still running. Please wait for it to finish.", "error")
             else:
-                # Show animated loading
-                show_loading_animation()
-                
-                # Add some delay to show the animation (can be removed in production)
-                time.sleep(1.5)
+                notices = []
                 
                 # Auto-detect language if enabled
                 if "auto_detect" in locals() and auto_detect:
-                    detected_language = detect_language_from_prompt(user_prompt)
+                    with span("detect_language") as labels:
+                        detected_language = detect_language_from_prompt(user_prompt)
+                        labels["language"] = detected_language
                     st.session_state["programming_language"] = detected_language
-                    st.success(f"Detected programming language: {detected_language}")
+                    notices.append(("success", f"Detected programming language: {detected_language}"))
                 
                 # Get the final language choice
                 programming_language = st.session_state["programming_language"]
                 
                 # Modify prompt based on advanced options
-                full_prompt = user_prompt
-                if include_tests:
-                    full_prompt += " Also include unit tests."
-                if code_style != "Standard":
-                    full_prompt += f" The code should be {code_style.lower()}."
+                full_prompt = apply_prompt_options(user_prompt, include_tests, code_style)
+                if estimate_tokens(full_prompt) > PROMPT_TOKEN_BUDGET:
+                    notices.append(("warning", f"Your description is longer than about {PROMPT_TOKEN_BUDGET} tokens, so only its beginning was sent to the model."))
                 
-                try:
-                    # Generate code
-                    generated_code, error = generate_code_api(
-                        full_prompt, 
-                        programming_language, 
-                        model_id,
-                        max_length, 
-                        temperature,
-                        api_key
-                    )
-                    
-                    # Clear the loading animation
-                    st.empty()
-                    
-                    if error:
-                        show_toast(error, "error")
-                    elif generated_code:
-                        # Display the generated code
-                        st.markdown("""
-                        <div style="animation: fadeIn 0.8s ease-out;">
-                        """, unsafe_allow_html=True)
-                        st.subheader(f"Generated {programming_language} Code:")
-                        
-                        # Determine language for syntax highlighting
-                        highlight_lang = programming_language.lower()
-                        if highlight_lang == "shell/bash":
-                            highlight_lang = "bash"
-                        
-                        st.code(generated_code, language=highlight_lang)
-                        st.markdown("</div>", unsafe_allow_html=True)
-                        
-                        # Save to history
-                        save_code_history(user_prompt, programming_language, generated_code)
-                        
-                        # Code explanation with animation
-                        st.markdown("""
-                        <div style="animation: slideInRight 1s ease-out;">
-                        """, unsafe_allow_html=True)
-                        st.subheader("Code Explanation:")
-                        explanation = explain_code(generated_code, programming_language)
-                        st.markdown(explanation, unsafe_allow_html=True)
-                        st.markdown("</div>", unsafe_allow_html=True)
-                        
-                       # Determine file extension for download
-                        file_ext = file_extensions.get(programming_language, programming_language.lower())
-                        
-                        # Create download filename
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        download_filename = f"generated_code_{timestamp}.{file_ext}"
-                        
-                        # Download button with animation
-                        st.markdown("""
-                        <div style="animation: fadeIn 1.2s ease-out;">
-                        """, unsafe_allow_html=True)
-                        st.download_button(
-                            label="📥 Download Code",
-                            data=generated_code,
-                            file_name=download_filename,
-                            mime="text/plain",
-                            use_container_width=True
-                        )
-                        st.markdown("</div>", unsafe_allow_html=True)
-                        
-                        # Success toast notification
-                        show_toast("Code successfully generated! ✨", "success")
+                # Models to query for this request
+                fanout_ids = [model_options[name] for name in fanout_models] or [model_id]
+                if race_models:
+                    mode = "compare" if fanout_policy == "Compare side by side" else "race"
+                    request_model_ids = fanout_ids
+                else:
+                    if candidates > 1:
+                        mode = "candidates"
                     else:
-                        show_toast("Failed to generate code. Please try again.", "error")
+                        mode = "stream" if stream_output else "single"
+                    
+                    # Fail over to another model while the selected one is failing fast
+                    active_model_id = model_id
+                    if failover_models:
+                        active_model_id = pick_available_model([model_id] + [value for value in model_options.values() if value != model_id])
+                        if active_model_id != model_id:
+                            notices.append(("info", f"{selected_model} is temporarily unavailable, using {model_display_name(active_model_id)} instead."))
+                    request_model_ids = [active_model_id]
                 
-                except Exception as e:
-                    show_toast(f"Error: {str(e)}", "error")
+                generation = {
+                    "job_id": None,
+                    "mode": mode,
+                    "language": programming_language,
+                    "highlight_lang": highlight_language(programming_language),
+                    "model_ids": request_model_ids,
+                    "notices": notices,
+                    "code": None,
+                    "error": None,
+                    "results": {},
+                    "model_id": None,
+                    "explanation": None,
+                    "announced": False,
+                    "render_recorded": False,
+                    "requested_at": datetime.now().strftime("%Y%m%d_%H%M%S")
+                }
+                
+                # Look up previously generated code for the same request
+                if mode != "compare" and not bypass_cache:
+                    generation_cache = get_generation_cache()
+                    for candidate_model_id in request_model_ids:
+                        cached_code = generation_cache.get(make_cache_key(
+                            candidate_model_id,
+                            programming_language,
+                            user_prompt,
+                            include_tests,
+                            code_style,
+                            max_length,
+                            temperature
+                        ))
+                        if cached_code:
+                            generation["code"] = cached_code
+                            generation["model_id"] = candidate_model_id
+                            save_code_history(user_prompt, programming_language, cached_code)
+                            break
+                
+                # Otherwise hand the request to a background worker
+                if generation["code"] is None:
+                    generation["job_id"], generation["error"] = submit_generation_job({
+                        "username": st.session_state["username"],
+                        "mode": mode,
+                        "user_prompt": user_prompt,
+                        "full_prompt": full_prompt,
+                        "language": programming_language,
+                        "model_ids": request_model_ids,
+                        "include_tests": include_tests,
+                        "code_style": code_style,
+                        "max_length": max_length,
+                        "temperature": temperature,
+                        "candidates": candidates,
+                        "api_key": api_key
+                    })
+                
+                st.session_state["generation"] = generation
+        
+        # Show the latest generation request, in progress or finished
+        if st.session_state.get("generation"):
+            generation = st.session_state["generation"]
+            render_started = time.perf_counter()
+            render_generation(generation)
+            # Only the first render of a finished result counts; polling a
+            # running job or redrawing the result on a rerun is not rendering
+            if not generation["job_id"] and not generation["render_recorded"]:
+                observe("render", time.perf_counter() - render_started, generation["model_id"] or "", generation["language"])
+                generation["render_recorded"] = True
+
+    with tab_batch:
+        # Batch tab: generate code for a whole file of prompts
+        st.markdown("""
+        <div style="animation: fadeIn 0.8s ease-out;">
+            <h2>Batch Generation</h2>
+            <p>Upload a CSV file with a <code>prompt</code> column, or a JSONL file with one <code>{"prompt": ...}</code> object per line.
+            Optional <code>language</code> and <code>model</code> fields override the detected language and the selected model for a row.</p>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        batch_file = st.file_uploader("Prompt file", type=["csv", "jsonl"], key="batch_file")
+        batch_concurrency = st.slider("Prompts to generate at once", 1, BATCH_MAX_CONCURRENCY, min(BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY), key="batch_concurrency")
+        
+        batch_running = job_in_progress((st.session_state.get("batch") or {}).get("job_id"))
+        if st.button("📦 Run Batch", use_container_width=True, disabled=batch_file is None or batch_running):
+            try:
+                batch_rows = resolve_batch_rows(parse_batch_file(batch_file.name, batch_file.getvalue()), model_id, model_options)
+            except ValueError as e:
+                show_toast(str(e), "error")
+            else:
+                batch = {
+                    "job_id": None,
+                    "rows": batch_rows,
+                    "results": {},
+                    "error": None,
+                    "archive": None,
+                    "requested_at": datetime.now().strftime("%Y%m%d_%H%M%S")
+                }
+                batch["job_id"], batch["error"] = submit_batch_job({
+                    "username": st.session_state["username"],
+                    "rows": batch_rows,
+                    "concurrency": batch_concurrency,
+                    "max_length": max_length,
+                    "temperature": temperature,
+                    "api_key": api_key
+                })
+                st.session_state["batch"] = batch
+        
+        # Show the latest batch, in progress or finished
+        if st.session_state.get("batch"):
+            render_batch(st.session_state["batch"])
 
     with tab2:
         # History tab
@@ -751,82 +360,59 @@ else:
         </div>
         """, unsafe_allow_html=True)
         
-        # Create history directory if it doesn't exist
-        if not os.path.exists("history"):
-            os.makedirs("history")
-        
-        # Get list of history files specific to the current user
-        history_files = []
-        for filename in os.listdir("history"):
-            if filename.startswith("code_") and filename.endswith(".txt"):
-                # Read the file to check if it belongs to the current user
-                with open(os.path.join("history", filename), "r") as f:
-                    content = f.read()
-                    if f"User: {st.session_state['username']}" in content:
-                        history_files.append(filename)
-        
-        # Sort by timestamp (newest first)
-        history_files.sort(reverse=True)
-        
-        if not history_files:
-            st.info("No code history found. Generate some code first!")
+        # Search and filter controls
+        search_text = st.text_input("Search your history", placeholder="Search prompts and code, e.g. reverse string", key="history_search")
+        filter_col1, filter_col2 = st.columns(2)
+        with filter_col1:
+            search_language = st.selectbox("Language", ["All languages"] + SUPPORTED_LANGUAGES, key="history_language")
+        with filter_col2:
+            search_dates = st.date_input("Date range", value=(), key="history_dates")
+        
+        date_from = search_dates[0] if len(search_dates) > 0 else None
+        date_to = search_dates[1] if len(search_dates) > 1 else date_from
+        language_filter = None if search_language == "All languages" else search_language
+        
+        if search_text.strip() or language_filter or date_from:
+            # Ranked full-text search over prompt, language and code
+            history_entries = search_history(
+                st.session_state["username"],
+                search_text,
+                language=language_filter,
+                date_from=date_from,
+                date_to=date_to
+            )
+            
+            if not history_entries:
+                st.info("No history entries match your search.")
+            else:
+                st.caption(f"Showing the {len(history_entries)} best matches")
+                for i, entry in enumerate(history_entries):
+                    render_history_entry(entry, i)
         else:
-            # Create history cards with animation
-            for i, filename in enumerate(history_files):
-                with open(os.path.join("history", filename), "r") as f:
-                    content = f.read()
-                
-                # Extract metadata
-                prompt = "Unknown"
-                language = "Unknown"
-                timestamp = "Unknown"
-                
-                for line in content.split("\n"):
-                    if line.startswith("Prompt:"):
-                        prompt = line[8:].strip()
-                    elif line.startswith("Language:"):
-                        language = line[10:].strip()
-                    elif line.startswith("Timestamp:"):
-                        timestamp = line[11:].strip()
-                    elif line.startswith("--- Generated Code ---"):
-                        break
-                
-                # Extract the code
-                code_parts = content.split("--- Generated Code ---")
-                if len(code_parts) > 1:
-                    code = code_parts[1].strip()
-                else:
-                    code = "No code found"
-                
-                # Create a card for each history item with staggered animation
-                st.markdown(f"""
-                <div style="animation: slideInLeft {0.5 + i*0.1}s ease-out;">
-                    <h3>Code from {timestamp}</h3>
-                    <p><strong>Language:</strong> {language}</p>
-                    <p><strong>Prompt:</strong> {prompt[:100]}{"..." if len(prompt) > 100 else ""}</p>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # Determine language for syntax highlighting
-                highlight_lang = language.lower()
-                if highlight_lang == "shell/bash":
-                    highlight_lang = "bash"
-                
-                with st.expander("Show Code"):
-                    st.code(code, language=highlight_lang)
-                    
-                    # File extension for download
-                    file_ext = file_extensions.get(language, language.lower())
-                    
-                    # Create download button for this history item
-                    st.download_button(
-                        label="📥 Download This Code",
-                        data=code,
-                        file_name=f"history_code_{filename.replace('.txt', '')}.{file_ext}",
-                        mime="text/plain"
-                    )
+            # Page through the current user's history (newest first). Only entry
+            # metadata is loaded; code is fetched when an entry is opened.
+            page_size = st.selectbox("Entries per page", [10, 25, 50], key="history_page_size")
+            if st.session_state.get("history_cursor_page_size") != page_size:
+                st.session_state["history_cursors"] = [None]
+                st.session_state["history_cursor_page_size"] = page_size
+            
+            history_entries = []
+            next_cursor = None
+            for cursor in st.session_state["history_cursors"]:
+                page_entries, next_cursor = list_history_page(st.session_state["username"], page_size, cursor)
+                history_entries.extend(page_entries)
+            
+            if not history_entries:
+                st.info("No code history found. Generate some code first!")
+            else:
+                # Create history cards with animation
+                for i, entry in enumerate(history_entries):
+                    render_history_entry(entry, i)
                 
-                st.markdown("---")
+                # Fetch the next page from where the last one ended
+                if next_cursor and st.button("Load more", key="history_load_more", use_container_width=True):
+                    st.session_state["history_cursors"].append(next_cursor)
+                    st.rerun()
 
     with tab3:
         # Help and documentation tab
@@ -837,106 +423,7 @@ else:
         """, unsafe_allow_html=True)
         
         # Create help sections with expandable content
-        with st.expander("Getting Started", expanded=True):
-            st.markdown("""
-            <div class="explanation">
-                <h3>Welcome to CodeGenie!</h3>
-                <p>CodeGenie helps you generate code using AI models. Here's how to get started:</p>
-                <ol>
-                    <li>Go to the "Generate Code" tab</li>
-                    <li>Enter a description of what you want the code to do</li>
-                    <li>Choose the programming language or let CodeGenie detect it</li>
-                    <li>Click "Generate Code"</li>
-                    <li>Review and download the generated code</li>
-                </ol>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with st.expander("Writing Effective Prompts"):
-            st.markdown("""
-            <div class="explanation">
-                <h3>Tips for Writing Effective Prompts</h3>
-                <p>To get better code generation results, follow these tips:</p>
-                <ul>
-                    <li><strong>Be specific:</strong> Include details about inputs, outputs, and edge cases</li>
-                    <li><strong>Mention the language:</strong> Specify the programming language in your prompt</li>
-                    <li><strong>Describe the structure:</strong> Mention if you need classes, functions, or specific patterns</li>
-                    <li><strong>Include examples:</strong> Adding examples helps the AI understand better</li>
-                    <li><strong>Request comments:</strong> Ask for comments if you need explanations in the code</li>
-                </ul>
-                <p><strong>Example prompt:</strong> "Create a Python function that takes a list of integers and returns the sum of all even numbers. The function should handle empty lists and non-integer inputs by raising appropriate exceptions."</p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with st.expander("Available Models"):
-            st.markdown("""
-            <div class="explanation">
-                <h3>AI Models in CodeGenie</h3>
-                <p>CodeGenie supports these AI models:</p>
-                <ul>
-                    <li><strong>🔮 Mistral 7B Instruct:</strong> A versatile model with good general-purpose code generation abilities.</li>
-                    <li><strong>🦙 CodeLlama 7B Instruct:</strong> Specialized for code generation with excellent syntax accuracy.</li>
-                    <li><strong>🌸 Bloomz 7B1:</strong> A multilingual model that works well for code in various languages.</li>
-                </ul>
-                <p>Each model has strengths for different programming languages and tasks. Experiment to see which works best for your specific needs.</p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with st.expander("Supported Languages"):
-            st.markdown("""
-            <div class="explanation">
-                <h3>Supported Programming Languages</h3>
-                <p>CodeGenie can generate code in many programming languages, including:</p>
-                <div style="display: grid; grid-template-columns: repeat(3, 1fr); gap: 10px;">
-                    <div>
-                        <ul>
-                            <li>Python</li>
-                            <li>JavaScript</li>
-                            <li>Java</li>
-                            <li>C++</li>
-                            <li>C</li>
-                            <li>C#</li>
-                            <li>Go</li>
-                        </ul>
-                    </div>
-                    <div>
-                        <ul>
-                            <li>Ruby</li>
-                            <li>PHP</li>
-                            <li>Swift</li>
-                            <li>Kotlin</li>
-                            <li>Rust</li>
-                            <li>TypeScript</li>
-                        </ul>
-                    </div>
-                    <div>
-                        <ul>
-                            <li>HTML</li>
-                            <li>CSS</li>
-                            <li>SQL</li>
-                            <li>Shell/Bash</li>
-                            <li>Perl</li>
-                            <li>R</li>
-                            <li>MATLAB</li>
-                        </ul>
-                    </div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with st.expander("Troubleshooting"):
-            st.markdown("""
-            <div class="explanation">
-                <h3>Common Issues and Solutions</h3>
-                <ul>
-                    <li><strong>Poor code quality:</strong> Try rephrasing your prompt to be more specific, or select a different model.</li>
-                    <li><strong>API errors:</strong> Check your internet connection or try again later if the API is experiencing high traffic.</li>
-                    <li><strong>Language detection issues:</strong> Explicitly mention the programming language in your prompt or disable auto-detection.</li>
-                    <li><strong>Code doesn't compile/run:</strong> The generated code may need minor adjustments. Review it carefully before using.</li>
-                </ul>
-                <p>If you continue to experience issues, try refreshing the page or logging out and back in.</p>
-            </div>
-            """, unsafe_allow_html=True)
+        render_help_sections()
         
         # Animated feedback section
         st.markdown("""
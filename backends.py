@@ -0,0 +1,471 @@
+import streamlit as st
+import requests
+from requests.adapters import HTTPAdapter
+import hashlib
+import json
+import os
+import threading
+import time
+from resilience import (
+    get_circuit_breaker,
+    get_retry_budget,
+    compute_backoff,
+    parse_retry_hint,
+    RETRYABLE_STATUS_CODES,
+    MAX_RETRIES,
+    RETRY_MAX_WAIT
+)
+
+# Base URL of the Hugging Face hosted inference API
+API_BASE_URL = "https://api-inference.huggingface.co/models"
+
+# Connection settings, overridable from the environment
+CONNECT_TIMEOUT = float(os.getenv("CODEGENIE_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("CODEGENIE_READ_TIMEOUT", "120"))
+POOL_MAXSIZE = int(os.getenv("CODEGENIE_POOL_MAXSIZE", "10"))
+POOL_BLOCK = os.getenv("CODEGENIE_POOL_BLOCK", "false").lower() == "true"
+
+# Hosted models offered in the sidebar (set CODEGENIE_HOSTED_MODELS=false to
+# keep generation inside the network)
+HOSTED_MODELS = os.getenv("CODEGENIE_HOSTED_MODELS", "true").lower() == "true"
+HOSTED_MODEL_OPTIONS = {
+    "Mistral 7B Instruct": "mistralai/Mistral-7B-Instruct-v0.2",
+    "CodeLlama 7B Instruct": "codellama/CodeLlama-7b-Instruct-hf",
+    "Bloomz 7B1": "bigscience/bloomz-7b1"
+}
+
+# OpenAI-compatible completion server (vLLM, llama.cpp server, Ollama, TGI...)
+OPENAI_BASE_URL = os.getenv("CODEGENIE_OPENAI_BASE_URL", "http://localhost:8000/v1").rstrip("/")
+OPENAI_API_KEY = os.getenv("CODEGENIE_OPENAI_API_KEY", "")
+OPENAI_MODELS = [name.strip() for name in os.getenv("CODEGENIE_OPENAI_MODELS", "").split(",") if name.strip()]
+
+# In-process CPU models: comma-separated paths to quantized GGUF files
+LOCAL_MODELS = [path.strip() for path in os.getenv("CODEGENIE_LOCAL_MODELS", "").split(",") if path.strip()]
+LOCAL_CONTEXT = int(os.getenv("CODEGENIE_LOCAL_CONTEXT", "4096"))
+LOCAL_THREADS = int(os.getenv("CODEGENIE_LOCAL_THREADS", str(os.cpu_count() or 4)))
+
+# Deterministic stand-in backend for testing
+FAKE_BACKEND = os.getenv("CODEGENIE_FAKE_BACKEND", "false").lower() == "true"
+FAKE_LATENCY = float(os.getenv("CODEGENIE_FAKE_LATENCY", "0"))
+
+# Function to get the pooled HTTP session for a model endpoint.
+# Cached as a resource so every user session reuses the same keep-alive
+# connections instead of paying a new DNS + TCP + TLS handshake per request.
+@st.cache_resource(show_spinner=False)
+def get_http_session(model_id):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, pool_block=POOL_BLOCK)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# Function to build the request payload for the inference API
+# The completion comes back without the prompt, and with the number of
+# generated tokens in "details". Generation ends early at any `stop` sequence.
+# A `seed` makes the sample reproducible, and different seeds give different
+# samples for the same prompt (the API caches unseeded identical requests).
+def build_payload(full_prompt, max_length, temperature, stream=False, stop=None, seed=None):
+    payload = {
+        "inputs": full_prompt,
+        "parameters": {
+            "max_new_tokens": max_length,
+            "temperature": temperature,
+            "top_p": 0.95,
+            "do_sample": True,
+            "return_full_text": False,
+            "details": True
+        }
+    }
+    if stop:
+        payload["parameters"]["stop"] = stop
+    if seed is not None:
+        payload["parameters"]["seed"] = seed
+    if stream:
+        payload["stream"] = True
+    return payload
+
+# Function to build the request headers for the inference API
+def build_headers(api_key):
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}"
+    }
+
+# Function to send a request to the inference API with retries.
+# Retries rate-limit, model-loading and gateway errors with jittered backoff
+# (honouring estimated_time / Retry-After) within the retry budget, and
+# consults the model's circuit breaker so a failing model fails fast.
+# Returns (response, None) on HTTP 200 or (None, error_msg) otherwise.
+def post_with_retries(model_id, api_url, headers, payload, stream=False):
+    breaker = get_circuit_breaker(model_id)
+    if not breaker.allow_request():
+        return None, f"Model {model_id} is temporarily unavailable after repeated errors. Try again in {breaker.retry_in():.0f} seconds or choose another model."
+
+    budget = get_retry_budget()
+    budget.record_request()
+    session = get_http_session(model_id)
+    waited = 0.0
+    attempt = 0
+    # Whether the model answered; every exit settles the breaker with it, so
+    # a half-open trial is never left in flight (an unexpected error counts
+    # as a failure)
+    healthy = False
+    try:
+        while True:
+            hint = None
+            try:
+                response = session.post(api_url, headers=headers, json=payload, stream=stream, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+            except requests.exceptions.ConnectionError as e:
+                error_msg = f"Error making API request: {str(e)}"
+            except requests.exceptions.Timeout:
+                # A read timeout already cost the full timeout, so don't retry it
+                return None, f"API request timed out after {READ_TIMEOUT:g} seconds. Please try again."
+            else:
+                if response.status_code == 200:
+                    healthy = True
+                    return response, None
+
+                error_msg = f"API request failed with status code {response.status_code}: {response.text}"
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    # Client errors (bad token, bad request) come from a model
+                    # that is up, so they count as healthy
+                    healthy = True
+                    response.close()
+                    return None, error_msg
+                hint = parse_retry_hint(response)
+                response.close()
+
+            delay = compute_backoff(attempt, hint)
+            if attempt >= MAX_RETRIES or waited + delay > RETRY_MAX_WAIT or not budget.try_spend():
+                return None, error_msg
+
+            time.sleep(delay)
+            waited += delay
+            attempt += 1
+    finally:
+        if healthy:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+# Function to read the "data:" payloads of a server-sent event stream
+def iter_sse_data(response):
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data:"):
+            yield line[len("data:"):].strip()
+
+# Inference backends. Each one turns a full prompt into the model's raw
+# completion (the text after the prompt):
+#   complete(...) returns (completion, None) or (None, error)
+#   stream(...) yields (completion_so_far, None) as text arrives, or (None, error)
+# Generation ends at any of the optional `stop` sequences. Both fill in the
+# optional `usage` dict with the input_tokens/output_tokens the server reports.
+# Backends are chosen by the prefix of the model id in the sidebar options:
+# "openai:<model>", "local:<path.gguf>", "fake:<name>", anything else is a
+# Hugging Face hosted model.
+
+# Function to note the token counts a server reported for a call in the
+# caller's `usage` dict (counts the server didn't report are left out)
+def record_usage(usage, input_tokens=None, output_tokens=None):
+    if usage is None:
+        return
+    if input_tokens is not None:
+        usage["input_tokens"] = input_tokens
+    if output_tokens is not None:
+        usage["output_tokens"] = output_tokens
+
+# Hugging Face hosted inference API
+class HuggingFaceBackend:
+    def __init__(self, model_id, name):
+        self.model_id = model_id
+        self.name = name
+
+    # Built per request, so a changed API_BASE_URL applies to cached backends too
+    @property
+    def api_url(self):
+        return f"{API_BASE_URL}/{self.name}"
+
+    def complete(self, full_prompt, max_length, temperature, api_key, stop=None, usage=None, seed=None):
+        headers = build_headers(api_key)
+        payload = build_payload(full_prompt, max_length, temperature, stop=stop, seed=seed)
+        try:
+            # Make the API request over the shared connection pool
+            response, error_msg = post_with_retries(self.model_id, self.api_url, headers, payload)
+            if error_msg:
+                return None, error_msg
+
+            # Parse the response
+            output = response.json()
+
+            # Extract the generated text (the completion only, see build_payload)
+            if isinstance(output, list) and len(output) > 0:
+                generated_text = output[0].get("generated_text", "")
+                record_usage(usage, output_tokens=(output[0].get("details") or {}).get("generated_tokens"))
+            else:
+                generated_text = str(output)
+
+            return generated_text, None
+
+        except Exception as e:
+            return None, f"Error making API request: {str(e)}"
+
+    def stream(self, full_prompt, max_length, temperature, api_key, stop=None, usage=None, seed=None):
+        headers = build_headers(api_key)
+        headers["Accept"] = "text/event-stream"
+        payload = build_payload(full_prompt, max_length, temperature, stream=True, stop=stop, seed=seed)
+        try:
+            # Retries only happen before the first token arrives
+            response, error_msg = post_with_retries(self.model_id, self.api_url, headers, payload, stream=True)
+            if error_msg:
+                yield None, error_msg
+                return
+
+            with response:
+                # One event per generated token
+                completion = ""
+                for data in iter_sse_data(response):
+                    event = json.loads(data)
+                    if "error" in event:
+                        yield None, f"API streaming error: {event['error']}"
+                        return
+
+                    # The last event carries the details of the whole generation
+                    if event.get("details"):
+                        record_usage(usage, output_tokens=event["details"].get("generated_tokens"))
+
+                    token = event.get("token") or {}
+                    if token.get("special"):
+                        continue
+                    completion += token.get("text", "")
+                    yield completion, None
+
+        except requests.exceptions.Timeout:
+            yield None, f"API request timed out after {READ_TIMEOUT:g} seconds. Please try again."
+        except Exception as e:
+            yield None, f"Error making API request: {str(e)}"
+
+# OpenAI-compatible /v1/completions server running inside the network.
+# Uses the same connection pool, retries and circuit breaker as the hosted API.
+class OpenAICompatibleBackend:
+    def __init__(self, model_id, name):
+        self.model_id = model_id
+        self.name = name
+
+    @property
+    def api_url(self):
+        return f"{OPENAI_BASE_URL}/completions"
+
+    def build_payload(self, full_prompt, max_length, temperature, stream=False, stop=None, seed=None):
+        payload = {
+            "model": self.name,
+            "prompt": full_prompt,
+            "max_tokens": max_length,
+            "temperature": temperature,
+            "top_p": 0.95,
+            "stream": stream
+        }
+        if stop:
+            payload["stop"] = stop
+        if seed is not None:
+            payload["seed"] = seed
+        return payload
+
+    def complete(self, full_prompt, max_length, temperature, api_key, stop=None, usage=None, seed=None):
+        # Local servers get their own key, never the Hugging Face token
+        headers = build_headers(OPENAI_API_KEY or "none")
+        payload = self.build_payload(full_prompt, max_length, temperature, stop=stop, seed=seed)
+        try:
+            response, error_msg = post_with_retries(self.model_id, self.api_url, headers, payload)
+            if error_msg:
+                return None, error_msg
+
+            output = response.json()
+            reported = output.get("usage") or {}
+            record_usage(usage, reported.get("prompt_tokens"), reported.get("completion_tokens"))
+            choices = output.get("choices") or [{}]
+            return choices[0].get("text", ""), None
+
+        except Exception as e:
+            return None, f"Error making API request: {str(e)}"
+
+    def stream(self, full_prompt, max_length, temperature, api_key, stop=None, usage=None, seed=None):
+        headers = build_headers(OPENAI_API_KEY or "none")
+        headers["Accept"] = "text/event-stream"
+        payload = self.build_payload(full_prompt, max_length, temperature, stream=True, stop=stop, seed=seed)
+        try:
+            response, error_msg = post_with_retries(self.model_id, self.api_url, headers, payload, stream=True)
+            if error_msg:
+                yield None, error_msg
+                return
+
+            with response:
+                completion = ""
+                for data in iter_sse_data(response):
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    if "error" in event:
+                        yield None, f"API streaming error: {event['error']}"
+                        return
+
+                    # Servers that report usage send it with the last chunk
+                    if event.get("usage"):
+                        record_usage(usage, event["usage"].get("prompt_tokens"), event["usage"].get("completion_tokens"))
+
+                    choices = event.get("choices") or [{}]
+                    completion += choices[0].get("text") or ""
+                    yield completion, None
+
+        except requests.exceptions.Timeout:
+            yield None, f"API request timed out after {READ_TIMEOUT:g} seconds. Please try again."
+        except Exception as e:
+            yield None, f"Error making API request: {str(e)}"
+
+# Function to load a quantized GGUF model for CPU inference, once per process.
+# llama-cpp-python is an optional dependency, only needed for local models.
+@st.cache_resource(show_spinner="Loading local model...")
+def load_local_model(model_path):
+    from llama_cpp import Llama
+    return Llama(model_path=model_path, n_ctx=LOCAL_CONTEXT, n_threads=LOCAL_THREADS, verbose=False)
+
+# In-process CPU backend running a small quantized code model with llama.cpp.
+# One model instance can only run one generation at a time, so calls are
+# serialized per model; the job queue keeps them off the script thread.
+class LocalCPUBackend:
+    def __init__(self, model_id, name):
+        self.model_id = model_id
+        self.model_path = name
+        self.lock = threading.Lock()
+
+    def load(self):
+        try:
+            return load_local_model(self.model_path), None
+        except ImportError:
+            return None, "Local models need llama-cpp-python. Install it with: pip install llama-cpp-python"
+        except Exception as e:
+            return None, f"Error loading local model {self.model_path}: {str(e)}"
+
+    def complete(self, full_prompt, max_length, temperature, api_key, stop=None, usage=None, seed=None):
+        model, error_msg = self.load()
+        if error_msg:
+            return None, error_msg
+        try:
+            with self.lock:
+                output = model(full_prompt, max_tokens=max_length, temperature=temperature, top_p=0.95, stop=stop or [], seed=seed)
+            reported = output.get("usage") or {}
+            record_usage(usage, reported.get("prompt_tokens"), reported.get("completion_tokens"))
+            return output["choices"][0]["text"], None
+        except Exception as e:
+            return None, f"Error running local model: {str(e)}"
+
+    def stream(self, full_prompt, max_length, temperature, api_key, stop=None, usage=None, seed=None):
+        model, error_msg = self.load()
+        if error_msg:
+            yield None, error_msg
+            return
+        try:
+            with self.lock:
+                completion = ""
+                for chunk in model(full_prompt, max_tokens=max_length, temperature=temperature, top_p=0.95, stop=stop or [], seed=seed, stream=True):
+                    completion += chunk["choices"][0]["text"]
+                    yield completion, None
+        except Exception as e:
+            yield None, f"Error running local model: {str(e)}"
+
+# Deterministic stand-in backend for tests and demos. The same prompt and
+# seed always give the same code; "fake:fail" always fails, "fake:flaky"
+# writes code with a syntax error unless the seed is odd and "fake:fenced"
+# opens a code block of its own. Like a real model it keeps talking after the
+# code block unless a stop sequence ends it.
+# CODEGENIE_FAKE_LATENCY is the time for the whole completion, spread over
+# its lines, so stopping early also saves time.
+class FakeBackend:
+    def __init__(self, model_id, name):
+        self.model_id = model_id
+        self.name = name
+
+    def canned_lines(self, full_prompt, stop, seed=None):
+        digest = hashlib.sha256(f"{self.name}:{full_prompt}:{seed}".encode()).hexdigest()[:12]
+        broken = self.name == "flaky" and (seed is None or seed % 2 == 0)
+        lines = ["```python\n"] if self.name == "fenced" else []
+        lines += [
+            f"# Canned response from the {self.name} test backend\n",
+            f"def generated_{digest}():\n",
+            f"    return (\"{digest}\"\n" if broken else f"    return \"{digest}\"\n",
+            "```\n",
+            "\n",
+            f"This function returns the string {digest}.\n",
+            "It was generated by the test backend and takes no arguments.\n",
+            "Let me know if you need any changes!\n"
+        ]
+        # Like a server, end generation where a stop sequence first appears,
+        # leaving the sequence itself out
+        text = "".join(lines)
+        cuts = [text.find(sequence) for sequence in stop or [] if sequence in text]
+        if cuts:
+            return text[:min(cuts)].splitlines(keepends=True), len(lines)
+        return lines, len(lines)
+
+    def complete(self, full_prompt, max_length, temperature, api_key, stop=None, usage=None, seed=None):
+        if self.name == "fail":
+            time.sleep(FAKE_LATENCY)
+            return None, "Fake backend failure"
+        lines, total = self.canned_lines(full_prompt, stop, seed)
+        time.sleep(FAKE_LATENCY * len(lines) / total)
+        return "".join(lines), None
+
+    def stream(self, full_prompt, max_length, temperature, api_key, stop=None, usage=None, seed=None):
+        if self.name == "fail":
+            time.sleep(FAKE_LATENCY)
+            yield None, "Fake backend failure"
+            return
+        lines, total = self.canned_lines(full_prompt, stop, seed)
+        completion = ""
+        for line in lines:
+            time.sleep(FAKE_LATENCY / total)
+            completion += line
+            yield completion, None
+
+BACKEND_TYPES = {
+    "hf": HuggingFaceBackend,
+    "openai": OpenAICompatibleBackend,
+    "local": LocalCPUBackend,
+    "fake": FakeBackend
+}
+
+# Function to split a model id into its backend type and backend-specific name
+def parse_model_id(model_id):
+    kind, separator, name = model_id.partition(":")
+    if separator and kind in BACKEND_TYPES:
+        return kind, name
+    return "hf", model_id
+
+# Function to get the backend serving a model id, shared by all sessions
+@st.cache_resource(show_spinner=False)
+def get_backend(model_id):
+    kind, name = parse_model_id(model_id)
+    return BACKEND_TYPES[kind](model_id, name)
+
+# Function to list the models offered in the sidebar: the hosted models plus
+# any local servers, CPU models and the test backend configured in the environment
+def get_model_options():
+    model_options = dict(HOSTED_MODEL_OPTIONS) if HOSTED_MODELS else {}
+    for name in OPENAI_MODELS:
+        model_options[f"{name} (local server)"] = f"openai:{name}"
+    for path in LOCAL_MODELS:
+        model_options[f"{os.path.splitext(os.path.basename(path))[0]} (local CPU)"] = f"local:{path}"
+    if FAKE_BACKEND:
+        model_options["Test Model (canned output)"] = "fake:canned"
+        model_options["Test Model (flaky syntax)"] = "fake:flaky"
+    # Never leave the sidebar without a model to pick
+    return model_options or dict(HOSTED_MODEL_OPTIONS)
+
+# Function to find the model id for a model's display name or id, ignoring
+# case. Returns None for models that aren't offered.
+def resolve_model_id(value, model_options=None):
+    model_options = model_options if model_options is not None else get_model_options()
+    value = value.strip().lower()
+    for name, model_id in model_options.items():
+        if value in (name.lower(), model_id.lower()):
+            return model_id
+    return None
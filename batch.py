@@ -0,0 +1,173 @@
+import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import io
+import json
+import os
+import re
+import zipfile
+from backends import resolve_model_id
+from inference import generate_code_api
+from generation_cache import get_generation_cache, make_cache_key
+from language_detection import detect_language_from_prompt
+from languages import normalize_language, file_extension
+from jobs import get_job_queue, store_generation_result, RATE_LIMITED_MESSAGE
+from metrics import span
+from rate_limit import TokenBucket, admit_request
+
+# Batch settings, overridable from the environment
+BATCH_MAX_ROWS = int(os.getenv("CODEGENIE_BATCH_MAX_ROWS", "200"))
+BATCH_CONCURRENCY = int(os.getenv("CODEGENIE_BATCH_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("CODEGENIE_BATCH_MAX_CONCURRENCY", "16"))
+
+# Upstream request rate shared by all batches (requests per second, 0 = no limit)
+BATCH_RATE = float(os.getenv("CODEGENIE_BATCH_RATE", "5"))
+BATCH_BURST = float(os.getenv("CODEGENIE_BATCH_BURST", "5"))
+
+# Function to get the process-wide rate limiter for batch requests
+@st.cache_resource(show_spinner=False)
+def get_batch_rate_limiter(rate=BATCH_RATE, burst=BATCH_BURST):
+    return TokenBucket(rate, burst)
+
+# Function to read the prompts of an uploaded batch file. CSV files need a
+# header with a "prompt" column; JSONL files hold one object (or string) per
+# line. "language" and "model" are optional on every row.
+# Raises ValueError with the offending line when the file can't be used.
+def parse_batch_file(file_name, data):
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("The batch file must be UTF-8 encoded.")
+
+    rows = []
+    if file_name.lower().endswith(".csv"):
+        reader = csv.DictReader(io.StringIO(text))
+        fields = {name.strip().lower(): name for name in reader.fieldnames or []}
+        if "prompt" not in fields:
+            raise ValueError("The CSV file needs a header row with a \"prompt\" column.")
+        for record in reader:
+            rows.append((reader.line_num, {name: (record.get(original) or "").strip() for name, original in fields.items()}))
+    else:
+        for line_number, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise ValueError(f"Line {line_number} is not valid JSON.")
+            if isinstance(record, str):
+                record = {"prompt": record}
+            if not isinstance(record, dict):
+                raise ValueError(f"Line {line_number} must be a JSON object or string.")
+            rows.append((line_number, {str(name).lower(): str(value).strip() for name, value in record.items() if value is not None}))
+
+    prompts = []
+    for line_number, record in rows:
+        if not record.get("prompt"):
+            continue
+        prompts.append({
+            "line": line_number,
+            "prompt": record["prompt"],
+            "language": record.get("language", ""),
+            "model": record.get("model", "")
+        })
+
+    if not prompts:
+        raise ValueError("The batch file has no prompts.")
+    if len(prompts) > BATCH_MAX_ROWS:
+        raise ValueError(f"The batch file has {len(prompts)} prompts; the limit is {BATCH_MAX_ROWS}.")
+    return prompts
+
+# Function to settle the language and model of every batch row. Rows without
+# a language get the detected one; rows without a model use `default_model_id`.
+# A model may be given by its display name or its id.
+def resolve_batch_rows(prompts, default_model_id, model_options):
+    rows = []
+    for index, prompt in enumerate(prompts):
+        if prompt["language"]:
+            language = normalize_language(prompt["language"])
+            if language is None:
+                raise ValueError(f"Line {prompt['line']}: unsupported language \"{prompt['language']}\".")
+        else:
+            language = detect_language_from_prompt(prompt["prompt"])
+
+        if prompt["model"]:
+            model_id = resolve_model_id(prompt["model"], model_options)
+            if model_id is None:
+                raise ValueError(f"Line {prompt['line']}: unknown model \"{prompt['model']}\".")
+        else:
+            model_id = default_model_id
+
+        rows.append({"index": index, "prompt": prompt["prompt"], "language": language, "model_id": model_id})
+    return rows
+
+# Function to generate the code for one batch row, from the cache if possible.
+# Successful results are cached and saved to the user's history.
+def run_batch_row(request, row):
+    row_request = dict(
+        request,
+        user_prompt=row["prompt"],
+        language=row["language"],
+        include_tests=False,
+        code_style="Standard"
+    )
+    cache_key = make_cache_key(row["model_id"], row["language"], row["prompt"], False, "Standard", request["max_length"], request["temperature"])
+    code = get_generation_cache().get(cache_key)
+    error = None
+    if code is None:
+        if not admit_request(request["username"], [row["model_id"]]):
+            return None, RATE_LIMITED_MESSAGE
+        get_batch_rate_limiter().acquire()
+        with span("generate", row["model_id"], row["language"]):
+            code, error = generate_code_api(row["prompt"], row["language"], row["model_id"], request["max_length"], request["temperature"], request["api_key"])
+    if code:
+        store_generation_result(row_request, row["model_id"], code)
+        return code, None
+    return None, error or "The model returned an empty response."
+
+# Function to run a batch in a background worker. Rows are generated on a pool
+# of `concurrency` threads and each result is published as soon as it is done,
+# so the page can show progress.
+def run_batch_job(job_id, request):
+    queue = get_job_queue()
+    rows = request["rows"]
+    concurrency = max(1, min(request["concurrency"], BATCH_MAX_CONCURRENCY, len(rows)))
+
+    def run_row(row):
+        try:
+            code, error = run_batch_row(request, row)
+        except Exception as e:
+            code, error = None, f"Error: {str(e)}"
+        queue.set_result(job_id, row["index"], code, error)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="codegenie-batch") as executor:
+        list(executor.map(run_row, rows))
+
+# Function to queue a batch on the batch workers. Returns (job_id, None), or
+# (None, reason) when it can't be queued. Rows pass admission control one by
+# one as they run.
+def submit_batch_job(request):
+    return get_job_queue().submit(run_batch_job, request, username=request["username"], pool="batch")
+
+# Function to turn a prompt into a short file name
+def batch_file_name(row):
+    slug = re.sub(r"[^a-z0-9]+", "_", row["prompt"].lower())[:40].strip("_") or "code"
+    return f"{row['index'] + 1:03d}_{slug}.{file_extension(row['language'])}"
+
+# Function to pack the results of a batch into a zip archive, with a report
+# listing every row and why it failed, if it did
+def build_batch_zip(rows, results):
+    report = io.StringIO()
+    writer = csv.writer(report)
+    writer.writerow(["row", "prompt", "language", "model", "file", "error"])
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for row in rows:
+            result = results.get(row["index"]) or {"code": None, "error": "Not generated."}
+            file_name = batch_file_name(row) if result["code"] else ""
+            if result["code"]:
+                zip_file.writestr(file_name, result["code"])
+            writer.writerow([row["index"] + 1, row["prompt"], row["language"], row["model_id"], file_name, result["error"] or ""])
+        zip_file.writestr("batch_report.csv", report.getvalue())
+    return archive.getvalue()
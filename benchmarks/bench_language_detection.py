@@ -0,0 +1,92 @@
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from language_detection import detect_language_from_prompt, rank_languages, detect_languages_batch
+
+# Sample prompts covering explicit mentions, ecosystem keywords and no signal at all
+PROMPTS = [
+    "addition of two numbers",
+    "reverse a string",
+    "Create a Python function that takes a list of numbers and returns the average of the even numbers.",
+    "Create an HTML page with a responsive navbar and contact form using CSS.",
+    "write a rest api in go with goroutines and a postgres connection pool",
+    "sort a vector<int> in c++ using the stl",
+    "a matlab script that inverts a matrix",
+    "select all users from the orders table where the total is above 100",
+    "a react component in typescript that renders a paginated table",
+    "bash script to rotate log files on linux"
+]
+
+# Reference implementation: the per-call regex table that app1.py used to rebuild on every call
+def legacy_detect_language_from_prompt(prompt):
+    # Dictionary of programming languages and their related keywords/patterns
+    language_patterns = {
+        "Python": [r'\bpython\b', r'\.py\b', r'\bpip\b', r'\bdjango\b', r'\bflask\b', r'\bnumpy\b', r'\bpandas\b'],
+        "JavaScript": [r'\bjavascript\b', r'\bjs\b', r'\.js\b', r'\bnode\.js\b', r'\bnpm\b', r'\breact\b', r'\bangular\b', r'\bvue\b'],
+        "Java": [r'\bjava\b', r'\.java\b', r'\bspring\b', r'\bmaven\b', r'\bhibernate\b'],
+        "C++": [r'\bc\+\+\b', r'\.cpp\b', r'\bcmake\b', r'\bstl\b', r'\bvector<\b'],
+        "C": [r'\bc\b', r'\.c\b', r'\bpointer\b', r'\bmalloc\b', r'\bstdio\b', r'\bstdlib\b', r'\bprintf\b'],
+        "C#": [r'\bc#\b', r'\.cs\b', r'\bdotnet\b', r'\basync\b', r'\bawait\b', r'\busing\b'],
+        "Go": [r'\bgo\b', r'\bgolang\b', r'\.go\b', r'\bgoroutine\b'],
+        "Ruby": [r'\bruby\b', r'\.rb\b', r'\brails\b', r'\bgem\b'],
+        "PHP": [r'\bphp\b', r'\.php\b', r'\blaravel\b', r'\bsymphony\b'],
+        "Swift": [r'\bswift\b', r'\.swift\b', r'\bios\b', r'\bxcode\b', r'\bcocoa\b'],
+        "Kotlin": [r'\bkotlin\b', r'\.kt\b', r'\bandroid\b'],
+        "Rust": [r'\brust\b', r'\.rs\b', r'\bcargo\b', r'\bcrate\b'],
+        "TypeScript": [r'\btypescript\b', r'\bts\b', r'\.ts\b', r'\bangular\b', r'\bvue\b'],
+        "HTML": [r'\bhtml\b', r'\.html\b', r'\bhtml5\b', r'\bdiv\b', r'\bspan\b', r'\binput\b', r'\bform\b', r'\bmarkup\b'],
+        "CSS": [r'\bcss\b', r'\.css\b', r'\bstylesheet\b', r'\bstyle\b', r'\bflex\b', r'\bgrid\b', r'\bbootstrap\b'],
+        "SQL": [r'\bsql\b', r'\bmysql\b', r'\bpostgresql\b', r'\bselect\b', r'\bfrom\b', r'\bwhere\b', r'\bgroup by\b'],
+        "Shell/Bash": [r'\bbash\b', r'\bshell\b', r'\.sh\b', r'\blinux\b', r'\bunix\b', r'\bscript\b'],
+        "Perl": [r'\bperl\b', r'\.pl\b', r'\bregex\b'],
+        "R": [r'\br\b', r'\.r\b', r'\bstatistics\b', r'\bggplot\b', r'\bdplyr\b'],
+        "MATLAB": [r'\bmatlab\b', r'\.m\b', r'\bmatrix\b', r'\boctave\b']
+    }
+    
+    # Check for explicit language mentions
+    prompt_lower = prompt.lower()
+    for language, patterns in language_patterns.items():
+        for pattern in patterns:
+            if re.search(pattern, prompt_lower, re.IGNORECASE):
+                return language
+    
+    # Look for language mentions like "in Python" or "using JavaScript"
+    for language in language_patterns.keys():
+        if f"in {language.lower()}" in prompt_lower or f"using {language.lower()}" in prompt_lower:
+            return language
+        
+    # Default to Python if no language is detected
+    return "Python"
+
+# Function to time one detector over all sample prompts, in microseconds per prompt
+def time_per_prompt(detector, number):
+    total = timeit.timeit(lambda: [detector(prompt) for prompt in PROMPTS], number=number)
+    return total / (number * len(PROMPTS)) * 1e6
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    legacy_us = time_per_prompt(legacy_detect_language_from_prompt, number)
+    compiled_us = time_per_prompt(detect_language_from_prompt, number)
+    ranked_us = time_per_prompt(rank_languages, number)
+    batch_total = timeit.timeit(lambda: detect_languages_batch(PROMPTS), number=number)
+    batch_us = batch_total / (number * len(PROMPTS)) * 1e6
+
+    print(f"{'detector':<40}{'us/prompt':>12}")
+    print(f"{'legacy detect_language_from_prompt':<40}{legacy_us:>12.2f}")
+    print(f"{'compiled detect_language_from_prompt':<40}{compiled_us:>12.2f}")
+    print(f"{'compiled rank_languages':<40}{ranked_us:>12.2f}")
+    print(f"{'compiled detect_languages_batch':<40}{batch_us:>12.2f}")
+    print(f"speedup: {legacy_us / compiled_us:.1f}x")
+
+    print()
+    print(f"{'prompt':<60}{'legacy':<14}{'compiled':<14}")
+    for prompt in PROMPTS:
+        print(f"{prompt[:58]:<60}{legacy_detect_language_from_prompt(prompt):<14}{detect_language_from_prompt(prompt):<14}")
+
+if __name__ == "__main__":
+    main()
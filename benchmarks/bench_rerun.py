@@ -0,0 +1,167 @@
+import argparse
+import atexit
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Run the app against scratch stores and the canned test backend
+SCRATCH_DIR = tempfile.mkdtemp(prefix="codegenie-rerun-")
+atexit.register(shutil.rmtree, SCRATCH_DIR, True)
+os.environ["CODEGENIE_HISTORY_DB"] = os.path.join(SCRATCH_DIR, "history.db")
+os.environ["CODEGENIE_USER_DB"] = os.path.join(SCRATCH_DIR, "users.db")
+os.environ["CODEGENIE_CACHE_DIR"] = os.path.join(SCRATCH_DIR, "cache")
+os.environ["CODEGENIE_FAKE_BACKEND"] = "true"
+os.environ["CODEGENIE_METRICS_PORT"] = "0"
+
+# Pick up the app's .streamlit/config.toml, as `streamlit run` from the repo does
+os.chdir(ROOT)
+
+import streamlit.logger
+streamlit.logger.set_log_level("error")
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.runtime.scriptrunner_utils.script_run_context import ScriptRunContext
+
+# Default per-rerun CPU budget in milliseconds for a logged-in page
+RERUN_BUDGET_MS = float(os.getenv("CODEGENIE_RERUN_BUDGET_MS", "25"))
+
+# AppTest compiles the script again on every run, while the Streamlit server
+# compiles it once per process. Share the bytecode so only script execution
+# is measured, as in production.
+BYTECODE = {}
+compile_script = ScriptCache.get_bytecode
+
+def cached_bytecode(self, script_path):
+    if script_path not in BYTECODE:
+        BYTECODE[script_path] = compile_script(self, script_path)
+    return BYTECODE[script_path]
+
+ScriptCache.get_bytecode = cached_bytecode
+
+# CPU time the script thread spent in each run
+SCRIPT_CPU = []
+run_script = LocalScriptRunner._run_script
+
+def timed_run_script(self, *args, **kwargs):
+    started = time.thread_time()
+    try:
+        return run_script(self, *args, **kwargs)
+    finally:
+        SCRIPT_CPU.append(time.thread_time() - started)
+
+LocalScriptRunner._run_script = timed_run_script
+
+# Bytes of ForwardMsgs sent to the browser, simulating its message cache: a
+# large element the browser already has is sent as a short hash reference
+SENT_BYTES = []
+CLIENT_CACHE = set()
+enqueue_message = ScriptRunContext.enqueue
+
+def measured_enqueue(self, msg):
+    self.cached_message_hashes = frozenset(CLIENT_CACHE)
+    send = self._enqueue
+
+    def record(sent):
+        SENT_BYTES.append(sent.ByteSize())
+        if sent.metadata.cacheable:
+            CLIENT_CACHE.add(sent.hash)
+        send(sent)
+
+    self._enqueue = record
+    try:
+        enqueue_message(self, msg)
+    finally:
+        self._enqueue = send
+
+ScriptRunContext.enqueue = measured_enqueue
+
+# Function to start a logged-in session of the app (a new browser tab)
+def start_session():
+    CLIENT_CACHE.clear()
+    app = AppTest.from_file(os.path.join(ROOT, "app1.py"), default_timeout=60)
+    app.session_state["authenticated"] = True
+    app.session_state["username"] = "bench"
+    app.run()
+    return app
+
+# Function to put a finished generation on the page
+def show_result(app):
+    [selectbox for selectbox in app.selectbox if selectbox.label == "Select AI Model"][0].set_value("Test Model (canned output)")
+    app.text_area[0].input("Create a Python function that returns the average of the even numbers in a list")
+    [button for button in app.button if "Generate" in button.label][0].click()
+    app.run()
+    for _ in range(100):
+        if not app.session_state["generation"]["job_id"]:
+            break
+        time.sleep(0.05)
+        app.run()
+    return app
+
+# Function to time plain reruns of a session (what every widget interaction
+# costs): CPU time of the script thread and wall time including the harness
+def time_reruns(app, reruns):
+    wall = []
+    sent = []
+    del SCRIPT_CPU[:]
+    for _ in range(reruns):
+        del SENT_BYTES[:]
+        wall_started = time.perf_counter()
+        app.run()
+        wall.append(time.perf_counter() - wall_started)
+        sent.append(sum(SENT_BYTES))
+    wall.sort()
+    sent.sort()
+    cpu = sorted(SCRIPT_CPU)
+    return {
+        "reruns": reruns,
+        "bytes_p50": sent[len(sent) // 2],
+        "wall_p50_ms": wall[len(wall) // 2] * 1000,
+        "cpu_p50_ms": cpu[len(cpu) // 2] * 1000,
+        "cpu_p95_ms": cpu[min(len(cpu) - 1, int(len(cpu) * 0.95))] * 1000
+    }
+
+SCENARIOS = {
+    "idle": lambda: start_session(),
+    "result": lambda: show_result(start_session())
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the CPU cost and bytes sent per Streamlit rerun of app1.py and check the CPU time against a budget.")
+    parser.add_argument("--reruns", type=int, default=30)
+    parser.add_argument("--budget-ms", type=float, default=RERUN_BUDGET_MS, help="maximum p50 CPU time per rerun")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    for name, setup in SCENARIOS.items():
+        app = setup()
+        if app.exception:
+            raise SystemExit(f"{name}: the app raised {app.exception[0].value}")
+        stats = time_reruns(app, args.reruns)
+        results.append({"scenario": name, "budget_ms": args.budget_ms, "within_budget": stats["cpu_p50_ms"] <= args.budget_ms, **stats})
+        print(f"{name:<10}{stats['cpu_p50_ms']:>10.1f} ms cpu p50{stats['wall_p50_ms']:>10.1f} ms wall p50{stats['bytes_p50']:>10} bytes sent", file=sys.stderr)
+
+    output = json.dumps({"results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    over_budget = [result["scenario"] for result in results if not result["within_budget"]]
+    if over_budget:
+        print(f"Over the {args.budget_ms:g} ms rerun budget: {', '.join(over_budget)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
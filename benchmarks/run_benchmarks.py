@@ -0,0 +1,448 @@
+import argparse
+import atexit
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The stores read their locations at import time, so point them at a scratch
+# directory before anything from the app is imported
+SCRATCH_DIR = tempfile.mkdtemp(prefix="codegenie-bench-")
+atexit.register(shutil.rmtree, SCRATCH_DIR, True)
+os.environ["CODEGENIE_HISTORY_DB"] = os.path.join(SCRATCH_DIR, "history.db")
+os.environ["CODEGENIE_USER_DB"] = os.path.join(SCRATCH_DIR, "users.db")
+os.environ["CODEGENIE_CACHE_DIR"] = os.path.join(SCRATCH_DIR, "cache")
+os.environ["CODEGENIE_MAX_RETRIES"] = "0"
+os.environ["CODEGENIE_BATCH_RATE"] = "0"
+os.environ["CODEGENIE_USER_RATE"] = "0"
+os.environ["CODEGENIE_MODEL_RATE"] = "0"
+
+import streamlit.logger
+streamlit.logger.set_log_level("error")
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+import backends
+from language_detection import detect_language_from_prompt
+from code_explainer import analyze_code, explain_code, render_explanation
+from inference import build_prompt, extract_code, generate_code_api, stream_code_api, call_code_api, generate_code_candidates
+from syntax_check import check_syntax
+from batch import submit_batch_job
+from jobs import get_job_queue
+from api_server import create_api_server
+from history_store import get_connection as get_history_connection, save_history_entry, list_history_page, search_history
+from user_store import get_connection as get_user_connection, write_transaction, create_api_token
+from login import authenticate_user, register_user
+
+# Sample inputs shared by the benchmarks
+PROMPTS = [
+    "addition of two numbers",
+    "Create a Python function that takes a list of numbers and returns the average of the even numbers.",
+    "Create an HTML page with a responsive navbar and contact form using CSS.",
+    "write a rest api in go with goroutines and a postgres connection pool",
+    "select all users from the orders table where the total is above 100",
+    "a react component in typescript that renders a paginated table"
+]
+
+SAMPLE_CODE = '''import json
+
+class Inventory:
+    def __init__(self, path):
+        self.path = path
+        self.items = {}
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                self.items = json.load(f)
+        except FileNotFoundError:
+            self.items = {}
+
+    def total(self):
+        result = 0
+        for name, item in self.items.items():
+            if item["count"] > 0:
+                result += item["count"] * item["price"]
+        return result
+'''
+
+SAMPLE_COMPLETION = "\n```python\n" + SAMPLE_CODE + "```\nThis code defines an Inventory class."
+
+# What a sampled completion that doesn't parse looks like
+BROKEN_COMPLETION = SAMPLE_COMPLETION.replace("def total(self):", "def total(self:")
+
+# What a model that ignores stop sequences keeps writing after the code block
+SAMPLE_CHATTER = "".join(f"\nStep {i}: the method on line {i} updates the inventory." for i in range(40))
+
+HISTORY_SIZES = [1000, 10000, 100000]
+USER_SIZES = [1000, 100000]
+PASSWORD_HASH = "240be518fabd2724ddb6f04eeb1da5967448d7e831c08c8fa822809f74c720a9"
+
+# Function to time a callable and summarize the per-call latencies.
+# Runs at least `iterations` calls and keeps going until `min_time` seconds
+# have passed, so fast functions still get a stable sample.
+def measure(fn, iterations=100, min_time=0.2, warmup=3):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < iterations or (time.perf_counter() - started < min_time and len(samples) < iterations * 100):
+        begin = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - begin)
+    samples.sort()
+    return {
+        "iterations": len(samples),
+        "mean_us": statistics.fmean(samples) * 1e6,
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p95_us": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6,
+        "min_us": samples[0] * 1e6
+    }
+
+# Fake Hugging Face inference endpoint: returns a fixed completion (after the
+# echoed prompt unless return_full_text is off) after a configurable delay,
+# as JSON or as server-sent events
+class FakeInferenceHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    # Streams SAMPLE_CHATTER after the completion, one line per `line_delay`
+    chatter = False
+    line_delay = 0.0
+    # Answers with BROKEN_COMPLETION unless the request's seed is odd
+    flaky = False
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.latency)
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            completion = SAMPLE_COMPLETION + (SAMPLE_CHATTER if self.chatter else "")
+            try:
+                for line in completion.splitlines(keepends=True):
+                    event = {"token": {"text": line, "special": False}}
+                    self.wfile.write(f"data:{json.dumps(event)}\n\n".encode())
+                    time.sleep(self.line_delay)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped reading once it had the code
+                pass
+            return
+
+        full_text = body.get("parameters", {}).get("return_full_text", True)
+        seed = body.get("parameters", {}).get("seed")
+        completion = BROKEN_COMPLETION if self.flaky and (seed is None or seed % 2 == 0) else SAMPLE_COMPLETION
+        output = json.dumps([{"generated_text": (body["inputs"] if full_text else "") + completion}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(output)))
+        self.end_headers()
+        self.wfile.write(output)
+
+# Function to start the fake inference server on a free local port
+def start_fake_server(latency):
+    FakeInferenceHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeInferenceHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# Function to fail the benchmark on a call that returned an error, so a
+# broken setup isn't timed as fast failures
+def checked(result):
+    code, error_msg = result
+    if error_msg:
+        raise RuntimeError(error_msg)
+    return code
+
+# Function to read a whole code stream, failing on an error
+def checked_stream(stream):
+    code = None
+    for code, error_msg in stream:
+        checked((code, error_msg))
+    return code
+
+def bench_language_detection(args):
+    yield "detect_language_from_prompt", {}, measure(lambda: [detect_language_from_prompt(prompt) for prompt in PROMPTS], args.iterations)
+
+# Reference implementation: the substring scan explain_code used before the
+# per-language analyzer, lowercasing the code again for every keyword
+LEGACY_FEATURES = {"Python": ["def", "class", "import", "with", "as", "try", "except", "list", "dict"]}
+LEGACY_ELEMENTS = {
+    "import": "This section imports necessary libraries and modules.",
+    "include": "This includes necessary header files.",
+    "def": "This defines a function that implements the requested functionality.",
+    "function": "This defines a function that implements the requested functionality.",
+    "class": "This defines a class to organize the functionality.",
+    "for": "This loop iterates through the input data.",
+    "while": "This loop executes code repeatedly until a condition is false.",
+    "if": "This condition checks for specific cases.",
+    "return": "This returns the final result from the function.",
+    "try": "This implements error handling for the code.",
+    "switch": "This provides multiple case conditions for different scenarios.",
+    "struct": "This defines a custom data structure.",
+    "constructor": "This initializes the object when it's created."
+}
+
+def legacy_explain_code(code, language):
+    explanation = f"<div class=\"explanation\"><h3>{language} Code Analysis:</h3>"
+    if language in LEGACY_FEATURES:
+        found_features = [keyword for keyword in LEGACY_FEATURES[language] if keyword in code.lower()]
+        if found_features:
+            explanation += f"<p>The code utilizes {language}-specific features like: {', '.join(found_features)}</p>"
+    explanation += "<h3>Code Structure Breakdown:</h3><ul>"
+    for key, desc in LEGACY_ELEMENTS.items():
+        if key in code.lower():
+            explanation += f"<li><strong>{key.capitalize()}</strong>: {desc}</li>"
+    return explanation + "</ul></div>"
+
+def bench_explain_code(args):
+    for lines in [20, 1000, 10000]:
+        code = (SAMPLE_CODE * (lines // 20 + 1))
+        code = "\n".join(code.split("\n")[:lines])
+        # render_explanation is the first explanation of some code, against
+        # the old substring scan; explain_code the repeats served from the
+        # explanation cache
+        yield "explain_code_legacy", {"lines": lines}, measure(lambda: legacy_explain_code(code, "Python"), args.iterations)
+        yield "analyze_code", {"lines": lines}, measure(lambda: analyze_code(code, "Python"), args.iterations)
+        yield "render_explanation", {"lines": lines}, measure(lambda: render_explanation(code, "Python"), args.iterations)
+        yield "explain_code", {"lines": lines}, measure(lambda: explain_code(code, "Python"), args.iterations)
+
+def bench_inference(args):
+    yield "build_prompt", {}, measure(lambda: [build_prompt(prompt, "Python", "codellama/CodeLlama-7b-Instruct-hf") for prompt in PROMPTS], args.iterations)
+    yield "extract_code", {}, measure(lambda: extract_code(SAMPLE_COMPLETION), args.iterations)
+
+    server = start_fake_server(args.latency / 1000)
+    backends.API_BASE_URL = f"http://127.0.0.1:{server.server_port}/models"
+    params = {"latency_ms": args.latency}
+    try:
+        yield "generate_code_api", params, measure(lambda: checked(generate_code_api(PROMPTS[1], "Python", "bench/model", 500, 0.7, "key")), args.iterations)
+        yield "stream_code_api", params, measure(lambda: checked_stream(stream_code_api(PROMPTS[1], "Python", "bench/model", 500, 0.7, "key")), args.iterations)
+
+        # A server that keeps streaming 40 lines of chatter after the code,
+        # 1 ms per line, when the stream isn't closed at the closing fence
+        FakeInferenceHandler.chatter = True
+        FakeInferenceHandler.line_delay = 0.001
+        yield "stream_code_api_chatter", params, measure(lambda: checked_stream(stream_code_api(PROMPTS[1], "Python", "bench/model", 500, 0.7, "key")), args.iterations)
+    finally:
+        FakeInferenceHandler.chatter = False
+        FakeInferenceHandler.line_delay = 0.0
+        server.shutdown()
+
+# Times how long it takes to get code that parses from a server where half
+# the samples don't: sampling again after each broken answer (what a user
+# re-clicking Generate does) against sampling candidates in parallel
+def bench_candidates(args):
+    server = start_fake_server(max(args.latency, 50) / 1000)
+    backends.API_BASE_URL = f"http://127.0.0.1:{server.server_port}/models"
+    FakeInferenceHandler.flaky = True
+    params = {"latency_ms": max(args.latency, 50)}
+
+    def retry_until_valid():
+        while True:
+            code = checked(call_code_api(PROMPTS[1], "Python", "bench/model", 500, 0.7, "key", seed=random.randrange(2 ** 31)))
+            if check_syntax(code, "Python")[0]:
+                return code
+
+    try:
+        yield "check_syntax", {"language": "Python"}, measure(lambda: check_syntax(SAMPLE_CODE, "Python"), args.iterations)
+        yield "time_to_valid_code", dict(params, candidates="retry"), measure(retry_until_valid, iterations=20, min_time=0, warmup=1)
+        for candidates in [2, 3, 4]:
+            yield "time_to_valid_code", dict(params, candidates=candidates), measure(lambda: checked(generate_code_candidates(PROMPTS[1], "Python", "bench/model", 500, 0.7, "key", candidates)), iterations=20, min_time=0, warmup=1)
+    finally:
+        FakeInferenceHandler.flaky = False
+        server.shutdown()
+
+# Times whole batches of BATCH_ROWS prompts at increasing concurrency. Every
+# batch uses new prompts so the generation cache never answers.
+BATCH_ROWS = 16
+
+def bench_batch(args):
+    server = start_fake_server(max(args.latency, 50) / 1000)
+    backends.API_BASE_URL = f"http://127.0.0.1:{server.server_port}/models"
+    counter = iter(range(10 ** 9))
+
+    def run_batch(concurrency):
+        batch = next(counter)
+        rows = [{"index": i, "prompt": f"{PROMPTS[1]} #{batch}-{i}", "language": "Python", "model_id": "bench/model"} for i in range(BATCH_ROWS)]
+        job_id = checked(submit_batch_job({"username": "bench", "rows": rows, "concurrency": concurrency, "max_length": 500, "temperature": 0.7, "api_key": "key"}))
+        while (job := get_job_queue().get(job_id))["status"] not in ("done", "failed"):
+            time.sleep(0.001)
+        errors = [result["error"] for result in job["results"].values() if result["error"]]
+        if errors or len(job["results"]) < BATCH_ROWS:
+            raise RuntimeError(f"{len(errors)} of {BATCH_ROWS} batch rows failed: {errors[:1]}")
+
+    try:
+        for concurrency in [1, 4, 16]:
+            stats = measure(lambda: run_batch(concurrency), iterations=3, min_time=0, warmup=1)
+            stats["rows_per_second"] = BATCH_ROWS / (stats["p50_us"] / 1e6)
+            yield "batch", {"rows": BATCH_ROWS, "concurrency": concurrency, "latency_ms": max(args.latency, 50)}, stats
+    finally:
+        server.shutdown()
+
+# Times requests to the headless API over one kept-alive connection, as an
+# editor plugin would make them
+def bench_api(args):
+    inference_server = start_fake_server(args.latency / 1000)
+    backends.API_BASE_URL = f"http://127.0.0.1:{inference_server.server_port}/models"
+    api_server = create_api_server("127.0.0.1", 0)
+    threading.Thread(target=api_server.serve_forever, daemon=True).start()
+    connection = http.client.HTTPConnection("127.0.0.1", api_server.server_port)
+    headers = {"Authorization": f"Bearer {create_api_token('bench')}", "Content-Type": "application/json"}
+
+    def post(path, body):
+        connection.request("POST", path, body=json.dumps(body), headers=headers)
+        response = connection.getresponse()
+        response.read()
+        assert response.status == 200, response.status
+
+    try:
+        yield "api_detect_language", {}, measure(lambda: post("/api/detect-language", {"prompt": PROMPTS[3]}), args.iterations)
+        yield "api_generate_cached", {}, measure(lambda: post("/api/generate", {"prompt": PROMPTS[1], "model": "codellama/CodeLlama-7b-Instruct-hf"}), args.iterations)
+    finally:
+        connection.close()
+        api_server.shutdown()
+        inference_server.shutdown()
+
+# Function to grow the history table to `size` entries for one user
+def fill_history(username, size):
+    connection = get_history_connection()
+    existing = connection.execute("SELECT COUNT(*) FROM history WHERE username = ?", (username,)).fetchone()[0]
+    start = datetime(2024, 1, 1)
+    rows = [
+        (username, f"{PROMPTS[i % len(PROMPTS)]} #{i}", "Python", SAMPLE_CODE, (start + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S"))
+        for i in range(existing, size)
+    ]
+    with connection:
+        connection.executemany("INSERT INTO history (username, prompt, language, code, created_at) VALUES (?, ?, ?, ?, ?)", rows)
+
+def bench_history(args):
+    for size in args.history_sizes:
+        fill_history("bench", size)
+        params = {"entries": size}
+        yield "save_code_history", params, measure(lambda: save_history_entry("bench", PROMPTS[0], "Python", SAMPLE_CODE), args.iterations)
+        yield "history_first_page", params, measure(lambda: list_history_page("bench"), args.iterations)
+        _, cursor = list_history_page("bench", limit=size // 2)
+        yield "history_deep_page", params, measure(lambda: list_history_page("bench", cursor=cursor), args.iterations)
+        yield "history_search", params, measure(lambda: search_history("bench", "average even"), args.iterations)
+
+# Function to grow the users table to `size` accounts (password "admin123")
+def fill_users(size):
+    connection = get_user_connection()
+    existing = connection.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    rows = [(f"user{i}", PASSWORD_HASH, f"user{i}@example.com", "2024-01-01 00:00:00") for i in range(existing, size)]
+    with write_transaction(connection):
+        connection.executemany("INSERT INTO users (username, password, email, creation_date) VALUES (?, ?, ?, ?)", rows)
+
+def bench_users(args):
+    counter = iter(range(10 ** 9))
+
+    def register_new_user():
+        name = f"new{next(counter)}"
+        return register_user(name, "secret", f"{name}@example.com")
+
+    for size in args.user_sizes:
+        fill_users(size)
+        params = {"users": size}
+        yield "authenticate_user", params, measure(lambda: authenticate_user(f"user{size // 2}", "admin123"), args.iterations)
+        yield "authenticate_user_unknown", params, measure(lambda: authenticate_user("nobody", "admin123"), args.iterations)
+        yield "register_user", params, measure(register_new_user, args.iterations)
+
+BENCHMARKS = {
+    "language": bench_language_detection,
+    "explain": bench_explain_code,
+    "inference": bench_inference,
+    "candidates": bench_candidates,
+    "batch": bench_batch,
+    "api": bench_api,
+    "history": bench_history,
+    "users": bench_users
+}
+
+# Function to describe the environment the results were measured in
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+# Function to identify a result across runs, e.g. "history_search[entries=10000]"
+def result_key(result):
+    params = ",".join(f"{name}={value}" for name, value in sorted(result["params"].items()))
+    return f"{result['name']}[{params}]" if params else result["name"]
+
+# Function to flag results that got slower than a baseline run by more than
+# `threshold` (a fraction). Compares p50, which is the least noisy statistic.
+def find_regressions(results, baseline, threshold):
+    previous = {result_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get(result_key(result))
+        if before and result["p50_us"] > before["p50_us"] * (1 + threshold):
+            regressions.append({
+                "benchmark": result_key(result),
+                "baseline_p50_us": before["p50_us"],
+                "p50_us": result["p50_us"],
+                "change": result["p50_us"] / before["p50_us"] - 1
+            })
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CodeGenie hot paths and write the results as JSON.")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmark groups to run (default: all)")
+    parser.add_argument("--iterations", type=int, default=50, help="minimum timed calls per benchmark")
+    parser.add_argument("--latency", type=float, default=0, help="fake inference server latency in milliseconds")
+    parser.add_argument("--history-sizes", type=int, nargs="+", default=HISTORY_SIZES)
+    parser.add_argument("--user-sizes", type=int, nargs="+", default=USER_SIZES)
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="slowdown that counts as a regression (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = []
+    for group in args.only or list(BENCHMARKS):
+        for name, params, stats in BENCHMARKS[group](args):
+            result = {"group": group, "name": name, "params": params, **stats}
+            results.append(result)
+            print(f"{result_key(result):<45}{stats['p50_us']:>14.1f} us p50{stats['p95_us']:>14.1f} us p95", file=sys.stderr)
+
+    report = {"environment": environment(), "results": results}
+    if args.compare:
+        with open(args.compare, "r") as f:
+            report["regressions"] = find_regressions(results, json.load(f), args.threshold)
+        for regression in report["regressions"]:
+            print(f"REGRESSION {regression['benchmark']}: {regression['change']:+.0%}", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    # A non-zero exit lets CI fail the build on a regression
+    sys.exit(1 if report.get("regressions") else 0)
+
+if __name__ == "__main__":
+    main()
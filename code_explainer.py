@@ -0,0 +1,331 @@
+import streamlit as st
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# Explanations kept in memory, keyed by a hash of the language and code
+EXPLAIN_CACHE_ENTRIES = int(os.getenv("CODEGENIE_EXPLAIN_CACHE_ENTRIES", "256"))
+
+# Language-specific features to look for in explanations: label -> triggers.
+# A trigger is a keyword or identifier, or a literal piece of syntax such as
+# "<-" or "group by" (a space matches any run of whitespace).
+LANGUAGE_FEATURES = {
+    "HTML": {
+        "html": ["<html"], "body": ["<body"], "div": ["<div"], "span": ["<span"],
+        "form": ["<form"], "input": ["<input"], "button": ["<button"], "table": ["<table"],
+        "script": ["<script"], "style": ["<style", "style="]
+    },
+    "CSS": {
+        "margin": ["margin"], "padding": ["padding"], "color": ["color"], "background": ["background"],
+        "flex": ["flex"], "grid": ["grid"], "media queries": ["@media"], "animations": ["@keyframes", "animation"],
+        "transitions": ["transition"], "custom properties": ["var("]
+    },
+    "JavaScript": {
+        "function": ["function"], "const": ["const"], "let": ["let"], "var": ["var"],
+        "document": ["document"], "window": ["window"], "event": ["event", "addeventlistener"],
+        "callback": ["callback", "cb"], "arrow functions": ["=>"], "async/await": ["async", "await"],
+        "promise": ["promise"]
+    },
+    "TypeScript": {
+        "interface": ["interface"], "type": ["type"], "enum": ["enum"], "const": ["const"], "let": ["let"],
+        "arrow functions": ["=>"], "async/await": ["async", "await"],
+        "access modifiers": ["public", "private", "protected", "readonly"], "generics": ["array<", "promise<"]
+    },
+    "Python": {
+        "def": ["def"], "class": ["class"], "import": ["import"], "with": ["with"], "as": ["as"],
+        "try": ["try"], "except": ["except"], "list": ["list"], "dict": ["dict"], "lambda": ["lambda"],
+        "generator": ["yield"], "decorator": ["@"], "async/await": ["async", "await"]
+    },
+    "Java": {
+        "class": ["class"], "public": ["public"], "private": ["private"], "static": ["static"],
+        "void": ["void"], "interface": ["interface"], "extends": ["extends"], "implements": ["implements"],
+        "annotation": ["@"], "throws": ["throws"], "generics": ["list<", "map<", "set<"]
+    },
+    "C++": {
+        "class": ["class"], "template": ["template"], "namespace": ["namespace"], "vector": ["vector"],
+        "map": ["map"], "cout": ["cout"], "cin": ["cin"], "pointer": ["->", "nullptr"],
+        "smart pointer": ["unique_ptr", "shared_ptr"], "standard library": ["std::"], "auto": ["auto"]
+    },
+    "C": {
+        "pointer": ["->", "null"], "malloc": ["malloc", "calloc", "realloc"], "free": ["free"],
+        "struct": ["struct"], "printf": ["printf"], "scanf": ["scanf"], "include": ["#include"],
+        "macro": ["#define"]
+    },
+    "C#": {
+        "class": ["class"], "using": ["using"], "namespace": ["namespace"], "public": ["public"],
+        "private": ["private"], "async": ["async"], "await": ["await"], "generic collections": ["list<", "dictionary<"],
+        "properties": ["get;", "set;"], "LINQ": ["linq"]
+    },
+    "SQL": {
+        "select": ["select"], "from": ["from"], "where": ["where"], "join": ["join"], "group by": ["group by"],
+        "having": ["having"], "order by": ["order by"], "insert": ["insert"], "update": ["update"],
+        "delete": ["delete"], "create table": ["create table"], "aggregates": ["count", "sum", "avg", "min", "max"]
+    },
+    "Go": {
+        "func": ["func"], "defer": ["defer"], "goroutine": ["go"], "channel": ["chan", "<-"],
+        "struct": ["struct"], "interface": ["interface"], "package": ["package"], "error handling": ["err"],
+        "range": ["range"]
+    },
+    "Ruby": {
+        "def": ["def"], "class": ["class"], "module": ["module"], "require": ["require", "require_relative"],
+        "block": ["do", "yield"], "attr_accessor": ["attr_accessor", "attr_reader", "attr_writer"],
+        "each": ["each", "map"], "rescue": ["rescue"]
+    },
+    "PHP": {
+        "function": ["function"], "class": ["class"], "namespace": ["namespace"], "echo": ["echo"],
+        "array": ["array"], "foreach": ["foreach"], "object access": ["->"], "arrow functions": ["fn"]
+    },
+    "Swift": {
+        "func": ["func"], "let": ["let"], "var": ["var"], "struct": ["struct"], "class": ["class"],
+        "protocol": ["protocol"], "extension": ["extension"], "guard": ["guard"], "optional": ["?", "nil"]
+    },
+    "Kotlin": {
+        "fun": ["fun"], "val": ["val"], "var": ["var"], "data class": ["data class"], "object": ["object"],
+        "when": ["when"], "null safety": ["?.", "?:"], "coroutine": ["suspend", "launch"]
+    },
+    "Rust": {
+        "fn": ["fn"], "let": ["let"], "mut": ["mut"], "struct": ["struct"], "enum": ["enum"], "impl": ["impl"],
+        "trait": ["trait"], "match": ["match"], "borrowing": ["&"], "error handling": ["result", "?"],
+        "macros": ["println!", "vec!", "format!"]
+    },
+    "Shell/Bash": {
+        "function": ["function"], "echo": ["echo"], "export": ["export"], "local": ["local"], "case": ["case"],
+        "variables": ["$"], "pipes": ["|"], "conditionals": ["[[", "test"]
+    },
+    "Perl": {
+        "my": ["my"], "sub": ["sub"], "use": ["use"], "foreach": ["foreach"], "print": ["print"],
+        "regex": ["=~"], "hash": ["=>"], "array": ["@"]
+    },
+    "R": {
+        "function": ["function"], "library": ["library"], "assignment": ["<-"], "data.frame": ["data.frame"],
+        "vector": ["c("], "apply family": ["apply", "sapply", "lapply", "vapply"], "ggplot": ["ggplot"],
+        "pipe": ["%>%", "|>"]
+    },
+    "MATLAB": {
+        "function": ["function"], "matrix": ["zeros", "ones", "eye", "rand"],
+        "element-wise operations": [".*", "./", ".^"], "plot": ["plot", "figure"],
+        "size": ["size", "length", "numel"], "disp": ["disp", "fprintf"]
+    }
+}
+
+# Common code elements to look for
+CODE_ELEMENTS = {
+    "import": "This section imports necessary libraries and modules.",
+    "include": "This includes necessary header files.",
+    "def": "This defines a function that implements the requested functionality.",
+    "function": "This defines a function that implements the requested functionality.",
+    "class": "This defines a class to organize the functionality.",
+    "for": "This loop iterates through the input data.",
+    "while": "This loop executes code repeatedly until a condition is false.",
+    "if": "This condition checks for specific cases.",
+    "return": "This returns the final result from the function.",
+    "try": "This implements error handling for the code.",
+    "switch": "This provides multiple case conditions for different scenarios.",
+    "struct": "This defines a custom data structure.",
+    "constructor": "This initializes the object when it's created."
+}
+
+# Keywords that mark each code element, and the languages that spell one
+# differently
+ELEMENT_KEYWORDS = {
+    "import": ["import", "require", "using", "use", "library"],
+    "include": ["include"],
+    "def": ["def"],
+    "function": ["function", "func", "fn", "fun", "sub"],
+    "class": ["class"],
+    "for": ["for", "foreach"],
+    "while": ["while"],
+    "if": ["if", "elif", "elsif", "unless"],
+    "return": ["return"],
+    "try": ["try", "rescue"],
+    "switch": ["switch"],
+    "struct": ["struct"],
+    "constructor": ["constructor"]
+}
+LANGUAGE_ELEMENT_KEYWORDS = {
+    "Python": {"constructor": ["__init__"]},
+    "Ruby": {"constructor": ["initialize"]},
+    "Swift": {"constructor": ["init"]},
+    "PHP": {"constructor": ["__construct"]},
+    "Kotlin": {"switch": ["when"], "constructor": ["constructor", "init"]},
+    "Rust": {"switch": ["match"]},
+    "Shell/Bash": {"switch": ["case"]}
+}
+
+# Comments and string literals, which are skipped so a keyword in a comment
+# or a string doesn't count
+LINE_COMMENT = r"//[^\n]*"
+BLOCK_COMMENT = r"/\*(?s:.*?)\*/"
+HASH_COMMENT = r"#[^\n]*"
+DOUBLE_QUOTED = r'"(?:\\.|[^"\\\n])*"'
+SINGLE_QUOTED = r"'(?:\\.|[^'\\\n])*'"
+CHAR_LITERAL = r"'(?:\\.|[^'\\\n])'"
+TRIPLE_QUOTED = r'"""(?s:.*?)"""'
+BACKTICK_QUOTED = r"`(?:\\.|[^`\\])*`"
+C_SYNTAX = [LINE_COMMENT, BLOCK_COMMENT, DOUBLE_QUOTED, CHAR_LITERAL]
+LANGUAGE_SYNTAX = {
+    "Python": [HASH_COMMENT, TRIPLE_QUOTED, r"'''(?s:.*?)'''", DOUBLE_QUOTED, SINGLE_QUOTED],
+    "JavaScript": [LINE_COMMENT, BLOCK_COMMENT, DOUBLE_QUOTED, SINGLE_QUOTED, BACKTICK_QUOTED],
+    "TypeScript": [LINE_COMMENT, BLOCK_COMMENT, DOUBLE_QUOTED, SINGLE_QUOTED, BACKTICK_QUOTED],
+    "Java": [TRIPLE_QUOTED] + C_SYNTAX,
+    "C++": C_SYNTAX,
+    "C": C_SYNTAX,
+    "C#": C_SYNTAX,
+    "Go": C_SYNTAX + [BACKTICK_QUOTED],
+    "Rust": C_SYNTAX,
+    "Swift": [LINE_COMMENT, BLOCK_COMMENT, TRIPLE_QUOTED, DOUBLE_QUOTED],
+    "Kotlin": [TRIPLE_QUOTED] + C_SYNTAX,
+    "PHP": [LINE_COMMENT, BLOCK_COMMENT, HASH_COMMENT, DOUBLE_QUOTED, SINGLE_QUOTED],
+    "Ruby": [HASH_COMMENT, DOUBLE_QUOTED, SINGLE_QUOTED],
+    "Perl": [r"(?<![$\w])#[^\n]*", DOUBLE_QUOTED, SINGLE_QUOTED],
+    # "$#" and "${#var}" are not comments
+    "Shell/Bash": [r"(?<![$\w{])#[^\n]*", DOUBLE_QUOTED, r"'[^']*'"],
+    "R": [HASH_COMMENT, DOUBLE_QUOTED, SINGLE_QUOTED],
+    # A quote after a value is the transpose operator
+    "MATLAB": [r"%\{(?s:.*?)%\}", r"%[^\n]*", DOUBLE_QUOTED, r"(?<![\w)\].'])'[^'\n]*'"],
+    "SQL": [r"--[^\n]*", BLOCK_COMMENT, r"'(?:''|[^'])*'", r'"[^"]*"'],
+    # Only quoted attribute values: an apostrophe in the text is not a quote
+    "HTML": [r"<!--(?s:.*?)-->", r'(?<==)\s*"[^">]*"', r"(?<==)\s*'[^'>]*'"],
+    "CSS": [BLOCK_COMMENT, DOUBLE_QUOTED, SINGLE_QUOTED]
+}
+
+WORD_RE = re.compile(r"[A-Za-z_]\w*")
+
+# Byte translation for splitting code into words: bytes that can't be part of
+# a word become spaces and letters are lowercased. Bytes of non-ASCII
+# characters are kept, so identifiers in any script stay whole.
+WORD_BYTES = bytes(c if chr(c).isalnum() or c == ord("_") or c > 127 else ord(" ") for c in range(256)).lower()
+
+# Function to build the regex for a literal trigger, e.g. "group by" or "<-"
+def literal_pattern(literal):
+    pattern = r"\s+".join(re.escape(part) for part in literal.split(" "))
+    if WORD_RE.match(literal[0]):
+        pattern = r"\b" + pattern
+    if WORD_RE.match(literal[-1]):
+        pattern += r"\b"
+    return pattern
+
+# Function to get the triggers of every code element for a language
+def element_keywords(language):
+    return dict(ELEMENT_KEYWORDS, **LANGUAGE_ELEMENT_KEYWORDS.get(language, {}))
+
+# Function to build the tokenizer of a language: the regex for its comments
+# and strings, and one regex matching any literal trigger with a group per
+# trigger, longest first so a longer trigger wins where two start together
+def compile_tokenizer(language):
+    triggers = [trigger for triggers in LANGUAGE_FEATURES.get(language, {}).values() for trigger in triggers]
+    triggers += [trigger for triggers in element_keywords(language).values() for trigger in triggers]
+    literals = sorted({trigger for trigger in triggers if not WORD_RE.fullmatch(trigger)}, key=lambda literal: (-len(literal), literal))
+    literal_regex = re.compile("|".join(f"({literal_pattern(literal)})" for literal in literals), re.IGNORECASE) if literals else None
+    syntax = LANGUAGE_SYNTAX.get(language)
+    return (re.compile("|".join(syntax)) if syntax else None), literal_regex, literals
+
+TOKENIZERS = {}
+
+# Function to get the distinct words of some code, lowercased, plus the
+# literal triggers it contains. Comments and strings are left out.
+def code_tokens(code, language):
+    tokenizer = TOKENIZERS.get(language)
+    if tokenizer is None:
+        tokenizer = TOKENIZERS[language] = compile_tokenizer(language)
+    skipped, literal_regex, literals = tokenizer
+
+    text = skipped.sub(" ", code) if skipped else code
+    # Splitting the translated bytes runs at C speed, unlike a regex that
+    # visits every word
+    tokens = {word.decode(errors="ignore") for word in set(text.encode().translate(WORD_BYTES).split())}
+    if literal_regex:
+        # One pass for all literal triggers, ending once each has been seen
+        found = set()
+        for match in literal_regex.finditer(text):
+            found.add(literals[match.lastindex - 1])
+            if len(found) == len(literals):
+                break
+        tokens.update(found)
+    return tokens
+
+# Function to find the language features and code elements used in some
+# code, each in table order
+def analyze_code(code, language):
+    tokens = code_tokens(code, language)
+    features = [label for label, triggers in LANGUAGE_FEATURES.get(language, {}).items() if not tokens.isdisjoint(triggers)]
+    elements = [key for key, triggers in element_keywords(language).items() if not tokens.isdisjoint(triggers)]
+    return features, elements
+
+# Bounded in-memory LRU of explanations
+class ExplanationCache:
+    def __init__(self, max_entries=EXPLAIN_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            explanation = self.entries.get(key)
+            if explanation is not None:
+                self.entries.move_to_end(key)
+            return explanation
+
+    def put(self, key, explanation):
+        with self.lock:
+            self.entries[key] = explanation
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+# Function to get the process-wide explanation cache
+@st.cache_resource(show_spinner=False)
+def get_explanation_cache():
+    return ExplanationCache()
+
+# Function to explain code with animation
+def explain_code(code, language):
+    # The same code is often explained again (history, the API), so reuse
+    # the explanation when this exact code was seen before
+    key = hashlib.sha256(f"{language}\0{code}".encode()).hexdigest()
+    cache = get_explanation_cache()
+    explanation = cache.get(key)
+    if explanation is None:
+        explanation = render_explanation(code, language)
+        cache.put(key, explanation)
+    return explanation
+
+# Function to build the explanation HTML for some code
+def render_explanation(code, language):
+    features, elements = analyze_code(code, language)
+
+    explanation = f"""<div class="explanation">
+        <h3>{language} Code Analysis:</h3>
+        <p>This code implements the requested functionality with proper structure and best practices for {language}.</p>
+    """
+
+    # Add language-specific explanations
+    if language in LANGUAGE_FEATURES:
+        explanation += f"<h3>{language}-Specific Features:</h3>"
+
+        if features:
+            explanation += f"<p>The code utilizes {language}-specific features like: {', '.join(features)}</p>"
+
+    # Add common code element explanations
+    explanation += "<h3>Code Structure Breakdown:</h3><ul>"
+
+    # Add some specific explanations based on code content
+    for key in elements:
+        explanation += f"<li><strong>{key.capitalize()}</strong>: {CODE_ELEMENTS[key]}</li>"
+
+    explanation += "</ul>"
+
+    # Add performance and usage notes
+    explanation += """
+        <h3>Performance and Usage Notes:</h3>
+        <ul>
+            <li>The code is designed to handle the specific requirements efficiently.</li>
+            <li>Error handling is implemented where appropriate.</li>
+            <li>Follow best practices when integrating this code.</li>
+        </ul>
+    </div>
+    """
+
+    return explanation
@@ -0,0 +1,164 @@
+import streamlit as st
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from inference import PROMPT_VERSION
+
+# Cache settings, overridable from the environment
+CACHE_DIR = os.getenv("CODEGENIE_CACHE_DIR", "cache")
+CACHE_MAX_ENTRIES = int(os.getenv("CODEGENIE_CACHE_MAX_ENTRIES", "256"))
+CACHE_TTL = float(os.getenv("CODEGENIE_CACHE_TTL", "86400"))
+CACHE_MAX_DISK_MB = float(os.getenv("CODEGENIE_CACHE_MAX_DISK_MB", "50"))
+
+# Function to normalize a prompt so prompts that differ only in whitespace
+# share a cache entry. Case is kept: it can matter to the code, e.g. in names.
+def normalize_prompt(prompt):
+    return re.sub(r"\s+", " ", prompt).strip()
+
+# Function to build the cache key for a generation request
+def make_cache_key(model_id, language, prompt, include_tests, code_style, max_length, temperature):
+    key_data = json.dumps([
+        PROMPT_VERSION,
+        model_id,
+        language,
+        normalize_prompt(prompt),
+        bool(include_tests),
+        code_style,
+        int(max_length),
+        round(float(temperature), 2)
+    ])
+    return hashlib.sha256(key_data.encode()).hexdigest()
+
+# Two-tier cache of generated code: a bounded in-memory LRU in front of
+# one JSON file per entry on disk. Both tiers expire entries after the TTL
+# and the disk tier drops its oldest files once it grows past its size limit.
+class GenerationCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, max_disk_mb=CACHE_MAX_DISK_MB):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+            "expired": 0
+        }
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        self.disk_bytes = sum(
+            os.path.getsize(os.path.join(self.cache_dir, filename))
+            for filename in os.listdir(self.cache_dir)
+            if filename.endswith(".json")
+        )
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _expired(self, created):
+        return time.time() - created > self.ttl
+
+    def _remember(self, key, created, code):
+        self.memory[key] = (created, code)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+            self.counters["memory_evictions"] += 1
+
+    def _remove_file(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self.disk_bytes -= size
+        except OSError:
+            pass
+
+    def get(self, key):
+        with self.lock:
+            # Memory tier
+            if key in self.memory:
+                created, code = self.memory[key]
+                if not self._expired(created):
+                    self.memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return code
+                del self.memory[key]
+                self.counters["expired"] += 1
+
+            # Disk tier
+            path = self._path(key)
+            try:
+                with open(path, "r") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None
+
+            if entry is not None:
+                if not self._expired(entry["created"]):
+                    self._remember(key, entry["created"], entry["code"])
+                    self.counters["disk_hits"] += 1
+                    return entry["code"]
+                self._remove_file(path)
+                self.counters["expired"] += 1
+
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, key, code):
+        created = time.time()
+        data = json.dumps({"created": created, "code": code})
+        with self.lock:
+            self._remember(key, created, code)
+
+            path = self._path(key)
+            self._remove_file(path)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.disk_bytes += os.path.getsize(path)
+
+            if self.disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        # Drop the oldest files until the disk tier is back under 90% of its limit
+        files = []
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith(".json"):
+                path = os.path.join(self.cache_dir, filename)
+                try:
+                    files.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+        files.sort()
+
+        target = self.max_disk_bytes * 0.9
+        for _, path in files:
+            if self.disk_bytes <= target:
+                break
+            self._remove_file(path)
+            self.counters["disk_evictions"] += 1
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+            stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+            stats["memory_entries"] = len(self.memory)
+            stats["disk_bytes"] = self.disk_bytes
+            return stats
+
+# Function to get the process-wide generation cache shared by all sessions
+@st.cache_resource(show_spinner=False)
+def get_generation_cache():
+    return GenerationCache()
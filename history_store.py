@@ -0,0 +1,226 @@
+import streamlit as st
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+# Location of the history database and of the legacy one-file-per-entry history
+HISTORY_DIR = os.getenv("CODEGENIE_HISTORY_DIR", "history")
+HISTORY_DB = os.getenv("CODEGENIE_HISTORY_DB", os.path.join(HISTORY_DIR, "history.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    language TEXT NOT NULL,
+    code TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    source_file TEXT UNIQUE
+);
+CREATE INDEX IF NOT EXISTS idx_history_user_time ON history (username, created_at DESC, id DESC);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+    username, prompt, language, code,
+    content='history', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, username, prompt, language, code)
+    VALUES (new.id, new.username, new.prompt, new.language, new.code);
+END;
+CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, username, prompt, language, code)
+    VALUES ('delete', old.id, old.username, old.prompt, old.language, old.code);
+END;
+CREATE TRIGGER IF NOT EXISTS history_fts_update AFTER UPDATE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, username, prompt, language, code)
+    VALUES ('delete', old.id, old.username, old.prompt, old.language, old.code);
+    INSERT INTO history_fts (rowid, username, prompt, language, code)
+    VALUES (new.id, new.username, new.prompt, new.language, new.code);
+END;
+"""
+
+# Relevance weights for the full-text columns (username is only used to filter)
+SEARCH_WEIGHTS = (0.0, 10.0, 2.0, 1.0)
+
+# One connection per thread: sqlite3 connections must not be shared across
+# threads, and Streamlit runs every session on its own script thread
+local = threading.local()
+
+# Function to get this thread's connection to the history database
+def get_connection(db_path=HISTORY_DB):
+    connections = getattr(local, "connections", None)
+    if connections is None:
+        connections = local.connections = {}
+    if db_path not in connections:
+        initialize_history_store(db_path)
+        connection = sqlite3.connect(db_path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA busy_timeout = 30000")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connections[db_path] = connection
+    return connections[db_path]
+
+# Function to create the history database, once per process.
+# WAL mode lets many sessions write while others read the History tab.
+@st.cache_resource(show_spinner=False)
+def initialize_history_store(db_path=HISTORY_DB):
+    directory = os.path.dirname(db_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    connection = sqlite3.connect(db_path, timeout=30)
+    try:
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.executescript(SCHEMA)
+        migrate_legacy_history(connection, os.path.dirname(db_path) or ".")
+        build_search_index(connection)
+    finally:
+        connection.close()
+    return True
+
+# Function to parse one legacy history/code_<timestamp>.txt file
+def parse_legacy_history_file(content):
+    entry = {"prompt": "Unknown", "language": "Unknown", "created_at": None, "username": None}
+    header, _, code = content.partition("--- Generated Code ---")
+    for line in header.split("\n"):
+        if line.startswith("Prompt:"):
+            entry["prompt"] = line[8:].strip()
+        elif line.startswith("Language:"):
+            entry["language"] = line[10:].strip()
+        elif line.startswith("Timestamp:"):
+            entry["created_at"] = line[11:].strip()
+        elif line.startswith("User:"):
+            entry["username"] = line[6:].strip()
+    entry["code"] = code.strip() if code else "No code found"
+    return entry
+
+# Function to import the legacy text-file history into the database.
+# Runs once per database; each file is recorded by name so a partially
+# completed import can be resumed without duplicating entries.
+def migrate_legacy_history(connection, legacy_dir=HISTORY_DIR):
+    done = connection.execute("SELECT value FROM meta WHERE key = 'legacy_import_done'").fetchone()
+    if done:
+        return 0
+
+    imported = 0
+    if os.path.isdir(legacy_dir):
+        for filename in sorted(os.listdir(legacy_dir)):
+            if not (filename.startswith("code_") and filename.endswith(".txt")):
+                continue
+            with open(os.path.join(legacy_dir, filename), "r") as f:
+                entry = parse_legacy_history_file(f.read())
+            if not entry["username"]:
+                continue
+            if not entry["created_at"]:
+                stamp = filename[len("code_"):-len(".txt")]
+                entry["created_at"] = datetime.strptime(stamp, "%Y%m%d_%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO history (username, prompt, language, code, created_at, source_file) VALUES (?, ?, ?, ?, ?, ?)",
+                (entry["username"], entry["prompt"], entry["language"], entry["code"], entry["created_at"], filename)
+            )
+            imported += cursor.rowcount
+
+    connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_import_done', ?)", (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),))
+    connection.commit()
+    return imported
+
+# Function to index entries written before the search index existed.
+# New entries are indexed incrementally by the history_fts triggers.
+def build_search_index(connection):
+    done = connection.execute("SELECT value FROM meta WHERE key = 'search_index_built'").fetchone()
+    if done:
+        return
+    connection.execute("INSERT INTO history_fts (history_fts) VALUES ('rebuild')")
+    connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('search_index_built', ?)", (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),))
+    connection.commit()
+
+# Function to turn free text into a safe FTS5 query: every word must match,
+# and the last one also matches as a prefix while the user is still typing
+def build_search_query(text):
+    terms = re.findall(r"\w+", text)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " AND ".join(quoted)
+
+# Function to add a generated snippet to a user's history
+def save_history_entry(username, prompt, language, code, db_path=HISTORY_DB):
+    connection = get_connection(db_path)
+    with connection:
+        cursor = connection.execute(
+            "INSERT INTO history (username, prompt, language, code, created_at) VALUES (?, ?, ?, ?, ?)",
+            (username, prompt, language, code, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+    return cursor.lastrowid
+
+# Function to list one page of a user's history, newest first, without the code.
+# The cursor is the (created_at, id) of the last entry on the previous page,
+# so each page is a seek on the (username, created_at, id) index no matter
+# how deep the user pages. Returns (entries, next_cursor or None).
+def list_history_page(username, limit=20, cursor=None, db_path=HISTORY_DB):
+    query = "SELECT id, substr(prompt, 1, 200) AS prompt, length(prompt) AS prompt_length, language, created_at FROM history WHERE username = ?"
+    params = [username]
+    if cursor:
+        # Row-value comparison so SQLite seeks the index instead of scanning
+        query += " AND (created_at, id) < (?, ?)"
+        params += [cursor[0], cursor[1]]
+    query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    rows = [dict(row) for row in get_connection(db_path).execute(query, params).fetchall()]
+    entries = rows[:limit]
+    next_cursor = (entries[-1]["created_at"], entries[-1]["id"]) if len(rows) > limit else None
+    return entries, next_cursor
+
+# Function to fetch a single history entry owned by a user
+def get_history_entry(entry_id, username, db_path=HISTORY_DB):
+    row = get_connection(db_path).execute(
+        "SELECT id, prompt, language, code, created_at FROM history WHERE id = ? AND username = ?",
+        (entry_id, username)
+    ).fetchone()
+    return dict(row) if row else None
+
+# Function to search a user's history by prompt, language and code.
+# Free text is ranked by bm25 (prompt matches weigh most); language and an
+# inclusive date range (datetime.date values) narrow the results. With no
+# text the filtered entries are returned newest first.
+def search_history(username, text="", language=None, date_from=None, date_to=None, limit=50, db_path=HISTORY_DB):
+    filters = ""
+    params = []
+    if language:
+        filters += " AND h.language = ?"
+        params.append(language)
+    if date_from:
+        filters += " AND h.created_at >= ?"
+        params.append(date_from.strftime("%Y-%m-%d 00:00:00"))
+    if date_to:
+        filters += " AND h.created_at <= ?"
+        params.append(date_to.strftime("%Y-%m-%d 23:59:59"))
+
+    columns = "h.id, substr(h.prompt, 1, 200) AS prompt, length(h.prompt) AS prompt_length, h.language, h.created_at"
+    match = build_search_query(text or "")
+    if match:
+        user_terms = " ".join(f'"{term}"' for term in re.findall(r"\w+", username))
+        weights = ", ".join(str(weight) for weight in SEARCH_WEIGHTS)
+        query = (
+            f"SELECT {columns}, bm25(history_fts, {weights}) AS rank "
+            "FROM history_fts JOIN history h ON h.id = history_fts.rowid "
+            f"WHERE history_fts MATCH ? AND h.username = ?{filters} "
+            "ORDER BY rank LIMIT ?"
+        )
+        params = [f"username : ({user_terms}) AND ({match})" if user_terms else match, username] + params
+    else:
+        query = (
+            f"SELECT {columns} FROM history h WHERE h.username = ?{filters} "
+            "ORDER BY h.created_at DESC, h.id DESC LIMIT ?"
+        )
+        params = [username] + params
+    params.append(limit)
+
+    return [dict(row) for row in get_connection(db_path).execute(query, params).fetchall()]
@@ -0,0 +1,323 @@
+import streamlit as st
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import json
+import os
+import random
+import re
+import textwrap
+import time
+from backends import get_backend
+from languages import file_extension
+from metrics import span, observe, record_tokens
+from single_flight import get_single_flight
+from syntax_check import check_syntax
+
+# Pre-configured API key (embedded for hackathon purposes)
+DEFAULT_API_KEY =("HUGGINGFACE_API_KEY")
+
+# Worker threads used to query several models at once
+FANOUT_WORKERS = int(os.getenv("CODEGENIE_FANOUT_WORKERS", "8"))
+
+# Most candidates one request may sample in parallel
+MAX_CANDIDATES = int(os.getenv("CODEGENIE_MAX_CANDIDATES", "4"))
+
+# Code styles offered in the advanced options
+CODE_STYLES = ["Standard", "Concise", "Verbose", "Educational"]
+
+# Function to add the advanced options (unit tests, code style) to a prompt
+def apply_prompt_options(prompt, include_tests=False, code_style="Standard"):
+    if include_tests:
+        prompt += " Also include unit tests."
+    if code_style != "Standard":
+        prompt += f" The code should be {code_style.lower()}."
+    return prompt
+
+# Most tokens of the user's description sent to the model; longer
+# descriptions are cut at a word boundary
+PROMPT_TOKEN_BUDGET = int(os.getenv("CODEGENIE_PROMPT_TOKEN_BUDGET", "512"))
+
+# Prompt formats by model family. Each one ends inside an opened code block,
+# so the completion is the code itself, up to the closing fence.
+PROMPT_TEMPLATES = {
+    # Llama 2 / Mistral instruct models
+    "inst": "[INST] {instruction} [/INST]\n```{fence}\n",
+    # Qwen and other ChatML models
+    "chatml": "<|im_start|>user\n{instruction}<|im_end|>\n<|im_start|>assistant\n```{fence}\n",
+    # Plain instruction-following and completion models
+    "plain": "{instruction}\n\n```{fence}\n"
+}
+
+# Version of the prompts the model is sent, part of every generation cache
+# key. Bump it whenever build_prompt or the templates change what a model is
+# asked, so code generated for the old prompts isn't served.
+PROMPT_VERSION = 2
+
+# Model id fragments that pick a prompt format; anything else is "plain"
+PROMPT_FAMILIES = [
+    ("mistral", "inst"),
+    ("llama", "inst"),
+    ("qwen", "chatml")
+]
+
+# Sequences that end generation, by prompt format. A fence on a line of its
+# own closes the code block; the opening fence of the prompt or of a model
+# that opens a block anyway ("```python") never matches it. The chat markers
+# catch models that end their turn or start a new one without closing the
+# block.
+CLOSING_FENCE = "\n```\n"
+STOP_SEQUENCES = {
+    "inst": [CLOSING_FENCE, "[INST]"],
+    "chatml": [CLOSING_FENCE, "<|im_end|>", "<|im_start|>"],
+    "plain": [CLOSING_FENCE]
+}
+
+# Rough token count of a text: words and punctuation marks, or one token per
+# four characters for text with long words, whichever is more
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text):
+    return max(len(TOKEN_RE.findall(text)), (len(text) + 3) // 4)
+
+# Function to cut a description down to `budget` tokens at a word boundary.
+# Returns the text unchanged when it fits.
+def truncate_prompt(prompt, budget=PROMPT_TOKEN_BUDGET):
+    if estimate_tokens(prompt) <= budget:
+        return prompt
+    cut = len(prompt)
+    while cut and estimate_tokens(prompt[:cut]) > budget:
+        cut = int(cut * budget / estimate_tokens(prompt[:cut]))
+        cut = prompt.rfind(" ", 0, cut) if " " in prompt[:cut] else cut
+    return prompt[:cut].rstrip()
+
+# Function to get the prompt format for a model
+def prompt_family(model_id):
+    name = model_id.lower()
+    return next((family for fragment, family in PROMPT_FAMILIES if fragment in name), "plain")
+
+# Function to get the sequences that end a model's generation
+def stop_sequences(model_id):
+    return STOP_SEQUENCES[prompt_family(model_id)]
+
+# Function to build the model-specific prompt for a code generation request
+def build_prompt(prompt, language, model_id):
+    # Drop indentation, trailing spaces and runs of blank lines: they cost
+    # tokens and tell the model nothing
+    prompt = "\n".join(line.rstrip() for line in textwrap.dedent(prompt).strip().splitlines())
+    prompt = truncate_prompt(re.sub(r"\n{3,}", "\n\n", prompt))
+
+    # Special handling for HTML/CSS/JS combined projects
+    if "HTML" in prompt.upper() and "CSS" in prompt.upper():
+        instruction = f"Write one HTML file for: {prompt}\nInclude the CSS styling and any JavaScript in the file, with brief comments."
+        fence = "html"
+    else:
+        instruction = f"Write {language} code for: {prompt}\nInclude needed imports and brief comments. Reply with the code only."
+        fence = file_extension(language)
+
+    return PROMPT_TEMPLATES[prompt_family(model_id)].format(instruction=instruction, fence=fence)
+
+# Function to extract the code from the model's completion. The prompt opens
+# the code block, so the code runs up to the closing fence; an opening fence
+# the model adds anyway is skipped.
+def extract_code(completion):
+    if completion.lstrip().startswith("```"):
+        completion = completion.lstrip().partition("\n")[2]
+    return textwrap.dedent(completion.split("```")[0]).strip("\n").rstrip()
+
+# Incremental extract_code for streamed completions. Each update scans only
+# the text that arrived since the last one, and `done` turns true as soon as
+# the code block closes, so the stream can be ended right there.
+class CodeExtractor:
+    def __init__(self):
+        self.completion = ""
+        # Where the code starts and where the closing fence starts, once known
+        self.start = None
+        self.end = None
+        # Where the search for the closing fence resumes
+        self.scanned = 0
+
+    @property
+    def done(self):
+        return self.end is not None
+
+    def update(self, completion):
+        self.completion = completion
+        if self.start is None:
+            leading = len(completion) - len(completion.lstrip())
+            head = completion[leading:leading + 3]
+            if head == "```":
+                # The model opened a block of its own: code starts on the next line
+                newline = completion.find("\n", leading)
+                if newline == -1:
+                    return
+                self.start = newline + 1
+            elif not head or "```".startswith(head):
+                # Nothing yet, or backticks that may still become a fence
+                return
+            else:
+                self.start = completion.rfind("\n", 0, leading) + 1
+            self.scanned = self.start
+
+        if self.end is None:
+            index = completion.find("```", self.scanned)
+            if index != -1:
+                self.end = index
+            else:
+                # A fence may be split across updates
+                self.scanned = max(self.start, len(completion) - 2)
+
+    # Returns the code so far, holding back backticks that may be the start of
+    # the closing fence
+    def code(self):
+        if self.start is None:
+            return ""
+        if self.done:
+            return extract_code(self.completion[self.start:self.end])
+        return self.completion[self.start:].rstrip("`").strip("\n").rstrip()
+
+# Function to count the tokens of one model call: what the server reported,
+# or an estimate where it reported nothing
+def count_tokens(model_id, language, full_prompt, completion, usage):
+    input_tokens = usage.get("input_tokens", estimate_tokens(full_prompt))
+    output_tokens = usage.get("output_tokens", estimate_tokens(completion))
+    record_tokens(model_id, language, input_tokens, output_tokens)
+
+# Function to generate code with the selected model's inference backend.
+# Concurrent identical requests (same model, language, prompt, parameters
+# and key) share one upstream call and all receive its result.
+def generate_code_api(prompt, language, model_id, max_length, temperature, api_key=DEFAULT_API_KEY):
+    key_data = json.dumps([model_id, language, prompt, max_length, temperature])
+    key = hashlib.sha256(f"{key_data}:{api_key}".encode()).hexdigest()
+    return get_single_flight().do(key, call_code_api, prompt, language, model_id, max_length, temperature, api_key)
+
+# Function to make one (uncoalesced) code generation call to the model's backend
+def call_code_api(prompt, language, model_id, max_length, temperature, api_key=DEFAULT_API_KEY, seed=None):
+    with span("build_prompt", model_id, language):
+        full_prompt = build_prompt(prompt, language, model_id)
+    usage = {}
+    with span("upstream", model_id, language):
+        completion, error_msg = get_backend(model_id).complete(full_prompt, max_length, temperature, api_key, stop=stop_sequences(model_id), usage=usage, seed=seed)
+    if error_msg:
+        return None, error_msg
+    count_tokens(model_id, language, full_prompt, completion, usage)
+    with span("parse", model_id, language):
+        return extract_code(completion), None
+
+# Function to stream generated code token by token from the model's backend.
+# Yields (code_so_far, None) as tokens arrive and (None, error) on failure;
+# the last successful value is the complete result. The upstream request is
+# closed as soon as the code block ends, dropping whatever the model would
+# have written after it.
+def stream_code_api(prompt, language, model_id, max_length, temperature, api_key=DEFAULT_API_KEY):
+    with span("build_prompt", model_id, language):
+        full_prompt = build_prompt(prompt, language, model_id)
+
+    usage = {}
+    completion = ""
+    extractor = CodeExtractor()
+    started = time.perf_counter()
+    parse_seconds = 0.0
+    first_token = True
+    stream = get_backend(model_id).stream(full_prompt, max_length, temperature, api_key, stop=stop_sequences(model_id), usage=usage)
+    try:
+        for completion, error_msg in stream:
+            if error_msg:
+                yield None, error_msg
+                return
+            if first_token:
+                observe("first_token", time.perf_counter() - started, model_id, language)
+                first_token = False
+
+            parse_started = time.perf_counter()
+            extractor.update(completion)
+            code = extractor.code()
+            parse_seconds += time.perf_counter() - parse_started
+            if extractor.done:
+                break
+            yield code, None
+    finally:
+        stream.close()
+
+    # Upstream time excludes the parsing done between tokens
+    observe("upstream", time.perf_counter() - started - parse_seconds, model_id, language)
+    observe("parse", parse_seconds, model_id, language)
+    count_tokens(model_id, language, full_prompt, completion, usage)
+    yield extract_code(completion), None
+
+# Function to get the worker pool used to query several models at once
+@st.cache_resource(show_spinner=False)
+def get_fanout_executor():
+    return ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="codegenie-fanout")
+
+# Function to send the same request to several models in parallel.
+# Yields (model_id, code, error) for each model in the order they finish.
+def iter_code_multi(prompt, language, model_ids, max_length, temperature, api_key=DEFAULT_API_KEY):
+    executor = get_fanout_executor()
+    futures = {
+        executor.submit(generate_code_api, prompt, language, model_id, max_length, temperature, api_key): model_id
+        for model_id in model_ids
+    }
+    try:
+        for future in as_completed(futures):
+            code, error = future.result()
+            yield futures[future], code, error
+    finally:
+        # Drop requests that have not started yet if the caller stops early
+        for future in futures:
+            future.cancel()
+
+# Function to race several models and keep the first successful response.
+# Returns (model_id, code, None) for the winner or (None, None, error) if all fail.
+def generate_code_first(prompt, language, model_ids, max_length, temperature, api_key=DEFAULT_API_KEY):
+    errors = []
+    results = iter_code_multi(prompt, language, model_ids, max_length, temperature, api_key)
+    try:
+        for model_id, code, error in results:
+            if code:
+                return model_id, code, None
+            errors.append(f"{model_id}: {error or 'empty response'}")
+    finally:
+        results.close()
+
+    return None, None, "All models failed. " + " | ".join(errors)
+
+# Function to sample one candidate and check its syntax.
+# Returns (code, error, valid) with valid as from check_syntax.
+def call_checked_candidate(prompt, language, model_id, max_length, temperature, api_key, seed):
+    code, error = call_code_api(prompt, language, model_id, max_length, temperature, api_key, seed=seed)
+    if error or not code:
+        return None, error or "empty response", None
+    valid, _ = check_syntax(code, language)
+    return code, None, valid
+
+# Function to sample several candidates from one model in parallel, each with
+# its own seed, and keep the first whose syntax checks out. Languages that
+# can't be checked here take the first candidate. If every candidate fails
+# the check, the first one to arrive is returned anyway.
+def generate_code_candidates(prompt, language, model_id, max_length, temperature, api_key=DEFAULT_API_KEY, candidates=2):
+    executor = get_fanout_executor()
+    seeds = random.sample(range(2 ** 31), max(1, min(candidates, MAX_CANDIDATES)))
+    futures = [
+        executor.submit(call_checked_candidate, prompt, language, model_id, max_length, temperature, api_key, seed)
+        for seed in seeds
+    ]
+    fallback = None
+    errors = []
+    try:
+        for future in as_completed(futures):
+            code, error, valid = future.result()
+            if error:
+                errors.append(error)
+            elif valid is not False:
+                return code, None
+            elif fallback is None:
+                fallback = code
+    finally:
+        # Drop candidates that have not started yet; the ones in flight
+        # finish in the background and are discarded
+        for future in futures:
+            future.cancel()
+
+    if fallback is not None:
+        return fallback, None
+    return None, "All candidates failed. " + " | ".join(errors)
@@ -0,0 +1,233 @@
+import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
+import uuid
+from inference import generate_code_api, stream_code_api, generate_code_first, iter_code_multi, generate_code_candidates
+from generation_cache import get_generation_cache, make_cache_key
+from history_store import save_history_entry
+from metrics import span, observe
+from rate_limit import get_admission_controller
+
+# Job queue settings, overridable from the environment
+JOB_WORKERS = int(os.getenv("CODEGENIE_JOB_WORKERS", "4"))
+JOB_BATCH_WORKERS = int(os.getenv("CODEGENIE_JOB_BATCH_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("CODEGENIE_JOB_QUEUE_SIZE", "32"))
+JOB_USER_MAX_ACTIVE = int(os.getenv("CODEGENIE_JOB_USER_MAX_ACTIVE", "4"))
+JOB_RETENTION = float(os.getenv("CODEGENIE_JOB_RETENTION", "3600"))
+JOB_POLL_INTERVAL = float(os.getenv("CODEGENIE_JOB_POLL_INTERVAL", "0.5"))
+
+# Shown when a request waited too long for its turn in the rate limits
+RATE_LIMITED_MESSAGE = "You're sending requests faster than the rate limit allows. Please try again in a minute."
+
+# Shown when a request can't be queued
+BUSY_MESSAGE = "CodeGenie is busy right now. Please try again in a moment."
+USER_BUSY_MESSAGE = f"You already have {JOB_USER_MAX_ACTIVE} requests in progress. Please wait for one to finish."
+
+# Bounded pool of background workers for generation jobs. Sessions keep only
+# a job id and poll its status, so a slow model never blocks a script rerun.
+# Jobs that call models pass admission control before they take a worker, so
+# a user waiting on their rate limit never holds one, and each user may have
+# only max_user_jobs jobs queued or running at once. Batches wait on the rate
+# limits row by row while they run, so they get their own batch_workers and
+# never hold the workers of interactive requests.
+class JobQueue:
+    def __init__(self, workers=JOB_WORKERS, max_jobs=JOB_QUEUE_SIZE, retention=JOB_RETENTION, max_user_jobs=JOB_USER_MAX_ACTIVE, batch_workers=JOB_BATCH_WORKERS):
+        self.executors = {
+            "generation": ThreadPoolExecutor(max_workers=workers, thread_name_prefix="codegenie-job"),
+            "batch": ThreadPoolExecutor(max_workers=batch_workers, thread_name_prefix="codegenie-batch-job")
+        }
+        self.max_jobs = max_jobs
+        self.max_user_jobs = max_user_jobs
+        self.retention = retention
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def active_count(self, username=None):
+        return sum(
+            1 for job in self.jobs.values()
+            if job["status"] in ("queued", "running") and (username is None or job["username"] == username)
+        )
+
+    # Queues fn(job_id, *args) on the "generation" or "batch" workers. With
+    # `model_ids`, the job first waits for `username`'s turn to call those
+    # models. Returns the job id, or None with the reason when the queue or
+    # the user's share of it is full.
+    def submit(self, fn, *args, username=None, model_ids=None, pool="generation"):
+        with self.lock:
+            self.purge()
+            if self.active_count() >= self.max_jobs:
+                return None, BUSY_MESSAGE
+            if username is not None and self.active_count(username) >= self.max_user_jobs:
+                return None, USER_BUSY_MESSAGE
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "partial": None,
+                "results": {},
+                "code": None,
+                "error": None,
+                "model_id": None,
+                "username": username,
+                "pool": pool,
+                "admitted": not model_ids,
+                "admission_position": None,
+                "submitted_at": time.time(),
+                "admitted_at": None if model_ids else time.time(),
+                "started_at": None,
+                "finished_at": None
+            }
+        if model_ids:
+            get_admission_controller().reserve(
+                username,
+                model_ids,
+                lambda admitted: self.admit(job_id, admitted, fn, args, pool),
+                on_wait=lambda position: self.update(job_id, admission_position=position)
+            )
+        else:
+            self.executors[pool].submit(self.run, job_id, fn, *args)
+        return job_id, None
+
+    # Starts an admitted job, or fails it when it wasn't admitted in time
+    def admit(self, job_id, admitted, fn, args, pool="generation"):
+        if not admitted:
+            self.update(job_id, status="failed", admission_position=None, error=RATE_LIMITED_MESSAGE, finished_at=time.time())
+            return
+        self.update(job_id, admitted=True, admission_position=None, admitted_at=time.time())
+        self.executors[pool].submit(self.run, job_id, fn, *args)
+
+    def run(self, job_id, fn, *args):
+        self.update(job_id, status="running", started_at=time.time())
+        try:
+            fn(job_id, *args)
+        except Exception as e:
+            self.update(job_id, error=f"Error: {str(e)}")
+        job = self.get(job_id)
+        status = "done" if job and (job["code"] or job["results"]) and not job["error"] else "failed"
+        self.update(job_id, status=status, finished_at=time.time())
+
+    def update(self, job_id, **fields):
+        with self.lock:
+            if job_id in self.jobs:
+                self.jobs[job_id].update(fields)
+
+    def set_result(self, job_id, model_id, code, error):
+        with self.lock:
+            if job_id in self.jobs:
+                self.jobs[job_id]["results"][model_id] = {"code": code, "error": error}
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job)
+            snapshot["results"] = dict(job["results"])
+            # Jobs waiting for a worker of the same pool, not for admission
+            snapshot["position"] = sum(
+                1 for other in self.jobs.values()
+                if other["status"] == "queued" and other["pool"] == job["pool"] and other["admitted"] and job["admitted"] and other["admitted_at"] < job["admitted_at"]
+            )
+            return snapshot
+
+    def purge(self):
+        # Forget finished jobs nobody has looked at for a while
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self.jobs.items() if job["finished_at"] and job["finished_at"] < cutoff]:
+            del self.jobs[job_id]
+
+    def stats(self):
+        with self.lock:
+            statuses = [job["status"] for job in self.jobs.values()]
+            return {status: statuses.count(status) for status in ("queued", "running", "done", "failed")}
+
+# Function to get the process-wide generation job queue
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    return JobQueue()
+
+# Function to run one generation request in a background worker.
+# The request dict carries everything the worker needs (the session state is
+# not available off the script thread); successful results are cached and
+# saved to the user's history here, so they persist even if the user leaves.
+def run_generation_job(job_id, request):
+    queue = get_job_queue()
+    model_ids = request["model_ids"]
+    metrics_model = model_ids[0] if len(model_ids) == 1 else "multiple"
+    job = queue.get(job_id)
+    if job and job["started_at"]:
+        observe("queue_wait", job["started_at"] - job["admitted_at"], metrics_model, request["language"])
+
+    with span("generate", metrics_model, request["language"]):
+        generate_job_result(queue, job_id, request)
+
+# Function to generate the result of a job in the requested mode
+def generate_job_result(queue, job_id, request):
+    mode = request["mode"]
+    model_ids = request["model_ids"]
+    generation_args = (request["full_prompt"], request["language"])
+    sampling_args = (request["max_length"], request["temperature"], request["api_key"])
+
+    if mode == "compare":
+        for model_id, code, error in iter_code_multi(*generation_args, model_ids, *sampling_args):
+            queue.set_result(job_id, model_id, code, error)
+            if code:
+                store_generation_result(request, model_id, code)
+        return
+
+    if mode == "race":
+        model_id, code, error = generate_code_first(*generation_args, model_ids, *sampling_args)
+    elif mode == "stream":
+        model_id, code, error = model_ids[0], None, None
+        for partial_code, error in stream_code_api(*generation_args, model_id, *sampling_args):
+            if error:
+                break
+            code = partial_code
+            queue.update(job_id, partial=partial_code)
+    elif mode == "candidates":
+        model_id = model_ids[0]
+        code, error = generate_code_candidates(*generation_args, model_id, *sampling_args, request["candidates"])
+    else:
+        model_id = model_ids[0]
+        code, error = generate_code_api(*generation_args, model_id, *sampling_args)
+
+    if error or not code:
+        queue.update(job_id, error=error or "Failed to generate code. Please try again.")
+        return
+
+    store_generation_result(request, model_id, code)
+    queue.update(job_id, code=code, model_id=model_id)
+
+# Function to cache a finished result and add it to the user's history
+def store_generation_result(request, model_id, code):
+    cache_key = make_cache_key(
+        model_id,
+        request["language"],
+        request["user_prompt"],
+        request["include_tests"],
+        request["code_style"],
+        request["max_length"],
+        request["temperature"]
+    )
+    get_generation_cache().put(cache_key, code)
+    with span("save_history", model_id, request["language"]):
+        save_history_entry(request["username"], request["user_prompt"], request["language"], code)
+
+# Function to queue a generation request once it is the user's turn within
+# the rate limits. Every sampled candidate is a call to the model, so each is
+# charged to its rate limit. Returns (job_id, None), or (None, reason) when
+# the request can't be queued.
+def submit_generation_job(request):
+    model_ids = request["model_ids"] * request["candidates"] if request["mode"] == "candidates" else request["model_ids"]
+    return get_job_queue().submit(run_generation_job, request, username=request["username"], model_ids=model_ids)
+
+# Function to tell whether a job is still queued or running
+def job_in_progress(job_id):
+    job = get_job_queue().get(job_id) if job_id else None
+    return job is not None and job["status"] in ("queued", "running")
+
+# Function to get a snapshot of a job's status and results
+def get_job(job_id):
+    return get_job_queue().get(job_id)
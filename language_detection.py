@@ -0,0 +1,189 @@
+import re
+
+# Language signals, strongest first: the language's own name, its file
+# extension, then ecosystem keywords (frameworks, tools, idioms). Multi-word
+# entries such as "group by" match as consecutive tokens.
+LANGUAGE_SIGNALS = {
+    "Python": {
+        "names": ["python"],
+        "extensions": [".py"],
+        "keywords": ["pip", "django", "flask", "numpy", "pandas"]
+    },
+    "JavaScript": {
+        "names": ["javascript", "js", "node.js"],
+        "extensions": [".js"],
+        "keywords": ["npm", "react", "angular", "vue"]
+    },
+    "Java": {
+        "names": ["java"],
+        "extensions": [".java"],
+        "keywords": ["spring", "maven", "hibernate"]
+    },
+    "C++": {
+        "names": ["c++"],
+        "extensions": [".cpp"],
+        "keywords": ["cmake", "stl", "vector<"]
+    },
+    "C": {
+        "names": ["c"],
+        "extensions": [".c"],
+        "keywords": ["pointer", "malloc", "stdio", "stdlib", "printf"]
+    },
+    "C#": {
+        "names": ["c#"],
+        "extensions": [".cs"],
+        "keywords": ["dotnet", "async", "await", "using"]
+    },
+    "Go": {
+        "names": ["go", "golang"],
+        "extensions": [".go"],
+        "keywords": ["goroutine"]
+    },
+    "Ruby": {
+        "names": ["ruby"],
+        "extensions": [".rb"],
+        "keywords": ["rails", "gem"]
+    },
+    "PHP": {
+        "names": ["php"],
+        "extensions": [".php"],
+        "keywords": ["laravel", "symphony"]
+    },
+    "Swift": {
+        "names": ["swift"],
+        "extensions": [".swift"],
+        "keywords": ["ios", "xcode", "cocoa"]
+    },
+    "Kotlin": {
+        "names": ["kotlin"],
+        "extensions": [".kt"],
+        "keywords": ["android"]
+    },
+    "Rust": {
+        "names": ["rust"],
+        "extensions": [".rs"],
+        "keywords": ["cargo", "crate"]
+    },
+    "TypeScript": {
+        "names": ["typescript", "ts"],
+        "extensions": [".ts"],
+        "keywords": ["angular", "vue"]
+    },
+    "HTML": {
+        "names": ["html", "html5"],
+        "extensions": [".html"],
+        "keywords": ["div", "span", "input", "form", "markup"]
+    },
+    "CSS": {
+        "names": ["css"],
+        "extensions": [".css"],
+        "keywords": ["stylesheet", "style", "flex", "grid", "bootstrap"]
+    },
+    "SQL": {
+        "names": ["sql", "mysql", "postgresql"],
+        "extensions": [],
+        "keywords": ["select", "from", "where", "group by"]
+    },
+    "Shell/Bash": {
+        "names": ["bash", "shell"],
+        "extensions": [".sh"],
+        "keywords": ["linux", "unix", "script"]
+    },
+    "Perl": {
+        "names": ["perl"],
+        "extensions": [".pl"],
+        "keywords": ["regex"]
+    },
+    "R": {
+        "names": ["r"],
+        "extensions": [".r"],
+        "keywords": ["statistics", "ggplot", "dplyr"]
+    },
+    "MATLAB": {
+        "names": ["matlab", "octave"],
+        "extensions": [".m"],
+        "keywords": ["matrix"]
+    }
+}
+
+# Score contributed by one match of each kind of signal
+SIGNAL_WEIGHTS = {"names": 3.0, "extensions": 2.0, "keywords": 1.0}
+
+# Everyday English words that only weakly suggest a language
+WEAK_KEYWORDS = {
+    "input", "form", "style", "select", "from", "where",
+    "script", "using", "pointer", "matrix", "statistics", "grid"
+}
+WEAK_KEYWORD_WEIGHT = 0.5
+
+# Language returned when nothing in the prompt points anywhere
+DEFAULT_LANGUAGE = "Python"
+
+# One compiled scanner splits a prompt into words, ".ext" tokens and the
+# symbol-suffixed names c++, c# and vector<
+TOKEN_RE = re.compile(r"\.?[a-z0-9_]+(?:\+\+|#|<)?")
+
+# Function to build the token lookup tables, once per process.
+# Every signal is tokenized with TOKEN_RE and stored with the
+# (language, weight) votes it casts: single tokens in a dict, two-token
+# phrases ("group by", "node.js") in a dict keyed on the token pair.
+def build_detector():
+    unigrams = {}
+    bigrams = {}
+    for language, signals in LANGUAGE_SIGNALS.items():
+        for kind, literals in signals.items():
+            for literal in literals:
+                weight = WEAK_KEYWORD_WEIGHT if literal in WEAK_KEYWORDS else SIGNAL_WEIGHTS[kind]
+                tokens = tuple(TOKEN_RE.findall(literal))
+                table = unigrams if len(tokens) == 1 else bigrams
+                key = tokens[0] if len(tokens) == 1 else tokens
+                table.setdefault(key, []).append((language, weight))
+    return unigrams, bigrams
+
+UNIGRAM_VOTES, BIGRAM_VOTES = build_detector()
+BIGRAM_FIRSTS = {first for first, _ in BIGRAM_VOTES}
+LANGUAGE_ORDER = {language: index for index, language in enumerate(LANGUAGE_SIGNALS)}
+
+# Function to find the votes of a single token, falling back to the bare
+# word when a leading dot or trailing symbol doesn't make a known signal
+def token_votes(token):
+    votes = UNIGRAM_VOTES.get(token)
+    if votes is None:
+        if token[0] == ".":
+            votes = UNIGRAM_VOTES.get(token[1:])
+        elif token[-1] in "+#<":
+            votes = UNIGRAM_VOTES.get(token.rstrip("+#<"))
+    return votes
+
+# Function to rank candidate languages for a prompt in a single pass.
+# Returns [(language, confidence), ...] sorted best first, where confidence
+# is the language's share of the total score; empty if nothing matched.
+def rank_languages(prompt):
+    scores = {}
+    previous = None
+    for token in TOKEN_RE.findall(prompt.lower()):
+        votes = token_votes(token)
+        if votes:
+            for language, weight in votes:
+                scores[language] = scores.get(language, 0.0) + weight
+        if previous in BIGRAM_FIRSTS:
+            for language, weight in BIGRAM_VOTES.get((previous, token), ()):
+                scores[language] = scores.get(language, 0.0) + weight
+        previous = token
+
+    total = sum(scores.values())
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], LANGUAGE_ORDER[item[0]]))
+    return [(language, score / total) for language, score in ranked]
+
+# Function to rank languages for many prompts at once
+def rank_languages_batch(prompts):
+    return [rank_languages(prompt) for prompt in prompts]
+
+# Function to detect programming language from user's prompt
+def detect_language_from_prompt(prompt):
+    ranked = rank_languages(prompt)
+    return ranked[0][0] if ranked else DEFAULT_LANGUAGE
+
+# Function to detect the language of many prompts at once
+def detect_languages_batch(prompts):
+    return [detect_language_from_prompt(prompt) for prompt in prompts]
@@ -0,0 +1,31 @@
+# Programming languages CodeGenie can generate, in the order shown in the UI
+SUPPORTED_LANGUAGES = [
+    "Python", "JavaScript", "Java", "C++", "C", "C#", "Go", "Ruby",
+    "PHP", "Swift", "Kotlin", "Rust", "TypeScript", "HTML", "CSS",
+    "SQL", "Shell/Bash", "Perl", "R", "MATLAB"
+]
+
+# File extension used for downloads and in model prompts
+FILE_EXTENSIONS = {
+    "Python": "py", "JavaScript": "js", "Java": "java", "C++": "cpp",
+    "C": "c", "C#": "cs", "Go": "go", "Ruby": "rb", "PHP": "php",
+    "Swift": "swift", "Kotlin": "kt", "Rust": "rs", "TypeScript": "ts",
+    "HTML": "html", "CSS": "css", "SQL": "sql", "Shell/Bash": "sh",
+    "Perl": "pl", "R": "r", "MATLAB": "m"
+}
+
+# Function to get the supported language with the given name, ignoring case,
+# or None if it isn't supported
+def normalize_language(name):
+    return next((language for language in SUPPORTED_LANGUAGES if language.lower() == name.strip().lower()), None)
+
+# Function to get the file extension for a language
+def file_extension(language):
+    return FILE_EXTENSIONS.get(language, language.lower())
+
+# Function to get the syntax highlighting name st.code uses for a language
+def highlight_language(language):
+    highlight_lang = language.lower()
+    if highlight_lang == "shell/bash":
+        highlight_lang = "bash"
+    return highlight_lang
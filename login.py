@@ -1,39 +1,33 @@
 import streamlit as st
 import hashlib
-import json
-import os
 from datetime import datetime, timedelta
+from user_store import (
+    initialize_user_store,
+    count_users,
+    get_user,
+    create_user,
+    update_password_by_email,
+    record_last_login
+)
 
-# Function to create user database file if it doesn't exist
+# Function to create user database if it doesn't exist
 def initialize_user_database():
-    if not os.path.exists("users"):
-        os.makedirs("users")
+    # Creates users/users.db and imports users/user_database.json on first run
+    initialize_user_store()
     
-    if not os.path.exists("users/user_database.json"):
-        users = {
-            "admin": {
-                "password": hashlib.sha256("admin123".encode()).hexdigest(),
-                "email": "admin@codegenie.com",
-                "creation_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "last_login": None
-            }
-        }
-        with open("users/user_database.json", "w") as f:
-            json.dump(users, f, indent=4)
+    if count_users() == 0:
+        create_user("admin", hashlib.sha256("admin123".encode()).hexdigest(), "admin@codegenie.com")
 
 # Function to authenticate user
 def authenticate_user(username, password):
     try:
-        with open("users/user_database.json", "r") as f:
-            users = json.load(f)
+        user = get_user(username)
         
         hashed_password = hashlib.sha256(password.encode()).hexdigest()
         
-        if username in users and users[username]["password"] == hashed_password:
-            # Update last login
-            users[username]["last_login"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            with open("users/user_database.json", "w") as f:
-                json.dump(users, f, indent=4)
+        if user and user["password"] == hashed_password:
+            # Record last login; it is written to disk in the background
+            record_last_login(username, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
             return True
         return False
     except Exception as e:
@@ -43,59 +37,20 @@ def authenticate_user(username, password):
 # Function to register new user
 def register_user(username, password, email):
     try:
-        # Load existing users
-        with open("users/user_database.json", "r") as f:
-            users = json.load(f)
-        
-        # Check if username already exists
-        if username in users:
-            return False, "Username already exists"
-        
-        # Check if email is already in use
-        for user in users.values():
-            if user["email"] == email:
-                return False, "Email already in use"
-        
-        # Add new user
+        # Username and email checks happen in the same transaction as the insert
         hashed_password = hashlib.sha256(password.encode()).hexdigest()
-        users[username] = {
-            "password": hashed_password,
-            "email": email,
-            "creation_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "last_login": None
-        }
-        
-        # Save updated users
-        with open("users/user_database.json", "w") as f:
-            json.dump(users, f, indent=4)
-        
-        return True, "Registration successful"
+        return create_user(username, hashed_password, email)
     except Exception as e:
         return False, f"Registration error: {e}"
 
 # Function for reset password
 def reset_password(email, new_password):
     try:
-        # Load existing users
-        with open("users/user_database.json", "r") as f:
-            users = json.load(f)
-        
-        # Find user with matching email
-        username_found = None
-        for username, user_data in users.items():
-            if user_data["email"] == email:
-                username_found = username
-                break
+        # Update the password of the user with a matching email
+        hashed_password = hashlib.sha256(new_password.encode()).hexdigest()
+        username_found = update_password_by_email(email, hashed_password)
         
         if username_found:
-            # Update password
-            hashed_password = hashlib.sha256(new_password.encode()).hexdigest()
-            users[username_found]["password"] = hashed_password
-            
-            # Save updated users
-            with open("users/user_database.json", "w") as f:
-                json.dump(users, f, indent=4)
-            
             return True, "Password reset successful"
         else:
             return False, "Email not found"
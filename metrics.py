@@ -0,0 +1,227 @@
+import streamlit as st
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Local Prometheus endpoint (CODEGENIE_METRICS_PORT=0 turns it off)
+METRICS_HOST = os.getenv("CODEGENIE_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("CODEGENIE_METRICS_PORT", "9464"))
+
+# Recent samples kept per series for the p50/p95/p99 shown in the admin panel
+METRICS_WINDOW = int(os.getenv("CODEGENIE_METRICS_WINDOW", "1000"))
+
+# Histogram bucket upper bounds in seconds, from sub-millisecond CPU stages
+# up to slow model calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Stages of a generation request, in the order they happen
+STAGES = [
+    "detect_language",
+    "admission_wait",
+    "queue_wait",
+    "build_prompt",
+    "first_token",
+    "upstream",
+    "parse",
+    "syntax_check",
+    "generate",
+    "save_history",
+    "explain_code",
+    "render"
+]
+
+# Latency distribution of one series: cumulative bucket counts for the
+# Prometheus export plus a sliding window of samples for exact percentiles
+class LatencyHistogram:
+    def __init__(self, window=METRICS_WINDOW):
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        if index < len(self.bucket_counts):
+            self.bucket_counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+# Function to pick a percentile (0-1) from sorted samples
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+# Function to escape a Prometheus label value
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+# Per-stage latency histograms labelled by model and language
+class MetricsRegistry:
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self.series = {}
+        self.tokens = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds, model="", language=""):
+        key = (stage, model or "", language or "")
+        with self.lock:
+            histogram = self.series.get(key)
+            if histogram is None:
+                histogram = self.series[key] = LatencyHistogram(self.window)
+            histogram.observe(seconds)
+
+    # Counts the input and output tokens of one model call
+    def record_tokens(self, model, language, input_tokens, output_tokens):
+        key = (model or "", language or "")
+        with self.lock:
+            counts = self.tokens.setdefault(key, {"calls": 0, "input_tokens": 0, "output_tokens": 0})
+            counts["calls"] += 1
+            counts["input_tokens"] += input_tokens
+            counts["output_tokens"] += output_tokens
+
+    # Returns token totals and per-call means, one row per label combination
+    def token_summary(self, group_by=("model", "language")):
+        groups = {}
+        with self.lock:
+            for (model, language), counts in self.tokens.items():
+                labels = {"model": model, "language": language}
+                group = groups.setdefault(tuple(labels[name] for name in group_by), {"calls": 0, "input_tokens": 0, "output_tokens": 0})
+                for name in group:
+                    group[name] += counts[name]
+
+        rows = []
+        for key, group in sorted(groups.items()):
+            row = {name: value or "-" for name, value in zip(group_by, key)}
+            row.update(group)
+            row["input_per_call"] = group["input_tokens"] / group["calls"]
+            row["output_per_call"] = group["output_tokens"] / group["calls"]
+            rows.append(row)
+        return rows
+
+    # Returns one row per stage and label combination, merging the series that
+    # differ only in labels not listed in group_by ("model", "language")
+    def summary(self, group_by=("model", "language")):
+        groups = {}
+        with self.lock:
+            for (stage, model, language), histogram in self.series.items():
+                labels = {"model": model, "language": language}
+                key = (stage,) + tuple(labels[name] for name in group_by)
+                group = groups.setdefault(key, {"count": 0, "total": 0.0, "samples": []})
+                group["count"] += histogram.count
+                group["total"] += histogram.total
+                group["samples"].extend(histogram.recent)
+
+        rows = []
+        for key, group in groups.items():
+            samples = sorted(group["samples"])
+            row = {"stage": key[0]}
+            row.update({name: value or "-" for name, value in zip(group_by, key[1:])})
+            row.update({
+                "count": group["count"],
+                "mean_ms": group["total"] / group["count"] * 1000,
+                "p50_ms": percentile(samples, 0.50) * 1000,
+                "p95_ms": percentile(samples, 0.95) * 1000,
+                "p99_ms": percentile(samples, 0.99) * 1000
+            })
+            rows.append(row)
+
+        stage_order = {stage: index for index, stage in enumerate(STAGES)}
+        rows.sort(key=lambda row: (stage_order.get(row["stage"], len(STAGES)),) + tuple(row[name] for name in group_by))
+        return rows
+
+    # Adds a function returning more Prometheus text lines to the export
+    def register_collector(self, collector):
+        with self.lock:
+            self.collectors.append(collector)
+
+    def export_prometheus(self):
+        lines = [
+            "# HELP codegenie_stage_duration_seconds Time spent in each stage of a code generation request.",
+            "# TYPE codegenie_stage_duration_seconds histogram"
+        ]
+        with self.lock:
+            for (stage, model, language), histogram in sorted(self.series.items()):
+                labels = f'stage="{escape_label(stage)}",model="{escape_label(model)}",language="{escape_label(language)}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f'codegenie_stage_duration_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+                lines.append(f'codegenie_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"codegenie_stage_duration_seconds_sum{{{labels}}} {histogram.total:.6f}")
+                lines.append(f"codegenie_stage_duration_seconds_count{{{labels}}} {histogram.count}")
+            lines.append("# HELP codegenie_model_tokens_total Tokens sent to and generated by the models.")
+            lines.append("# TYPE codegenie_model_tokens_total counter")
+            for (model, language), counts in sorted(self.tokens.items()):
+                labels = f'model="{escape_label(model)}",language="{escape_label(language)}"'
+                lines.append(f'codegenie_model_tokens_total{{{labels},direction="input"}} {counts["input_tokens"]}')
+                lines.append(f'codegenie_model_tokens_total{{{labels},direction="output"}} {counts["output_tokens"]}')
+            lines.append("# HELP codegenie_model_calls_total Model calls that returned a completion.")
+            lines.append("# TYPE codegenie_model_calls_total counter")
+            for (model, language), counts in sorted(self.tokens.items()):
+                lines.append(f'codegenie_model_calls_total{{model="{escape_label(model)}",language="{escape_label(language)}"}} {counts["calls"]}')
+            collectors = list(self.collectors)
+        for collector in collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+# Function to get the process-wide metrics registry
+@st.cache_resource(show_spinner=False)
+def get_metrics():
+    return MetricsRegistry()
+
+# Function to record how long a stage took
+def observe(stage, seconds, model="", language=""):
+    get_metrics().observe(stage, seconds, model, language)
+
+# Function to count the input and output tokens of one model call
+def record_tokens(model, language, input_tokens, output_tokens):
+    get_metrics().record_tokens(model, language, input_tokens, output_tokens)
+
+# Function to time a block as one stage of a request. Yields the labels so a
+# label only known at the end (e.g. the detected language) can be filled in.
+@contextmanager
+def span(stage, model="", language=""):
+    labels = {"model": model, "language": language}
+    started = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        observe(stage, time.perf_counter() - started, labels["model"], labels["language"])
+
+# Serves GET /metrics in the Prometheus text format
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = get_metrics().export_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+# Function to start the metrics endpoint, once per process. Returns the
+# endpoint URL, or None if it is disabled or the port is already taken.
+@st.cache_resource(show_spinner=False)
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError:
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="codegenie-metrics", daemon=True).start()
+    return f"http://{host}:{server.server_port}/metrics"
@@ -0,0 +1,311 @@
+import streamlit as st
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from metrics import observe, get_metrics, escape_label
+
+# Admission limits in requests per minute (0 = no limit). Every user gets a
+# bucket of USER_RATE and every model one of MODEL_RATE, unless the model has
+# its own rate in CODEGENIE_MODEL_RATES ("model_id=rate,model_id=rate").
+USER_RATE = float(os.getenv("CODEGENIE_USER_RATE", "20"))
+USER_BURST = float(os.getenv("CODEGENIE_USER_BURST", "5"))
+MODEL_RATE = float(os.getenv("CODEGENIE_MODEL_RATE", "60"))
+MODEL_BURST = float(os.getenv("CODEGENIE_MODEL_BURST", "10"))
+MODEL_RATES = os.getenv("CODEGENIE_MODEL_RATES", "")
+
+# Longest a request waits in the admission queue before it is turned away
+ADMISSION_TIMEOUT = float(os.getenv("CODEGENIE_ADMISSION_TIMEOUT", "120"))
+
+# Token bucket: allows `rate` requests per second on average with bursts of up
+# to `burst` requests. A rate of 0 or less means unlimited.
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = max(1.0, float(burst if burst is not None else rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Returns how many seconds until `tokens` tokens are available (0 if they
+    # are now). More than a full bucket only waits for a full bucket.
+    def wait_time(self, tokens=1):
+        if self.rate <= 0:
+            return 0.0
+        needed = min(tokens, self.capacity)
+        with self.lock:
+            self.refill(time.monotonic())
+            return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    # Takes `tokens` tokens, even if that leaves the bucket in debt
+    def take(self, tokens=1):
+        if self.rate <= 0:
+            return
+        with self.lock:
+            self.refill(time.monotonic())
+            self.tokens -= tokens
+
+    # Takes a token if one is available; otherwise returns how many seconds
+    # to wait before trying again
+    def try_acquire(self):
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            self.refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    # Blocks until a token is available. Gives up and returns False once
+    # `timeout` seconds have passed, if a timeout is given.
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+# Function to read per-model rates from "model_id=rate,model_id=rate"
+def parse_model_rates(value):
+    rates = {}
+    for item in value.split(","):
+        model_id, _, rate = item.strip().rpartition("=")
+        if model_id and rate:
+            rates[model_id] = float(rate)
+    return rates
+
+# Function to get the model label of a request's metrics
+def metrics_model(model_ids):
+    return model_ids[0] if len(set(model_ids)) == 1 else "multiple"
+
+# Admission control for upstream requests: a token bucket per user and per
+# model. A request takes one token from its user's bucket and one from a
+# model's bucket for every call it makes to that model, so a model id listed
+# N times costs N model tokens. Requests that can't go yet wait in a queue
+# per user, and the queues are served round-robin, so while a model's budget
+# is used up each waiting user gets the next free slot in turn instead of
+# whoever asks most often.
+# Callers either block in acquire() or queue a ticket with reserve() and are
+# called back from a dispatcher thread, so nothing holds a worker thread while
+# it waits for its turn.
+class AdmissionController:
+    def __init__(self, user_rate=USER_RATE, user_burst=USER_BURST, model_rate=MODEL_RATE, model_burst=MODEL_BURST, model_rates=None):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.model_rate = model_rate
+        self.model_burst = model_burst
+        self.model_rates = parse_model_rates(MODEL_RATES) if model_rates is None else model_rates
+        self.user_buckets = {}
+        self.model_buckets = {}
+        self.user_counters = {}
+        self.model_counters = {}
+        # username -> waiting tickets, in the order the users will be served
+        self.waiting = OrderedDict()
+        self.condition = threading.Condition()
+        self.dispatcher = None
+        # Reserved tickets granted by dispatch(), for the dispatcher to call back
+        self.ready = []
+
+    def user_bucket(self, username):
+        if username not in self.user_buckets:
+            self.user_buckets[username] = TokenBucket(self.user_rate / 60, self.user_burst)
+        return self.user_buckets[username]
+
+    def model_bucket(self, model_id):
+        if model_id not in self.model_buckets:
+            self.model_buckets[model_id] = TokenBucket(self.model_rates.get(model_id, self.model_rate) / 60, self.model_burst)
+        return self.model_buckets[model_id]
+
+    def count(self, ticket, counter):
+        for counters, key in [(self.user_counters, ticket["username"])] + [(self.model_counters, model_id) for model_id in dict.fromkeys(ticket["model_ids"])]:
+            counters.setdefault(key, {"admitted": 0, "waited": 0, "timed_out": 0})[counter] += 1
+
+    # Grants every ticket that can go now, starting with the user served
+    # longest ago; a served user moves to the back of the rotation. Returns
+    # the seconds until the next waiting ticket might be granted.
+    def dispatch(self):
+        while True:
+            next_wait = None
+            for username in list(self.waiting):
+                ticket = self.waiting[username][0]
+                costs = [(self.user_bucket(username), 1)] + [(self.model_bucket(model_id), calls) for model_id, calls in Counter(ticket["model_ids"]).items()]
+                wait = max(bucket.wait_time(tokens) for bucket, tokens in costs)
+                if wait == 0:
+                    break
+                next_wait = wait if next_wait is None else min(next_wait, wait)
+            else:
+                return next_wait
+
+            for bucket, tokens in costs:
+                bucket.take(tokens)
+            ticket["granted"] = True
+            if ticket.get("on_grant"):
+                self.ready.append(ticket)
+            self.waiting[username].popleft()
+            if self.waiting[username]:
+                self.waiting.move_to_end(username)
+            else:
+                del self.waiting[username]
+            self.condition.notify_all()
+
+    # Returns how many waiting requests will be served before this ticket
+    def position(self, ticket):
+        tickets = self.waiting[ticket["username"]]
+        index = next(i for i, other in enumerate(tickets) if other is ticket)
+        ahead = 0
+        before_user = True
+        for username, tickets in self.waiting.items():
+            if username == ticket["username"]:
+                before_user = False
+                ahead += index
+            else:
+                ahead += min(len(tickets), index + 1 if before_user else index)
+        return ahead
+
+    def remove(self, ticket):
+        # Tickets of one user can be equal, so find this one by identity
+        tickets = self.waiting[ticket["username"]]
+        del tickets[next(i for i, other in enumerate(tickets) if other is ticket)]
+        if not tickets:
+            del self.waiting[ticket["username"]]
+
+    # Queues a request without blocking. From the dispatcher thread,
+    # on_wait(position) is called while it waits and on_grant(admitted) once:
+    # with True when the request may go, or False if it wasn't admitted within
+    # `timeout` seconds. The callbacks run under the controller's lock, so
+    # they must not call back into it.
+    def reserve(self, username, model_ids, on_grant, timeout=ADMISSION_TIMEOUT, on_wait=None):
+        started = time.monotonic()
+        ticket = {
+            "username": username,
+            "model_ids": list(model_ids),
+            "granted": False,
+            "on_grant": on_grant,
+            "on_wait": on_wait,
+            "started": started,
+            "deadline": None if timeout is None else started + timeout,
+            "waited": False
+        }
+        with self.condition:
+            self.waiting.setdefault(username, deque()).append(ticket)
+            if self.dispatcher is None:
+                self.dispatcher = threading.Thread(target=self.run_dispatcher, name="codegenie-admission", daemon=True)
+                self.dispatcher.start()
+            self.condition.notify_all()
+        return ticket
+
+    # Grants, expires and reports the position of reserved tickets
+    def run_dispatcher(self):
+        with self.condition:
+            while True:
+                wait = self.dispatch()
+                now = time.monotonic()
+                reserved = [ticket for tickets in self.waiting.values() for ticket in tickets if ticket.get("on_grant")]
+                for ticket in reserved:
+                    if ticket["deadline"] is not None and now >= ticket["deadline"]:
+                        self.remove(ticket)
+                        self.count(ticket, "timed_out")
+                        ticket["on_grant"](False)
+
+                for ticket in self.ready:
+                    self.count(ticket, "admitted")
+                    if ticket["waited"]:
+                        self.count(ticket, "waited")
+                    observe("admission_wait", now - ticket["started"], metrics_model(ticket["model_ids"]))
+                    ticket["on_grant"](True)
+                self.ready = []
+
+                reserved = [ticket for tickets in self.waiting.values() for ticket in tickets if ticket.get("on_grant")]
+                for ticket in reserved:
+                    ticket["waited"] = True
+                    if ticket["on_wait"]:
+                        ticket["on_wait"](self.position(ticket))
+
+                # Sleep until a bucket refills or a deadline passes (at most a
+                # second, to refresh positions), or until a new reservation
+                timeouts = [value for value in [wait, 1.0] + [ticket["deadline"] - now for ticket in reserved if ticket["deadline"] is not None] if value is not None]
+                self.condition.wait(max(0.0, min(timeouts)) if reserved else None)
+
+    # Waits until the user may send a request to all of `model_ids`. Calls
+    # on_wait(position) while the request is queued. Returns False if it
+    # wasn't admitted within `timeout` seconds.
+    def acquire(self, username, model_ids, timeout=ADMISSION_TIMEOUT, on_wait=None):
+        ticket = {"username": username, "model_ids": list(model_ids), "granted": False}
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        waited = False
+        with self.condition:
+            self.waiting.setdefault(username, deque()).append(ticket)
+            while True:
+                wait = self.dispatch()
+                if ticket["granted"]:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.remove(ticket)
+                    self.count(ticket, "timed_out")
+                    self.condition.notify_all()
+                    return False
+                waited = True
+                if on_wait:
+                    on_wait(self.position(ticket))
+                # Wake up at least once a second to refresh the queue position
+                self.condition.wait(min(value for value in (wait, remaining, 1.0) if value is not None))
+
+            self.count(ticket, "admitted")
+            if waited:
+                self.count(ticket, "waited")
+        observe("admission_wait", time.monotonic() - started, metrics_model(ticket["model_ids"]))
+        return True
+
+    def stats(self):
+        with self.condition:
+            return {
+                "limits_per_minute": {
+                    "user": self.user_rate,
+                    "user_burst": self.user_burst,
+                    "model": self.model_rate,
+                    "model_burst": self.model_burst,
+                    "model_overrides": dict(self.model_rates)
+                },
+                "waiting": sum(len(tickets) for tickets in self.waiting.values()),
+                "users": {username: dict(counters, waiting=len(self.waiting.get(username, ()))) for username, counters in self.user_counters.items()},
+                "models": {model_id: dict(counters) for model_id, counters in self.model_counters.items()}
+            }
+
+    # Counters in the Prometheus text format, for the /metrics endpoint
+    def export_prometheus(self):
+        stats = self.stats()
+        lines = [
+            "# HELP codegenie_admission_requests_total Requests through admission control by outcome.",
+            "# TYPE codegenie_admission_requests_total counter"
+        ]
+        for scope in ("users", "models"):
+            label = scope[:-1]
+            for name, counters in sorted(stats[scope].items()):
+                for outcome in ("admitted", "waited", "timed_out"):
+                    lines.append(f'codegenie_admission_requests_total{{{label}="{escape_label(name)}",outcome="{outcome}"}} {counters[outcome]}')
+        lines.append("# HELP codegenie_admission_waiting Requests waiting for their turn.")
+        lines.append("# TYPE codegenie_admission_waiting gauge")
+        lines.append(f"codegenie_admission_waiting {stats['waiting']}")
+        return lines
+
+# Function to get the process-wide admission controller
+@st.cache_resource(show_spinner=False)
+def get_admission_controller():
+    controller = AdmissionController()
+    get_metrics().register_collector(controller.export_prometheus)
+    return controller
+
+# Function to wait for a user's turn to query the given models; returns
+# False if the request should be turned away
+def admit_request(username, model_ids, on_wait=None):
+    return get_admission_controller().acquire(username, model_ids, on_wait=on_wait)
@@ -0,0 +1,137 @@
+import streamlit as st
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import os
+import random
+import threading
+import time
+
+# Retry and circuit breaker settings, overridable from the environment
+MAX_RETRIES = int(os.getenv("CODEGENIE_MAX_RETRIES", "3"))
+RETRY_BASE_DELAY = float(os.getenv("CODEGENIE_RETRY_BASE_DELAY", "1"))
+RETRY_MAX_DELAY = float(os.getenv("CODEGENIE_RETRY_MAX_DELAY", "20"))
+RETRY_MAX_WAIT = float(os.getenv("CODEGENIE_RETRY_MAX_WAIT", "45"))
+RETRY_BUDGET_RATIO = float(os.getenv("CODEGENIE_RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN = float(os.getenv("CODEGENIE_RETRY_BUDGET_MIN", "10"))
+BREAKER_THRESHOLD = int(os.getenv("CODEGENIE_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("CODEGENIE_BREAKER_COOLDOWN", "30"))
+
+# Status codes worth retrying: rate limited, model loading and gateway errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Function to compute the jittered exponential backoff before a retry.
+# A server-provided hint (estimated_time / Retry-After) takes precedence.
+def compute_backoff(attempt, hint=None):
+    if hint is not None:
+        return min(hint, RETRY_MAX_DELAY) + random.uniform(0, 1)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+# Function to read how long the server asked us to wait, if it said so
+def parse_retry_hint(response):
+    # Hugging Face reports cold models as 503 {"error": ..., "estimated_time": seconds}
+    try:
+        body = response.json()
+        if isinstance(body, dict) and "estimated_time" in body:
+            return float(body["estimated_time"])
+    except ValueError:
+        pass
+
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(retry_after)
+                return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                pass
+    return None
+
+# Process-wide retry budget: every request earns a fraction of a retry and
+# every retry spends one, so retries stay a bounded share of upstream traffic
+# instead of multiplying load while a model is struggling.
+class RetryBudget:
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, minimum=RETRY_BUDGET_MIN):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.tokens = minimum
+        self.lock = threading.Lock()
+
+    def record_request(self):
+        with self.lock:
+            self.tokens = min(self.tokens + self.ratio, self.minimum * 10)
+
+    def try_spend(self):
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+# Per-model circuit breaker. After BREAKER_THRESHOLD consecutive failures the
+# circuit opens and requests fail fast; after the cooldown a single trial
+# request is let through (half-open) and its outcome closes or re-opens it.
+class CircuitBreaker:
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half-open"
+                self.trial_in_flight = False
+            if self.state == "half-open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def is_available(self):
+        with self.lock:
+            if self.state == "open":
+                return time.monotonic() - self.opened_at >= self.cooldown
+            return not (self.state == "half-open" and self.trial_in_flight)
+
+    def retry_in(self):
+        with self.lock:
+            return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == "half-open" or self.failures >= self.threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+# Function to get the circuit breaker for a model, shared by all sessions
+@st.cache_resource(show_spinner=False)
+def get_circuit_breaker(model_id):
+    return CircuitBreaker()
+
+# Function to get the process-wide retry budget
+@st.cache_resource(show_spinner=False)
+def get_retry_budget():
+    return RetryBudget()
+
+# Function to pick the first model whose circuit is not open, falling back
+# to the first choice when every circuit is open
+def pick_available_model(model_ids):
+    for model_id in model_ids:
+        if get_circuit_breaker(model_id).is_available():
+            return model_id
+    return model_ids[0]
@@ -0,0 +1,51 @@
+import streamlit as st
+import threading
+
+# Single-flight call coalescing: while a call for a key is in flight, other
+# callers with the same key wait for it and share its result instead of
+# starting their own.
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.counters = {"calls": 0, "coalesced": 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self.calls[key] = call
+                self.counters["calls"] += 1
+                leader = True
+            else:
+                self.counters["coalesced"] += 1
+                leader = False
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn(*args, **kwargs)
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call["done"].set()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["in_flight"] = len(self.calls)
+            return stats
+
+# Function to get the process-wide single-flight group shared by all sessions
+@st.cache_resource(show_spinner=False)
+def get_single_flight():
+    return SingleFlight()
@@ -0,0 +1,73 @@
+import streamlit as st
+import ast
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from metrics import span
+
+# Syntax checker settings, overridable from the environment
+SYNTAX_CHECK_TIMEOUT = float(os.getenv("CODEGENIE_SYNTAX_CHECK_TIMEOUT", "5"))
+SYNTAX_CHECK_WORKERS = int(os.getenv("CODEGENIE_SYNTAX_CHECK_WORKERS", "4"))
+
+# Compilers and linters that check syntax without running the code, by
+# language. Each reads the code from stdin; languages whose tool isn't
+# installed are not checked.
+SYNTAX_CHECK_COMMANDS = {
+    "JavaScript": ["node", "--input-type=module", "--check"],
+    "C": ["gcc", "-fsyntax-only", "-x", "c", "-"],
+    "C++": ["g++", "-fsyntax-only", "-std=c++17", "-x", "c++", "-"],
+    # gofmt accepts declarations without a package clause on stdin
+    "Go": ["gofmt", "-e"],
+    "Ruby": ["ruby", "-c"],
+    "PHP": ["php", "-l"],
+    "Shell/Bash": ["bash", "-n"]
+}
+
+# Function to get the slots for checker processes, so a burst of candidates
+# doesn't start more compilers than the machine can run at once
+@st.cache_resource(show_spinner=False)
+def get_syntax_check_slots(workers=SYNTAX_CHECK_WORKERS):
+    return threading.BoundedSemaphore(max(1, workers))
+
+# Function to check Python syntax in-process by parsing without compiling
+def check_python(code):
+    try:
+        ast.parse(code)
+    except (SyntaxError, ValueError) as e:
+        return False, f"{type(e).__name__}: {e}"
+    return True, None
+
+# Function to run a language's checker on some code in a scratch directory,
+# with only PATH in its environment and a time limit
+def run_syntax_checker(command, code):
+    with get_syntax_check_slots():
+        with tempfile.TemporaryDirectory(prefix="codegenie-check-") as scratch_dir:
+            try:
+                result = subprocess.run(
+                    command,
+                    input=code.encode(),
+                    capture_output=True,
+                    cwd=scratch_dir,
+                    env={"PATH": os.environ.get("PATH", ""), "HOME": scratch_dir},
+                    timeout=SYNTAX_CHECK_TIMEOUT
+                )
+            except (OSError, subprocess.TimeoutExpired):
+                return None, "The syntax checker did not finish."
+    if result.returncode != 0:
+        # Report the first line that names the error, not a location header
+        lines = (result.stderr or result.stdout).decode(errors="replace").strip().splitlines()
+        return False, next((line for line in lines if "error" in line.lower()), lines[0] if lines else "Syntax error")
+    return True, None
+
+# Function to check that generated code parses. Returns (valid, message):
+# valid is True or False, or None when the language can't be checked here.
+def check_syntax(code, language):
+    with span("syntax_check", "", language):
+        if language == "Python":
+            return check_python(code)
+        command = SYNTAX_CHECK_COMMANDS.get(language)
+        if command is None or shutil.which(command[0]) is None:
+            return None, None
+        return run_syntax_checker(command, code)
@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Run against scratch stores and the canned test backend, never the hosted API
+SCRATCH_DIR = tempfile.mkdtemp(prefix="codegenie-tests-")
+os.environ["CODEGENIE_HISTORY_DB"] = os.path.join(SCRATCH_DIR, "history.db")
+os.environ["CODEGENIE_USER_DB"] = os.path.join(SCRATCH_DIR, "users.db")
+os.environ["CODEGENIE_CACHE_DIR"] = os.path.join(SCRATCH_DIR, "cache")
+os.environ["CODEGENIE_FAKE_BACKEND"] = "true"
+os.environ["CODEGENIE_FAKE_LATENCY"] = "0"
+os.environ["CODEGENIE_METRICS_PORT"] = "0"
+
+import logging
+import streamlit.logger
+streamlit.logger.set_log_level("error")
+logging.getLogger("streamlit").setLevel(logging.ERROR)
@@ -0,0 +1,39 @@
+import http.client
+import json
+import threading
+import pytest
+from api_server import create_api_server, encode_cursor
+from history_store import save_history_entry
+from user_store import create_api_token
+
+@pytest.fixture(scope="module")
+def api():
+    server = create_api_server("127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    headers = {"Authorization": f"Bearer {create_api_token('api-tester')}"}
+
+    def get(path):
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        payload = json.loads(response.read())
+        connection.close()
+        return response.status, payload
+
+    yield get
+    server.shutdown()
+
+def test_history_pages_follow_the_cursor(api):
+    for i in range(3):
+        save_history_entry("api-tester", f"prompt {i}", "Python", f"print({i})")
+    status, first = api("/api/history?limit=2")
+    assert status == 200
+    assert [entry["prompt"] for entry in first["entries"]] == ["prompt 2", "prompt 1"]
+    status, second = api(f"/api/history?limit=2&cursor={first['next_cursor']}")
+    assert status == 200
+    assert [entry["prompt"] for entry in second["entries"]] == ["prompt 0"]
+    assert second["next_cursor"] is None
+
+@pytest.mark.parametrize("cursor", ["NQ==", "not-base64!", encode_cursor(["2026-01-01 00:00:00"]), encode_cursor([1, "x"])])
+def test_invalid_cursors_are_rejected(api, cursor):
+    assert api(f"/api/history?cursor={cursor}") == (400, {"error": "Invalid cursor"})
@@ -0,0 +1,22 @@
+import re
+import pytest
+from code_explainer import LANGUAGE_FEATURES, analyze_code, code_tokens, compile_tokenizer, literal_pattern
+
+def test_apostrophes_in_html_text_are_not_strings():
+    features, _ = analyze_code("<p>Don't do it</p><form action='x'><input></form><p>it's</p>", "HTML")
+    assert features == ["form", "input"]
+
+def test_html_attribute_values_and_comments_are_skipped():
+    features, _ = analyze_code("<div title=\"<table\" class='<span'>x</div><!-- <button> -->", "HTML")
+    assert features == ["div"]
+
+def test_literal_triggers_next_to_each_other():
+    assert {"?.", "?:"} <= code_tokens("val n = user?.name ?: \"\"", "Kotlin")
+    assert {"<-", "%>%", "|>"} <= code_tokens("x <- df %>% f() |> g()", "R")
+
+@pytest.mark.parametrize("language", sorted(LANGUAGE_FEATURES))
+def test_single_pass_finds_every_literal_trigger(language):
+    _, _, literals = compile_tokenizer(language)
+    text = "\n".join(f"x {literal} y" for literal in literals)
+    assert all(re.search(literal_pattern(literal), text, re.IGNORECASE) for literal in literals)
+    assert set(literals) <= code_tokens(text, language)
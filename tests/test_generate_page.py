@@ -0,0 +1,62 @@
+import os
+import time
+import backends
+import metrics
+from jobs import get_job_queue
+from streamlit.testing.v1 import AppTest
+from conftest import ROOT
+
+# Function to open a logged-in session of the app
+def start_session(username):
+    app = AppTest.from_file(os.path.join(ROOT, "app1.py"), default_timeout=30)
+    app.session_state["authenticated"] = True
+    app.session_state["username"] = username
+    app.run()
+    return app
+
+def generate_button(app):
+    return [button for button in app.button if "Generate" in button.label][0]
+
+def test_generate_is_refused_while_the_previous_request_runs(monkeypatch):
+    monkeypatch.setattr(backends, "FAKE_LATENCY", 0.5)
+    app = start_session("one-job")
+    [selectbox for selectbox in app.selectbox if selectbox.label == "Select AI Model"][0].set_value("Test Model (canned output)")
+    app.text_area[0].input("Create a Python function that reverses a string")
+    generate_button(app).click()
+    app.run()
+    first_job_id = app.session_state["generation"]["job_id"]
+    assert first_job_id
+
+    # A second click in the run that submitted the job still doesn't start
+    # another one; from the next rerun on the button is off
+    generate_button(app).click()
+    app.run()
+    assert generate_button(app).disabled
+    assert app.session_state["generation"]["job_id"] == first_job_id
+    assert get_job_queue().active_count("one-job") == 1
+
+    for _ in range(100):
+        if not app.session_state["generation"]["job_id"]:
+            break
+        time.sleep(0.05)
+        app.run()
+    assert app.session_state["generation"]["code"]
+    assert not generate_button(app).disabled
+
+def test_render_is_recorded_once_per_generation(monkeypatch):
+    stages = []
+    monkeypatch.setattr(metrics, "observe", lambda stage, *args, **kwargs: stages.append(stage))
+    app = start_session("render-once")
+    [selectbox for selectbox in app.selectbox if selectbox.label == "Select AI Model"][0].set_value("Test Model (canned output)")
+    app.text_area[0].input("Create a Python function that adds two numbers")
+    generate_button(app).click()
+    app.run()
+    for _ in range(100):
+        if not app.session_state["generation"]["job_id"]:
+            break
+        time.sleep(0.05)
+        app.run()
+    for _ in range(3):
+        app.run()
+    assert app.session_state["generation"]["code"]
+    assert stages.count("render") == 1
@@ -0,0 +1,17 @@
+import generation_cache
+from generation_cache import make_cache_key, normalize_prompt
+
+def cache_key(prompt):
+    return make_cache_key("model", "Python", prompt, False, "Standard", 500, 0.7)
+
+def test_whitespace_differences_share_an_entry():
+    assert normalize_prompt("  sort\n a   list\t") == "sort a list"
+    assert cache_key("sort a list") == cache_key(" sort\n\na  list ")
+
+def test_case_differences_do_not_share_an_entry():
+    assert cache_key("class UserStore") != cache_key("class userstore")
+
+def test_prompt_version_is_part_of_the_key(monkeypatch):
+    key = cache_key("sort a list")
+    monkeypatch.setattr(generation_cache, "PROMPT_VERSION", generation_cache.PROMPT_VERSION + 1)
+    assert cache_key("sort a list") != key
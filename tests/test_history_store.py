@@ -0,0 +1,39 @@
+import datetime
+import pytest
+from history_store import get_history_entry, list_history_page, save_history_entry, search_history
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "history.db")
+
+def test_pages_cover_the_history_once_newest_first(db_path):
+    ids = [save_history_entry("pager", f"prompt {i}", "Python", f"print({i})", db_path=db_path) for i in range(45)]
+    save_history_entry("someone-else", "prompt", "Python", "print()", db_path=db_path)
+
+    seen = []
+    cursor = None
+    for expected_size in (20, 20, 5):
+        entries, cursor = list_history_page("pager", limit=20, cursor=cursor, db_path=db_path)
+        assert len(entries) == expected_size
+        assert "code" not in entries[0]
+        seen += [entry["id"] for entry in entries]
+    assert cursor is None
+    assert seen == sorted(ids, reverse=True)
+
+def test_entries_belong_to_their_user(db_path):
+    entry_id = save_history_entry("owner", "reverse a string", "Python", "s[::-1]", db_path=db_path)
+    assert get_history_entry(entry_id, "owner", db_path=db_path)["code"] == "s[::-1]"
+    assert get_history_entry(entry_id, "intruder", db_path=db_path) is None
+    assert search_history("intruder", "reverse", db_path=db_path) == []
+
+def test_search_ranks_prompt_matches_first_and_filters(db_path):
+    in_code = save_history_entry("searcher", "sort a list", "Python", "# binary search helper", db_path=db_path)
+    in_prompt = save_history_entry("searcher", "binary search over an array", "Java", "int find() {}", db_path=db_path)
+    save_history_entry("searcher", "parse a date", "Python", "datetime", db_path=db_path)
+
+    assert [entry["id"] for entry in search_history("searcher", "binary search", db_path=db_path)] == [in_prompt, in_code]
+    assert [entry["id"] for entry in search_history("searcher", "binary", language="Python", db_path=db_path)] == [in_code]
+
+    today = datetime.date.today()
+    assert len(search_history("searcher", date_from=today, date_to=today, db_path=db_path)) == 3
+    assert search_history("searcher", date_to=today - datetime.timedelta(days=1), db_path=db_path) == []
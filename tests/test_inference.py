@@ -0,0 +1,62 @@
+import pytest
+from backends import get_backend
+from inference import CLOSING_FENCE, STOP_SEQUENCES, CodeExtractor, build_prompt, call_code_api, extract_code, stop_sequences, stream_code_api
+
+FENCED_COMPLETION = "```python\ndef add(a, b):\n    return a + b\n```\n\nThis adds two numbers.\n"
+PLAIN_COMPLETION = "def add(a, b):\n    return a + b\n```\n\nThis adds two numbers.\n"
+
+# Function to end a completion where a stop sequence first appears, as the
+# inference servers do
+def stop_at(completion, stops):
+    cuts = [completion.find(stop) for stop in stops if stop in completion]
+    return completion[:min(cuts)] if cuts else completion
+
+@pytest.mark.parametrize("family", sorted(STOP_SEQUENCES))
+@pytest.mark.parametrize("completion", [FENCED_COMPLETION, PLAIN_COMPLETION])
+def test_generation_stops_at_the_closing_fence(family, completion):
+    generated = stop_at(completion, STOP_SEQUENCES[family])
+    assert "This adds two numbers" not in generated
+    assert extract_code(generated) == "def add(a, b):\n    return a + b"
+
+@pytest.mark.parametrize("model_id", ["mistralai/Mistral-7B-Instruct-v0.2", "Qwen/Qwen2.5-Coder-7B-Instruct", "bigscience/bloomz", "fake:canned"])
+def test_opening_fences_do_not_stop_generation(model_id):
+    assert CLOSING_FENCE in stop_sequences(model_id)
+    assert CLOSING_FENCE not in build_prompt("add two numbers", "Python", model_id)
+    assert stop_at(FENCED_COMPLETION, stop_sequences(model_id)).startswith("```python\ndef add")
+
+def test_fake_backend_stops_at_the_closing_fence():
+    completion, error = get_backend("fake:canned").complete("prompt", 256, 0.2, None, stop=stop_sequences("fake:canned"))
+    assert error is None
+    assert completion.startswith("# Canned response")
+    assert "```" not in completion and "test backend and takes" not in completion
+
+@pytest.mark.parametrize("completion", [FENCED_COMPLETION, "\n" + FENCED_COMPLETION, PLAIN_COMPLETION])
+def test_extract_code_allows_a_leading_fence(completion):
+    assert extract_code(completion) == "def add(a, b):\n    return a + b"
+
+@pytest.mark.parametrize("completion", [FENCED_COMPLETION, "\n" + FENCED_COMPLETION, PLAIN_COMPLETION])
+@pytest.mark.parametrize("chunk", [1, 2, 3, 7])
+def test_code_extractor_matches_extract_code(completion, chunk):
+    extractor = CodeExtractor()
+    for end in range(chunk, len(completion) + chunk, chunk):
+        extractor.update(completion[:end])
+        if extractor.done:
+            break
+    assert extractor.done
+    assert extractor.code() == extract_code(completion)
+
+def test_code_extractor_holds_back_a_partial_fence():
+    extractor = CodeExtractor()
+    extractor.update("x = 1\n`")
+    assert not extractor.done
+    assert extractor.code() == "x = 1"
+
+@pytest.mark.parametrize("model_id", ["fake:canned", "fake:fenced"])
+def test_completion_that_opens_its_own_fence(model_id):
+    code, error = call_code_api("add two numbers", "Python", model_id, 256, 0.2)
+    assert error is None
+    assert code.startswith("# Canned response")
+    assert "```" not in code
+
+    streamed = [code for code, error in stream_code_api("add two numbers", "Python", model_id, 256, 0.2)]
+    assert streamed[-1] == code
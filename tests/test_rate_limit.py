@@ -0,0 +1,156 @@
+import threading
+import time
+import batch
+import jobs
+from jobs import JobQueue, RATE_LIMITED_MESSAGE, USER_BUSY_MESSAGE
+from rate_limit import AdmissionController, TokenBucket
+
+# Function to wait until a job reaches one of the given statuses
+def wait_for(queue, job_id, statuses=("done", "failed"), timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} is still {queue.get(job_id)['status']}")
+
+def finish_job(queue):
+    def run(job_id):
+        queue.update(job_id, code="done")
+    return run
+
+def test_token_bucket_allows_burst_then_rate():
+    bucket = TokenBucket(rate=100, burst=2)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() > 0
+    assert bucket.acquire(timeout=0.1)
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(rate=0)
+    assert all(bucket.try_acquire() == 0 for _ in range(100))
+
+def test_waiting_users_are_served_round_robin():
+    controller = AdmissionController(user_rate=0, model_rate=60 * 20, model_burst=1, model_rates={})
+    assert controller.acquire("heavy", ["model"])
+    order = []
+    lock = threading.Lock()
+
+    def request(username):
+        controller.acquire(username, ["model"], timeout=5)
+        with lock:
+            order.append(username)
+
+    threads = [threading.Thread(target=request, args=("heavy",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.02)
+    light = threading.Thread(target=request, args=("light",))
+    light.start()
+    for thread in threads + [light]:
+        thread.join()
+    # The light user's only request goes ahead of most of the heavy queue
+    assert order.index("light") <= 1
+
+def test_acquire_times_out():
+    controller = AdmissionController(user_rate=1, user_burst=1, model_rate=0, model_rates={})
+    assert controller.acquire("user", ["model"])
+    assert not controller.acquire("user", ["model"], timeout=0.05)
+    assert controller.stats()["users"]["user"]["timed_out"] == 1
+    assert controller.stats()["waiting"] == 0
+
+def test_reserve_calls_back_when_admitted():
+    controller = AdmissionController(user_rate=60 * 20, user_burst=1, model_rate=0, model_rates={})
+    granted = []
+    for _ in range(3):
+        controller.reserve("user", ["model"], granted.append)
+    deadline = time.monotonic() + 2
+    while len(granted) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert granted == [True, True, True]
+
+def test_reserve_fails_after_timeout():
+    controller = AdmissionController(user_rate=1, user_burst=1, model_rate=0, model_rates={})
+    granted = []
+    controller.reserve("user", ["model"], granted.append)
+    controller.reserve("user", ["model"], granted.append, timeout=0.05)
+    time.sleep(0.2)
+    assert granted == [True, False]
+
+def test_each_call_to_a_model_takes_a_token():
+    controller = AdmissionController(user_rate=0, model_rate=1, model_burst=3, model_rates={})
+    assert controller.acquire("user", ["model"] * 3)
+    assert not controller.acquire("other", ["model"], timeout=0.05)
+    assert controller.stats()["models"]["model"] == {"admitted": 1, "waited": 0, "timed_out": 1}
+
+def test_candidates_are_charged_per_candidate(monkeypatch):
+    reserved = []
+    controller = AdmissionController(user_rate=0, model_rate=0, model_rates={})
+    monkeypatch.setattr(controller, "reserve", lambda username, model_ids, *args, **kwargs: reserved.append(model_ids))
+    monkeypatch.setattr(jobs, "get_admission_controller", lambda: controller)
+    monkeypatch.setattr(jobs, "get_job_queue", lambda: JobQueue(workers=1))
+    jobs.submit_generation_job({"username": "user", "mode": "candidates", "candidates": 3, "model_ids": ["model"]})
+    assert reserved == [["model", "model", "model"]]
+
+def test_rate_limited_user_does_not_hold_workers(monkeypatch):
+    controller = AdmissionController(user_rate=60, user_burst=1, model_rate=0, model_rates={})
+    monkeypatch.setattr(jobs, "get_admission_controller", lambda: controller)
+    queue = JobQueue(workers=2, max_jobs=32, max_user_jobs=8)
+
+    for _ in range(8):
+        job_id, error = queue.submit(finish_job(queue), username="heavy", model_ids=["model"])
+        assert error is None
+    started = time.monotonic()
+    job_id, _ = queue.submit(finish_job(queue), username="idle", model_ids=["model"])
+    assert wait_for(queue, job_id)["status"] == "done"
+    assert time.monotonic() - started < 0.5
+
+def test_throttled_batches_do_not_hold_interactive_workers(monkeypatch):
+    queue = JobQueue(workers=1, batch_workers=1, max_user_jobs=8)
+    throttled = threading.Event()
+    release = threading.Event()
+
+    def wait_for_turn(username, model_ids):
+        throttled.set()
+        return release.wait(5)
+
+    monkeypatch.setattr(batch, "get_job_queue", lambda: queue)
+    monkeypatch.setattr(batch, "admit_request", wait_for_turn)
+    rows = [{"index": i, "prompt": f"throttled batch row {i}", "language": "Python", "model_id": "fake:canned"} for i in range(2)]
+    request = {"username": "batcher", "rows": rows, "concurrency": 1, "max_length": 64, "temperature": 0.2, "api_key": None}
+    batch_id, error = batch.submit_batch_job(request)
+    assert error is None
+    assert batch.submit_batch_job(request)[1] is None
+    assert throttled.wait(2)
+
+    try:
+        job_id, error = queue.submit(finish_job(queue), username="interactive")
+        assert error is None
+        assert wait_for(queue, job_id, timeout=1)["status"] == "done"
+        assert queue.get(batch_id)["status"] == "running"
+    finally:
+        release.set()
+    assert wait_for(queue, batch_id)["status"] == "done"
+
+def test_job_fails_when_not_admitted_in_time(monkeypatch):
+    controller = AdmissionController(user_rate=1, user_burst=1, model_rate=0, model_rates={})
+    monkeypatch.setattr(jobs, "get_admission_controller", lambda: controller)
+    monkeypatch.setattr(controller, "reserve", lambda *args, **kwargs: AdmissionController.reserve(controller, *args, timeout=0.05, **kwargs))
+    queue = JobQueue(workers=1)
+
+    first, _ = queue.submit(finish_job(queue), username="user", model_ids=["model"])
+    second, _ = queue.submit(finish_job(queue), username="user", model_ids=["model"])
+    assert wait_for(queue, first)["status"] == "done"
+    job = wait_for(queue, second)
+    assert job["status"] == "failed"
+    assert job["error"] == RATE_LIMITED_MESSAGE
+
+def test_active_jobs_per_user_are_capped():
+    queue = JobQueue(workers=1, max_user_jobs=2)
+    release = threading.Event()
+    assert queue.submit(lambda job_id: release.wait(), username="user")[1] is None
+    assert queue.submit(lambda job_id: release.wait(), username="user")[1] is None
+    assert queue.submit(lambda job_id: release.wait(), username="user") == (None, USER_BUSY_MESSAGE)
+    assert queue.submit(lambda job_id: release.wait(), username="other")[1] is None
+    release.set()
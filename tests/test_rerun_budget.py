@@ -0,0 +1,74 @@
+import os
+import time
+import pytest
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+from conftest import ROOT
+
+# Most CPU time a plain rerun of a logged-in page may take (p50), the same
+# budget benchmarks/bench_rerun.py checks
+RERUN_BUDGET_MS = float(os.getenv("CODEGENIE_RERUN_BUDGET_MS", "25"))
+RERUNS = 15
+
+# Collects the CPU time of the script thread in every run. AppTest compiles
+# the script on every run while the server compiles it once, so the bytecode
+# is shared and only script execution is measured.
+@pytest.fixture
+def script_cpu(monkeypatch):
+    bytecode = {}
+    compile_script = ScriptCache.get_bytecode
+    run_script = LocalScriptRunner._run_script
+    samples = []
+
+    def cached_bytecode(self, script_path):
+        if script_path not in bytecode:
+            bytecode[script_path] = compile_script(self, script_path)
+        return bytecode[script_path]
+
+    def timed_run_script(self, *args, **kwargs):
+        started = time.thread_time()
+        try:
+            return run_script(self, *args, **kwargs)
+        finally:
+            samples.append(time.thread_time() - started)
+
+    monkeypatch.setattr(ScriptCache, "get_bytecode", cached_bytecode)
+    monkeypatch.setattr(LocalScriptRunner, "_run_script", timed_run_script)
+    # Pick up the app's .streamlit/config.toml, as `streamlit run` does
+    monkeypatch.chdir(ROOT)
+    return samples
+
+def start_session(username):
+    app = AppTest.from_file(os.path.join(ROOT, "app1.py"), default_timeout=30)
+    app.session_state["authenticated"] = True
+    app.session_state["username"] = username
+    app.run()
+    return app
+
+def show_result(app):
+    [selectbox for selectbox in app.selectbox if selectbox.label == "Select AI Model"][0].set_value("Test Model (canned output)")
+    app.text_area[0].input("Create a Python function that returns the average of the even numbers in a list")
+    [button for button in app.button if "Generate" in button.label][0].click()
+    app.run()
+    for _ in range(100):
+        if not app.session_state["generation"]["job_id"]:
+            break
+        time.sleep(0.05)
+        app.run()
+    assert app.session_state["generation"]["code"]
+    return app
+
+@pytest.mark.parametrize("scenario", ["idle", "result"])
+def test_rerun_cpu_stays_within_budget(script_cpu, scenario):
+    app = start_session(f"rerun-{scenario}")
+    if scenario == "result":
+        show_result(app)
+    assert not app.exception
+
+    del script_cpu[:]
+    for _ in range(RERUNS):
+        app.run()
+    cpu = sorted(script_cpu)
+    p50_ms = cpu[len(cpu) // 2] * 1000
+    assert p50_ms <= RERUN_BUDGET_MS, f"{scenario} reruns take {p50_ms:.1f} ms of CPU (p50), over the {RERUN_BUDGET_MS:g} ms budget"
@@ -0,0 +1,105 @@
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+import backends
+from resilience import CircuitBreaker, get_circuit_breaker
+
+# Answers every POST with the status code set on the class
+class StatusHandler(BaseHTTPRequestHandler):
+    status = 200
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        body = b"[]"
+        self.send_response(self.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+@pytest.fixture
+def status_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StatusHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    StatusHandler.status = 200
+
+def test_breaker_opens_after_threshold_and_fails_fast():
+    breaker = CircuitBreaker(threshold=2, cooldown=60)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+    assert not breaker.is_available()
+
+def test_breaker_lets_one_trial_through_after_cooldown():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.is_available()
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow_request()
+
+def test_failed_trial_reopens_the_circuit():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+
+def test_client_error_on_trial_closes_the_circuit(status_server, monkeypatch):
+    monkeypatch.setattr(backends, "MAX_RETRIES", 0)
+    model_id = "test/client-error-trial"
+    url = f"http://127.0.0.1:{status_server.server_port}/models/{model_id}"
+    breaker = get_circuit_breaker(model_id)
+    breaker.threshold = 1
+    breaker.cooldown = 0.05
+
+    StatusHandler.status = 500
+    assert backends.post_with_retries(model_id, url, {}, {})[0] is None
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    StatusHandler.status = 401
+    response, error = backends.post_with_retries(model_id, url, {}, {})
+    assert "401" in error
+    assert breaker.state == "closed"
+
+    StatusHandler.status = 200
+    response, error = backends.post_with_retries(model_id, url, {}, {})
+    assert error is None
+
+def test_unexpected_error_on_trial_reopens_the_circuit(monkeypatch):
+    model_id = "test/exception-trial"
+    breaker = get_circuit_breaker(model_id)
+    breaker.threshold = 1
+    breaker.cooldown = 0.05
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    def broken_post(*args, **kwargs):
+        raise ValueError("broken payload")
+
+    monkeypatch.setattr(backends.get_http_session(model_id), "post", broken_post)
+    with pytest.raises(ValueError):
+        backends.post_with_retries(model_id, "http://127.0.0.1:9/", {}, {})
+    assert breaker.state == "open"
+    assert not breaker.trial_in_flight
+
+def test_cached_backend_follows_api_base_url(monkeypatch):
+    backend = backends.get_backend("bench/base-url")
+    monkeypatch.setattr(backends, "API_BASE_URL", "http://127.0.0.1:1/models")
+    assert backends.get_backend("bench/base-url") is backend
+    assert backend.api_url == "http://127.0.0.1:1/models/bench/base-url"
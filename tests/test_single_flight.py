@@ -0,0 +1,65 @@
+import threading
+import time
+import pytest
+from single_flight import SingleFlight
+
+def test_concurrent_calls_share_one_result():
+    group = SingleFlight()
+    started = threading.Event()
+    calls = []
+
+    def slow(value):
+        calls.append(value)
+        started.set()
+        time.sleep(0.1)
+        return value * 2
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(group.do("key", slow, 21)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(group.do("key", slow, 21))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert calls == [21]
+    assert results == [42] * 4
+    assert group.stats() == {"calls": 1, "coalesced": 3, "in_flight": 0}
+
+def test_waiters_get_the_leaders_error_and_the_key_is_freed():
+    group = SingleFlight()
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.05)
+        raise ValueError("upstream failed")
+
+    errors = []
+
+    def call():
+        try:
+            group.do("key", failing)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=call)
+    follower.start()
+    leader.join()
+    follower.join()
+
+    assert errors == ["upstream failed"] * 2
+    assert group.do("key", lambda: "fresh") == "fresh"
+
+def test_different_keys_run_separately():
+    group = SingleFlight()
+    assert group.do("a", lambda: 1) == 1
+    assert group.do("b", lambda: 2) == 2
+    with pytest.raises(KeyError):
+        group.do("c", lambda: {}["missing"])
+    assert group.stats()["calls"] == 3
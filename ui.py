@@ -0,0 +1,274 @@
+import streamlit as st
+import os
+from backends import get_model_options
+from batch import build_batch_zip
+from code_explainer import explain_code
+from history_store import save_history_entry, get_history_entry
+from jobs import get_job, JOB_POLL_INTERVAL
+from languages import file_extension, highlight_language
+from metrics import span
+
+# Stylesheet and help pages shipped with the app
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+# Function to read a static asset (stylesheet, help page) once per process
+@st.cache_resource(show_spinner=False)
+def load_static_asset(name):
+    with open(os.path.join(STATIC_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+# Add custom CSS with animations and color scheme. The stylesheet is one
+# element with the same content on every rerun, so the browser's message
+# cache serves it after the first run (see .streamlit/config.toml).
+def load_css():
+    st.markdown(f"<style>\n{load_static_asset('codegenie.css')}</style>", unsafe_allow_html=True)
+
+# Help tab sections: (title, page in static/help, expanded)
+HELP_SECTIONS = [
+    ("Getting Started", "getting_started.html", True),
+    ("Writing Effective Prompts", "writing_prompts.html", False),
+    ("Available Models", "available_models.html", False),
+    ("Supported Languages", "supported_languages.html", False),
+    ("Troubleshooting", "troubleshooting.html", False)
+]
+
+# Function to show the help pages as expandable sections
+def render_help_sections():
+    for title, page, expanded in HELP_SECTIONS:
+        with st.expander(title, expanded=expanded):
+            st.markdown(load_static_asset(os.path.join("help", page)), unsafe_allow_html=True)
+
+# Custom loading animation for API requests
+def show_loading_animation():
+    st.markdown("""
+    <div class="loading-animation">
+        <div></div>
+        <div></div>
+        <div></div>
+    </div>
+    <p style="text-align: center;">CodeGenie is working its magic...</p>
+    """, unsafe_allow_html=True)
+
+# Toast notification function
+def show_toast(message, type="success"):
+    toast_class = "success-toast" if type == "success" else "error-toast"
+    st.markdown(f"""
+    <div class="toast {toast_class}" id="toast">
+        {message}
+    </div>
+    """, unsafe_allow_html=True)
+
+# Function to save code history
+def save_code_history(prompt, language, code):
+    with span("save_history", language=language):
+        save_history_entry(st.session_state["username"], prompt, language, code)
+
+# Function to render one history card; the code is loaded only while it is open
+def render_history_entry(entry, i):
+    prompt = entry["prompt"]
+    language = entry["language"]
+    timestamp = entry["created_at"]
+    
+    # Create a card for each history item with staggered animation
+    st.markdown(f"""
+    <div style="animation: slideInLeft {0.5 + min(i, 10)*0.1}s ease-out;">
+        <h3>Code from {timestamp}</h3>
+        <p><strong>Language:</strong> {language}</p>
+        <p><strong>Prompt:</strong> {prompt[:100]}{"..." if entry["prompt_length"] > 100 else ""}</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    if st.toggle("Show Code", key=f"history_show_{entry['id']}"):
+        full_entry = get_history_entry(entry["id"], st.session_state["username"])
+        code = full_entry["code"] if full_entry else "No code found"
+        
+        st.code(code, language=highlight_language(language))
+        
+        # File extension for download
+        file_ext = file_extension(language)
+        
+        # Create download button for this history item
+        st.download_button(
+            label="📥 Download This Code",
+            data=code,
+            file_name=f"history_code_{entry['id']}.{file_ext}",
+            mime="text/plain",
+            key=f"history_download_{entry['id']}"
+        )
+    
+    st.markdown("---")
+
+# Function to get the display name of a model id
+def model_display_name(value):
+    return next((name for name, option in get_model_options().items() if option == value), value)
+
+# Function to show a generation job while it runs. Runs as a fragment that
+# polls the job every JOB_POLL_INTERVAL seconds without rerunning the page,
+# then reruns the page once the job has finished.
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def show_generation_progress(generation):
+    job = get_job(generation["job_id"])
+    if job is None or job["status"] not in ("queued", "running"):
+        st.rerun()
+    
+    show_loading_animation()
+    if job["admission_position"] is not None:
+        st.caption(f"Rate limit reached, waiting for your turn ({job['admission_position']} requests ahead of yours)...")
+    elif job["status"] == "queued":
+        st.caption(f"Waiting for a free worker ({job['position']} requests ahead of yours)...")
+    
+    # Show partial results as they come in
+    highlight_lang = generation["highlight_lang"]
+    if generation["mode"] == "stream" and job["partial"]:
+        st.subheader(f"Generated {generation['language']} Code:")
+        st.code(job["partial"], language=highlight_lang)
+    elif generation["mode"] == "compare" and job["results"]:
+        for column, compare_model_id in zip(st.columns(len(generation["model_ids"])), generation["model_ids"]):
+            with column:
+                st.markdown(f"**{model_display_name(compare_model_id)}**")
+                result = job["results"].get(compare_model_id)
+                if result is None:
+                    st.info("Waiting for response...")
+                elif result["code"]:
+                    st.code(result["code"], language=highlight_lang)
+                else:
+                    st.error(result["error"] or "The model returned an empty response.")
+
+# Function to show the outcome of the current generation request
+def render_generation(generation):
+    for kind, message in generation["notices"]:
+        getattr(st, kind)(message)
+    
+    # Still running: poll it; finished: copy the outcome into the session
+    if generation["job_id"]:
+        job = get_job(generation["job_id"])
+        if job is None:
+            generation["error"] = "This generation request has expired. Please generate again."
+        elif job["status"] in ("queued", "running"):
+            show_generation_progress(generation)
+            return
+        else:
+            generation["code"] = job["code"]
+            generation["error"] = job["error"]
+            generation["results"] = job["results"]
+            generation["model_id"] = job["model_id"]
+        generation["job_id"] = None
+    
+    language = generation["language"]
+    highlight_lang = generation["highlight_lang"]
+    file_ext = file_extension(language)
+    timestamp = generation["requested_at"]
+    
+    if generation["mode"] == "compare":
+        # Show every model's result side by side
+        st.subheader(f"Generated {language} Code:")
+        successes = 0
+        for column, compare_model_id in zip(st.columns(len(generation["model_ids"])), generation["model_ids"]):
+            with column:
+                st.markdown(f"**{model_display_name(compare_model_id)}**")
+                result = generation["results"].get(compare_model_id) or {"code": None, "error": None}
+                if result["code"]:
+                    successes += 1
+                    st.code(result["code"], language=highlight_lang)
+                    st.download_button(
+                        label="📥 Download Code",
+                        data=result["code"],
+                        file_name=f"generated_code_{compare_model_id.split('/')[-1]}_{timestamp}.{file_ext}",
+                        mime="text/plain",
+                        key=f"compare_download_{compare_model_id}"
+                    )
+                else:
+                    st.error(result["error"] or "The model returned an empty response.")
+        
+        if not generation["announced"]:
+            if successes:
+                show_toast(f"Code generated by {successes} of {len(generation['model_ids'])} models! ✨", "success")
+            else:
+                show_toast("All models failed to generate code. Please try again.", "error")
+    elif generation["error"]:
+        if not generation["announced"]:
+            show_toast(generation["error"], "error")
+    elif generation["code"]:
+        generated_code = generation["code"]
+        if generation["mode"] == "race" and generation["model_id"]:
+            st.info(f"Fastest response from {model_display_name(generation['model_id'])}")
+        
+        # Display the generated code
+        st.subheader(f"Generated {language} Code:")
+        st.code(generated_code, language=highlight_lang)
+        
+        # Code explanation
+        st.subheader("Code Explanation:")
+        if generation.get("explanation") is None:
+            with span("explain_code", generation["model_id"] or "", language):
+                generation["explanation"] = explain_code(generated_code, language)
+        st.markdown(generation["explanation"], unsafe_allow_html=True)
+        
+        # Download button
+        st.download_button(
+            label="📥 Download Code",
+            data=generated_code,
+            file_name=f"generated_code_{timestamp}.{file_ext}",
+            mime="text/plain",
+            use_container_width=True
+        )
+        
+        # Success toast notification
+        if not generation["announced"]:
+            show_toast("Code successfully generated! ✨", "success")
+    elif not generation["announced"]:
+        show_toast("Failed to generate code. Please try again.", "error")
+    
+    generation["announced"] = True
+    st.session_state["generation"] = generation
+
+# Function to show a batch while it runs, polled like a generation job
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def show_batch_progress(batch):
+    job = get_job(batch["job_id"])
+    if job is None or job["status"] not in ("queued", "running"):
+        st.rerun()
+    
+    total = len(batch["rows"])
+    finished = len(job["results"])
+    failed = sum(1 for result in job["results"].values() if not result["code"])
+    if job["status"] == "queued":
+        st.caption(f"Waiting for a free worker ({job['position']} requests ahead of yours)...")
+    st.progress(finished / total, text=f"{finished} of {total} prompts done" + (f", {failed} failed" if failed else ""))
+
+# Function to show the outcome of the current batch
+def render_batch(batch):
+    # Still running: poll it; finished: copy the results into the session
+    if batch["job_id"]:
+        job = get_job(batch["job_id"])
+        if job is None:
+            batch["error"] = "This batch has expired. Please run it again."
+        elif job["status"] in ("queued", "running"):
+            show_batch_progress(batch)
+            return
+        else:
+            batch["results"] = job["results"]
+            batch["error"] = job["error"] if not job["results"] else None
+        batch["job_id"] = None
+    
+    if batch["error"]:
+        st.error(batch["error"])
+        return
+    
+    results = batch["results"]
+    succeeded = sum(1 for result in results.values() if result["code"])
+    st.success(f"Generated code for {succeeded} of {len(batch['rows'])} prompts.")
+    for row in batch["rows"]:
+        result = results.get(row["index"])
+        if result and not result["code"]:
+            st.warning(f"Prompt {row['index'] + 1} failed: {result['error']}")
+    
+    if batch.get("archive") is None:
+        batch["archive"] = build_batch_zip(batch["rows"], results)
+    st.download_button(
+        label="📦 Download Results (.zip)",
+        data=batch["archive"],
+        file_name=f"codegenie_batch_{batch['requested_at']}.zip",
+        mime="application/zip",
+        use_container_width=True
+    )
@@ -0,0 +1,256 @@
+import streamlit as st
+import json
+import os
+import atexit
+import hashlib
+import secrets
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+# Location of the user database and of the legacy JSON user file
+USER_DIR = os.getenv("CODEGENIE_USER_DIR", "users")
+USER_DB = os.getenv("CODEGENIE_USER_DB", os.path.join(USER_DIR, "users.db"))
+LEGACY_USER_FILE = os.path.join(USER_DIR, "user_database.json")
+
+# Seconds between flushes of buffered bookkeeping updates
+WRITE_BEHIND_INTERVAL = float(os.getenv("CODEGENIE_WRITE_BEHIND_INTERVAL", "5"))
+
+# Bookkeeping columns that may be written behind instead of immediately
+WRITE_BEHIND_FIELDS = {"last_login"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    email TEXT NOT NULL,
+    creation_date TEXT NOT NULL,
+    last_login TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_users_email ON users (email);
+CREATE TABLE IF NOT EXISTS api_tokens (
+    token_hash TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_api_tokens_username ON api_tokens (username);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# One connection per thread; SQLite's file locking keeps concurrent writers
+# in other threads and processes consistent
+local = threading.local()
+
+# Function to get this thread's connection to the user database
+def get_connection(db_path=USER_DB):
+    connections = getattr(local, "connections", None)
+    if connections is None:
+        connections = local.connections = {}
+    if db_path not in connections:
+        initialize_user_store(db_path)
+        # Autocommit mode: writes use explicit BEGIN IMMEDIATE transactions
+        connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA busy_timeout = 30000")
+        connections[db_path] = connection
+    return connections[db_path]
+
+# Function to run a block as one write transaction. BEGIN IMMEDIATE takes the
+# write lock up front, so check-then-write sequences can't interleave.
+@contextmanager
+def write_transaction(connection):
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield connection
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    else:
+        connection.execute("COMMIT")
+
+# Function to create the user database, once per process
+@st.cache_resource(show_spinner=False)
+def initialize_user_store(db_path=USER_DB, legacy_file=LEGACY_USER_FILE):
+    directory = os.path.dirname(db_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.executescript(SCHEMA)
+        with write_transaction(connection):
+            migrate_json_users(connection, legacy_file)
+    finally:
+        connection.close()
+    return True
+
+# Function to import users from the legacy users/user_database.json file.
+# Runs once per database; users already present are left untouched.
+def migrate_json_users(connection, legacy_file=LEGACY_USER_FILE):
+    done = connection.execute("SELECT value FROM meta WHERE key = 'json_import_done'").fetchone()
+    if done:
+        return 0
+
+    imported = 0
+    if os.path.exists(legacy_file):
+        with open(legacy_file, "r") as f:
+            users = json.load(f)
+        for username, user_data in users.items():
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO users (username, password, email, creation_date, last_login) VALUES (?, ?, ?, ?, ?)",
+                (username, user_data["password"], user_data["email"], user_data.get("creation_date") or "", user_data.get("last_login"))
+            )
+            imported += cursor.rowcount
+
+    connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_import_done', ?)", (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),))
+    return imported
+
+# Function to count registered users
+def count_users(db_path=USER_DB):
+    return get_connection(db_path).execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+# Function to look up a user by username, including not yet flushed bookkeeping
+def get_user(username, db_path=USER_DB):
+    row = get_connection(db_path).execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+    if not row:
+        return None
+    user = dict(row)
+    user.update(get_write_behind_buffer(db_path).pending_for(username))
+    return user
+
+# Function to add a user unless the username or email is taken.
+# Returns (success, message) like register_user.
+def create_user(username, password_hash, email, db_path=USER_DB):
+    connection = get_connection(db_path)
+    with write_transaction(connection):
+        if connection.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone():
+            return False, "Username already exists"
+        if connection.execute("SELECT 1 FROM users WHERE email = ?", (email,)).fetchone():
+            return False, "Email already in use"
+        connection.execute(
+            "INSERT INTO users (username, password, email, creation_date, last_login) VALUES (?, ?, ?, ?, NULL)",
+            (username, password_hash, email, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+    return True, "Registration successful"
+
+# Function to change the password of the user with the given email.
+# Returns the username that was updated, or None if the email is unknown.
+def update_password_by_email(email, password_hash, db_path=USER_DB):
+    connection = get_connection(db_path)
+    with write_transaction(connection):
+        row = connection.execute("SELECT username FROM users WHERE email = ? LIMIT 1", (email,)).fetchone()
+        if not row:
+            return None
+        connection.execute("UPDATE users SET password = ? WHERE username = ?", (password_hash, row["username"]))
+    return row["username"]
+
+# Function to hash an API token; only the hash is stored
+def hash_api_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+# Function to issue a new API token for a user. Returns the token, which
+# can't be recovered later.
+def create_api_token(username, db_path=USER_DB):
+    token = secrets.token_urlsafe(32)
+    connection = get_connection(db_path)
+    with write_transaction(connection):
+        connection.execute(
+            "INSERT INTO api_tokens (token_hash, username, created_at) VALUES (?, ?, ?)",
+            (hash_api_token(token), username, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+    return token
+
+# Function to find the user an API token belongs to, or None
+def get_api_token_user(token, db_path=USER_DB):
+    if not token:
+        return None
+    row = get_connection(db_path).execute("SELECT username FROM api_tokens WHERE token_hash = ?", (hash_api_token(token),)).fetchone()
+    return row["username"] if row else None
+
+# Function to revoke all API tokens of a user; returns how many were revoked
+def revoke_api_tokens(username, db_path=USER_DB):
+    connection = get_connection(db_path)
+    with write_transaction(connection):
+        return connection.execute("DELETE FROM api_tokens WHERE username = ?", (username,)).rowcount
+
+# Write-behind buffer for bookkeeping updates such as last_login. Updates are
+# coalesced per user in memory (the latest value wins) and written in one
+# transaction by a background thread every WRITE_BEHIND_INTERVAL seconds and
+# at interpreter shutdown, keeping disk writes off the login path.
+class WriteBehindBuffer:
+    def __init__(self, db_path=USER_DB, interval=WRITE_BEHIND_INTERVAL):
+        self.db_path = db_path
+        self.interval = interval
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.counters = {"updates": 0, "flushes": 0, "rows_written": 0}
+        self.thread = threading.Thread(target=self.run, name="codegenie-write-behind", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def set(self, username, field, value):
+        if field not in WRITE_BEHIND_FIELDS:
+            raise ValueError(f"{field} cannot be written behind")
+        with self.lock:
+            self.pending.setdefault(username, {})[field] = value
+            self.counters["updates"] += 1
+
+    def pending_for(self, username):
+        with self.lock:
+            return dict(self.pending.get(username, {}))
+
+    def flush(self):
+        with self.lock:
+            batch, self.pending = self.pending, {}
+        if not batch:
+            return 0
+
+        try:
+            connection = get_connection(self.db_path)
+            with write_transaction(connection):
+                for username, fields in batch.items():
+                    assignments = ", ".join(f"{field} = ?" for field in fields)
+                    connection.execute(f"UPDATE users SET {assignments} WHERE username = ?", list(fields.values()) + [username])
+        except Exception:
+            # Put the batch back (newer updates win) and retry on the next flush
+            with self.lock:
+                for username, fields in batch.items():
+                    self.pending[username] = {**fields, **self.pending.get(username, {})}
+            raise
+
+        with self.lock:
+            self.counters["flushes"] += 1
+            self.counters["rows_written"] += len(batch)
+        return len(batch)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def close(self):
+        self.stopped.set()
+        self.flush()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["pending_users"] = len(self.pending)
+            return stats
+
+# Function to get the process-wide write-behind buffer for a user database
+@st.cache_resource(show_spinner=False)
+def get_write_behind_buffer(db_path=USER_DB):
+    return WriteBehindBuffer(db_path)
+
+# Function to record a login without writing to disk on the login path
+def record_last_login(username, last_login, db_path=USER_DB):
+    get_write_behind_buffer(db_path).set(username, "last_login", last_login)